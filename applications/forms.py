@@ -132,11 +132,11 @@ class ApplicationForm(forms.ModelForm):
             upload_field = f"{field_name}__upload"
             clear_field = f"{field_name}__clear"
             if self.cleaned_data.get(clear_field):
-                setattr(instance, field_name, None)
+                instance.definir_anexo(field_name, None)
                 continue
             uploaded = self.files.get(upload_field)
             if uploaded:
-                setattr(instance, field_name, uploaded.read())
+                instance.definir_anexo(field_name, uploaded)
 
                 
     def save(self, commit: bool = True) -> Application:
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:41
+
+import hashlib
+
+import django.db.models.deletion
+import magic
+from django.db import migrations, models
+
+CAMPOS_ANEXO = [
+    'laudo_medico_deficiencia',
+    'autodeclaracao_racial',
+    'boletim_escolar',
+    'termo_autorizacao',
+    'rg_frente',
+    'rg_verso',
+    'cpf_anexo',
+    'declaracao_vinculo',
+    'documentacao_comprobatoria_lattes',
+]
+
+
+def preencher_metadados(apps, schema_editor):
+    Application = apps.get_model('applications', 'Application')
+    ApplicationAnexo = apps.get_model('applications', 'ApplicationAnexo')
+
+    for inscricao_id, *conteudos in Application.objects.values_list('id', *CAMPOS_ANEXO).iterator(chunk_size=20):
+        anexos = []
+        for campo, conteudo in zip(CAMPOS_ANEXO, conteudos):
+            if not conteudo:
+                continue
+            conteudo = bytes(conteudo)
+            try:
+                mime_type = magic.from_buffer(conteudo[:2048], mime=True)
+            except Exception:
+                mime_type = 'application/octet-stream'
+            anexos.append(ApplicationAnexo(
+                inscricao_id=inscricao_id,
+                campo=campo,
+                mime_type=mime_type,
+                tamanho=len(conteudo),
+                sha256=hashlib.sha256(conteudo).hexdigest(),
+            ))
+        ApplicationAnexo.objects.bulk_create(anexos)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0003_application_aceite_declaracao_veracidade_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApplicationAnexo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('campo', models.CharField(choices=[('laudo_medico_deficiencia', 'laudo_medico_deficiencia'), ('autodeclaracao_racial', 'autodeclaracao_racial'), ('boletim_escolar', 'boletim_escolar'), ('termo_autorizacao', 'termo_autorizacao'), ('rg_frente', 'rg_frente'), ('rg_verso', 'rg_verso'), ('cpf_anexo', 'cpf_anexo'), ('declaracao_vinculo', 'declaracao_vinculo'), ('documentacao_comprobatoria_lattes', 'documentacao_comprobatoria_lattes')], max_length=50)),
+                ('mime_type', models.CharField(blank=True, max_length=100)),
+                ('tamanho', models.PositiveIntegerField(default=0)),
+                ('sha256', models.CharField(blank=True, max_length=64)),
+                ('nome_original', models.CharField(blank=True, max_length=255)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('inscricao', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='anexos', to='applications.application')),
+            ],
+            options={
+                'unique_together': {('inscricao', 'campo')},
+            },
+        ),
+        migrations.RunPython(preencher_metadados, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+COLUNAS_BINARIAS = [
+    'laudo_medico_deficiencia',
+    'autodeclaracao_racial',
+    'boletim_escolar',
+    'termo_autorizacao',
+    'rg_frente',
+    'rg_verso',
+    'cpf_anexo',
+    'declaracao_vinculo',
+    'documentacao_comprobatoria_lattes',
+]
+
+
+def armazenar_sem_compressao(apps, schema_editor):
+    # Só no PostgreSQL; ver users/migrations/0008_armazenamento_anexos.py
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for coluna in COLUNAS_BINARIAS:
+        schema_editor.execute(f'ALTER TABLE applications_application ALTER COLUMN {coluna} SET STORAGE EXTERNAL')
+    regravar = ', '.join(f"{coluna} = {coluna} || ''::bytea" for coluna in COLUNAS_BINARIAS)
+    schema_editor.execute(f'UPDATE applications_application SET {regravar}')
+
+
+def restaurar_compressao(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for coluna in COLUNAS_BINARIAS:
+        schema_editor.execute(f'ALTER TABLE applications_application ALTER COLUMN {coluna} SET STORAGE EXTENDED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0004_applicationanexo'),
+    ]
+
+    operations = [
+        migrations.RunPython(armazenar_sem_compressao, restaurar_compressao),
+    ]
@@ -5,10 +5,24 @@ from django.core.validators import RegexValidator
 from django.utils import timezone
 import uuid
 
+from core.downloads import ler_upload, metadados_do_conteudo
 from projects.models import Project
 
 phone_validator = RegexValidator(regex=r'^\+?1?\d{9,15}$', message='Telefone inválido.')
 
+# Campos binários (documentos anexados à inscrição)
+CAMPOS_ANEXO = [
+    'laudo_medico_deficiencia',
+    'autodeclaracao_racial',
+    'boletim_escolar',
+    'termo_autorizacao',
+    'rg_frente',
+    'rg_verso',
+    'cpf_anexo',
+    'declaracao_vinculo',
+    'documentacao_comprobatoria_lattes',
+]
+
 
 class Application(models.Model):
     STATUS_ESCOLHAS = [
@@ -87,9 +101,66 @@ class Application(models.Model):
         if not (self.projeto.inicio_inscricoes <= now <= self.projeto.fim_inscricoes):
             raise ValidationError("Inscrição fora do prazo permitido do projeto.")
 
+    def preencher(self, dados):
+        """Atribui os dados validados; campos de anexo passam por definir_anexo."""
+        for campo, valor in dados.items():
+            if campo in CAMPOS_ANEXO:
+                self.definir_anexo(campo, valor)
+            else:
+                setattr(self, campo, valor)
+
+    def definir_anexo(self, campo, arquivo):
+        """
+        Grava o arquivo enviado (ou o conteúdo em bytes; None remove) no campo
+        binário e guarda os metadados para o ApplicationAnexo, persistido no save().
+        """
+        if isinstance(arquivo, (bytes, bytearray, memoryview)):
+            conteudo, nome_original = bytes(arquivo) or None, ''
+        else:
+            conteudo, nome_original = ler_upload(arquivo) if arquivo else (None, '')
+        setattr(self, campo, conteudo)
+        if campo in CAMPOS_ANEXO:
+            self.__dict__.setdefault('_anexos_pendentes', {})[campo] = (
+                metadados_do_conteudo(conteudo, nome_original) if conteudo else None
+            )
+
+    def _salvar_metadados_anexos(self):
+        pendentes = self.__dict__.pop('_anexos_pendentes', {})
+        if not pendentes:
+            return
+        removidos = [campo for campo, metadados in pendentes.items() if metadados is None]
+        if removidos:
+            self.anexos.filter(campo__in=removidos).delete()
+        enviados = [
+            ApplicationAnexo(inscricao=self, campo=campo, **metadados)
+            for campo, metadados in pendentes.items() if metadados is not None
+        ]
+        if enviados:
+            ApplicationAnexo.objects.bulk_create(
+                enviados,
+                update_conflicts=True,
+                unique_fields=['inscricao', 'campo'],
+                update_fields=['mime_type', 'tamanho', 'sha256', 'nome_original', 'atualizado_em'],
+            )
+
     def save(self, *args, **kwargs):
         self.clean()
         super().save(*args, **kwargs)
+        self._salvar_metadados_anexos()
+
+
+class ApplicationAnexo(models.Model):
+    """Metadados dos documentos da inscrição; o conteúdo fica no campo binário da Application."""
+    inscricao = models.ForeignKey(Application, on_delete=models.CASCADE, related_name='anexos')
+    campo = models.CharField(max_length=50, choices=[(campo, campo) for campo in CAMPOS_ANEXO])
+    mime_type = models.CharField(max_length=100, blank=True)
+    tamanho = models.PositiveIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)
+    nome_original = models.CharField(max_length=255, blank=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('inscricao', 'campo')
 
 
 class ApplicationStatusLog(models.Model):
@@ -41,7 +41,7 @@ class ApplicationSerializer(serializers.ModelSerializer):
             ]
             if content_type not in allowed_types:
                 raise serializers.ValidationError(f"Arquivo {upload_field} deve ser PDF ou imagem.")
-            setattr(instance, model_field, file.read())
+            instance.definir_anexo(model_field, file)
 
     def create(self, validated_data):
         instance = Application()
@@ -62,8 +62,7 @@ class ApplicationSerializer(serializers.ModelSerializer):
         ]:
             self._handle_file_upload(instance, validated_data, upload_field, model_field)
 
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
+        instance.preencher(validated_data)
 
         instance.save()
         return instance
@@ -86,8 +85,7 @@ class ApplicationSerializer(serializers.ModelSerializer):
         ]:
             self._handle_file_upload(instance, validated_data, upload_field, model_field)
 
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
+        instance.preencher(validated_data)
 
         instance.save()
         return instance
@@ -6,18 +6,19 @@ from applications.models import Application
 
 def validar_e_retornar_inscricao(user, pk):
     inscricao = Application.objects.get(pk=pk)
+    roles = user.roles
 
-    if 'estudante' in user.roles:
+    if 'estudante' in roles:
         if inscricao.usuario != user:
             raise PermissionDenied("Você não tem permissão para editar esta inscrição.")
         if inscricao.status not in ['rascunho', 'pendente']:
             raise PermissionDenied("Você só pode editar inscrições com status 'rascunho' ou 'pendente'.")
 
-    elif 'avalidador' in user.roles:
+    elif 'avalidador' in roles:
         if inscricao.status != 'avaliacao':
             raise PermissionDenied("Avaliadores só podem editar inscrições com status 'avaliacao'.")
 
-    elif 'admin' not in user.roles:
+    elif 'admin' not in roles:
         raise PermissionDenied("Você não tem permissão para editar inscrições.")
 
     return inscricao
@@ -42,8 +43,7 @@ def atualizar_inscricao(user, instance, validated_data):
         if novo_status not in ['deferida', 'indeferida', 'pendente']:
             raise PermissionDenied("Status inválido. Você só pode definir como 'Deferida', 'Indeferida' ou 'Pendente'.")
 
-    for attr, value in validated_data.items():
-        setattr(inscricao, attr, value)
+    inscricao.preencher(validated_data)
 
     if status_atual != novo_status:
         registrar_log_status_inscricao(inscricao, status_atual, novo_status, user)
@@ -65,13 +65,13 @@ def inscrever_usuario_em_projeto(user, project_id, dados=None, arquivos=None):
     inscricao = Application(usuario=user, projeto=projeto)
 
     if dados:
-        for attr, value in dados.items():
-            setattr(inscricao, attr, value)
+        # Os uploads também chegam em `dados` (request.data); são lidos uma vez, abaixo
+        inscricao.preencher({attr: value for attr, value in dados.items() if attr not in (arquivos or {})})
 
     if arquivos:
         for attr, file in arquivos.items():
             if hasattr(file, 'read'):
-                setattr(inscricao, attr, file.read())
+                inscricao.definir_anexo(attr, file)
 
     inscricao.save()
 
@@ -0,0 +1,110 @@
+import hashlib
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from projects.janelas import obter_indice
+from projects.models import Project
+from users.models import User
+
+from .models import Application, ApplicationAnexo
+from .services import atualizar_inscricao
+
+
+def criar_projeto(inicio, fim, **extras):
+    agora = timezone.now()
+    return Project.objects.create(
+        nome='Projeto', descricao='Descrição', vagas=10,
+        inicio_inscricoes=inicio, fim_inscricoes=fim,
+        data_inicio=agora + timedelta(days=30), data_fim=agora + timedelta(days=60), **extras,
+    )
+
+
+class PrazoInscricaoTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        agora = timezone.now()
+        self.usuaria = User.objects.create_user(email='ana@example.com', cpf='52998224725', password='Senha@123')
+        self.projeto = criar_projeto(agora - timedelta(days=1), agora + timedelta(days=1))
+
+    def test_dentro_do_prazo(self):
+        Application(usuario=self.usuaria, projeto=self.projeto).clean()
+
+    def test_prazo_conferido_no_banco_mesmo_com_indice_desatualizado(self):
+        obter_indice()
+        # Alteração sem sinais, como a de outro processo: o índice continua com a janela antiga
+        Project.objects.filter(pk=self.projeto.pk).update(fim_inscricoes=timezone.now() - timedelta(minutes=1))
+        self.assertTrue(obter_indice().janela(self.projeto.pk)[1] > timezone.now())
+
+        with self.assertRaisesMessage(ValidationError, 'fora do prazo'):
+            Application(usuario=self.usuaria, projeto=Project.objects.get(pk=self.projeto.pk)).clean()
+
+
+PDF = b'%PDF-1.4\n' + b'0' * 100
+
+
+class AnexosInscricaoTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        caches['usuarios'].clear()
+        agora = timezone.now()
+        self.usuaria = User.objects.create_user(email='ana@example.com', cpf='52998224725', password='Senha@123')
+        self.projeto = criar_projeto(agora - timedelta(days=1), agora + timedelta(days=1))
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.usuaria)
+
+    def metadados(self, inscricao):
+        return {
+            anexo.campo: (anexo.mime_type, anexo.tamanho, anexo.sha256, anexo.nome_original)
+            for anexo in ApplicationAnexo.objects.filter(inscricao=inscricao)
+        }
+
+    def test_metadados_gravados_no_upload(self):
+        resposta = self.cliente.post(f'/inscricoes/inscrever_se/{self.projeto.pk}/', {
+            'como_soube_programa': 'Escola',
+            'rg_frente': SimpleUploadedFile('rg.pdf', PDF, content_type='application/pdf'),
+        }, format='multipart')
+
+        self.assertEqual(resposta.status_code, 201, resposta.data)
+        inscricao = Application.objects.get(usuario=self.usuaria)
+        self.assertEqual(bytes(inscricao.rg_frente), PDF)
+        self.assertEqual(self.metadados(inscricao), {
+            'rg_frente': ('application/pdf', len(PDF), hashlib.sha256(PDF).hexdigest(), 'rg.pdf'),
+        })
+
+    def test_download_usa_os_metadados_gravados(self):
+        inscricao = Application(usuario=self.usuaria, projeto=self.projeto)
+        inscricao.definir_anexo('cpf_anexo', SimpleUploadedFile('cpf.pdf', PDF))
+        inscricao.save()
+
+        with mock.patch('core.downloads.detectar_mime') as detectar_mime:
+            resposta = self.cliente.get(f'/inscricoes/{inscricao.pk}/baixar/cpf_anexo/')
+            lista = self.cliente.get(f'/inscricoes/{inscricao.pk}/anexos/')
+
+        detectar_mime.assert_not_called()
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta['Content-Type'], 'application/pdf')
+        self.assertEqual(b''.join(resposta.streaming_content) if resposta.streaming else resposta.content, PDF)
+        self.assertEqual([(a['campo'], a['tamanho_bytes']) for a in lista.data], [('cpf_anexo', len(PDF))])
+
+    def test_blob_nos_dados_validados_atualiza_os_metadados(self):
+        inscricao = Application(usuario=self.usuaria, projeto=self.projeto)
+        inscricao.definir_anexo('rg_verso', SimpleUploadedFile('rg.pdf', PDF))
+        inscricao.definir_anexo('boletim_escolar', SimpleUploadedFile('boletim.pdf', PDF))
+        inscricao.save()
+
+        novo = PDF + b'segunda versao'
+        atualizar_inscricao(self.usuaria, inscricao, {'rg_verso': memoryview(novo), 'boletim_escolar': None})
+
+        inscricao.refresh_from_db()
+        self.assertEqual(bytes(inscricao.rg_verso), novo)
+        self.assertIsNone(inscricao.boletim_escolar)
+        self.assertEqual(self.metadados(inscricao), {
+            'rg_verso': ('application/pdf', len(novo), hashlib.sha256(novo).hexdigest(), ''),
+        })
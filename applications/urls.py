@@ -7,6 +7,7 @@ urlpatterns = [
     path('inscrever_se/<uuid:project_id>/', InscreverProjetoView.as_view(), name='enroll_in_project'),
     path('atualizar_inscricao/<uuid:application_id>/', EditarInscricaoView.as_view(), name='update_application'),
     path('<uuid:inscricao_id>/baixar/<str:campo>/', AnexoDownloadView.as_view(), name='baixar_arquivo_inscricao'),
+    path('<uuid:inscricao_id>/anexos/', AnexosInscricaoView.as_view(), name='anexos_inscricao'),
 
 
     path("", ApplicationListView.as_view(), name="list"),
@@ -10,13 +10,26 @@ from rest_framework.permissions import IsAuthenticated
 from django.http import HttpResponse
 from users.permissions import *
 from .models import *
-import magic
-import mimetypes
+from core.downloads import obter_metadados, responder_anexo
 
 
 from .serializers import ApplicationSerializer
 from .services import inscrever_usuario_em_projeto
 
+def metadados_do_anexo(inscricao, campo):
+    """
+    Metadados gravados no upload; documentos antigos, sem registro,
+    têm os metadados calculados a partir do blob.
+    """
+    metadados = (
+        ApplicationAnexo.objects
+        .filter(inscricao__in=inscricao, campo=campo)
+        .values('mime_type', 'tamanho', 'sha256', 'nome_original')
+        .first()
+    )
+    return metadados or obter_metadados(inscricao, campo)
+
+
 class InscreverProjetoView(generics.CreateAPIView):
     serializer_class = ApplicationSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -60,25 +73,47 @@ class AnexoDownloadView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, inscricao_id, campo):
-        app = get_object_or_404(Application, pk=inscricao_id)
+        app = get_object_or_404(Application.objects.only('id', 'usuario_id'), pk=inscricao_id)
 
-        if request.user != app.usuario and 'admin' not in request.user.roles and 'avalidador' not in request.user.roles:
+        if app.usuario_id != request.user.pk and 'admin' not in request.user.roles and 'avalidador' not in request.user.roles:
             return HttpResponse("Acesso negado", status=403)
 
-        arquivo = getattr(app, campo, None)
-        if not arquivo:
+        if campo not in CAMPOS_ANEXO:
+            return HttpResponse("Campo ou arquivo inválido", status=404)
+
+        inscricao = Application.objects.filter(pk=app.pk)
+        metadados = metadados_do_anexo(inscricao, campo)
+        if not metadados:
             return HttpResponse("Campo ou arquivo inválido", status=404)
 
-        if isinstance(arquivo, memoryview):
-            arquivo = arquivo.tobytes()
+        return responder_anexo(request, inscricao, campo, campo, metadados)
+
+
+class AnexosInscricaoView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, inscricao_id):
+        app = get_object_or_404(Application.objects.only('id', 'usuario_id'), pk=inscricao_id)
 
-        mime_type = magic.Magic(mime=True).from_buffer(arquivo)
-        ext = mimetypes.guess_extension(mime_type) or ".bin"
-        filename = f"{campo}{ext}"
+        if app.usuario_id != request.user.pk and 'admin' not in request.user.roles and 'avalidador' not in request.user.roles:
+            return HttpResponse("Acesso negado", status=403)
 
-        return HttpResponse(arquivo, content_type=mime_type, headers={
-            "Content-Disposition": f'attachment; filename="{filename}"'
-        })
+        anexos = (
+            app.anexos
+            .order_by('campo')
+            .values('campo', 'nome_original', 'mime_type', 'tamanho', 'sha256', 'atualizado_em')
+        )
+        return Response([
+            {
+                'campo': anexo['campo'],
+                'nome_original': anexo['nome_original'],
+                'mime_type': anexo['mime_type'],
+                'tamanho_bytes': anexo['tamanho'],
+                'sha256': anexo['sha256'],
+                'atualizado_em': anexo['atualizado_em'],
+            }
+            for anexo in anexos
+        ])
     
 
 
@@ -197,9 +232,7 @@ class ApplicationDetailView(LoginRequiredMixin, DetailView):
 # apps/applications/views.py
 from django.http import Http404, HttpResponse
 from django.contrib.auth.decorators import login_required
-from django.utils.encoding import iri_to_uri
 from django.views.decorators.http import require_GET
-import mimetypes
 
 from .models import Application
 from .forms import ApplicationForm  # para reaproveitar a lista de campos binários
@@ -213,7 +246,7 @@ def download_application_file(request, pk: str, field: str):
         raise Http404("Arquivo não encontrado.")
 
     try:
-        app = Application.objects.get(pk=pk)
+        app = Application.objects.only("id", "usuario_id").get(pk=pk)
     except Application.DoesNotExist:
         raise Http404("Inscrição não encontrada.")
 
@@ -221,16 +254,9 @@ def download_application_file(request, pk: str, field: str):
     if not (request.user.is_superuser or app.usuario_id == request.user.id):
         raise Http404("Arquivo não encontrado.")
 
-    blob = getattr(app, field)
-    if not blob:
+    inscricao = Application.objects.filter(pk=app.pk)
+    metadados = metadados_do_anexo(inscricao, field)
+    if not metadados:
         raise Http404("Arquivo não encontrado.")
 
-    # não temos nome/tipo original; defina um nome padrão
-    filename = f"{field}.bin"
-    content_type, _ = mimetypes.guess_type(filename)
-    if not content_type:
-        content_type = "application/octet-stream"
-
-    resp = HttpResponse(bytes(blob), content_type=content_type)
-    resp["Content-Disposition"] = f'attachment; filename="{iri_to_uri(filename)}"'
-    return resp
+    return responder_anexo(request, inscricao, field, field, metadados)
@@ -0,0 +1,127 @@
+import threading
+from bisect import bisect_left
+
+from .models import Cidade, Estado, Instituicao
+from .nomes import normalizar_nome
+from .referencia import versao_vigente
+
+# Palavras que não iniciam uma busca por palavra ("do sul" não deve casar tudo)
+PALAVRAS_IGNORADAS = {'d', 'da', 'das', 'de', 'do', 'dos', 'e'}
+LIMITE_PADRAO = 10
+LIMITE_MAXIMO = 50
+
+
+class IndicePrefixos:
+    """
+    Índice de prefixos em memória sobre nomes normalizados. Cada nome entra
+    uma vez inteiro e uma vez a partir de cada palavra, em listas ordenadas
+    por escopo (None = todos os estados); a busca é um bisect no intervalo
+    [prefixo, prefixo + '\\uffff'). Resultados pelo nome inteiro vêm primeiro.
+    """
+
+    def __init__(self, itens):
+        # itens: (id, nome, estado_id, payload)
+        self.payloads = {}
+        entradas = {}
+        for id_, nome, estado_id, payload in itens:
+            self.payloads[id_] = payload
+            palavras = normalizar_nome(nome).split(' ')
+            for posicao in range(len(palavras)):
+                if posicao and palavras[posicao] in PALAVRAS_IGNORADAS:
+                    continue
+                chave = ' '.join(palavras[posicao:])
+                grupo = 0 if posicao == 0 else 1
+                for escopo in {None, estado_id}:
+                    entradas.setdefault((escopo, grupo), []).append((chave, id_))
+        self.listas = {}
+        for chave_lista, lista in entradas.items():
+            lista.sort()
+            self.listas[chave_lista] = ([chave for chave, _ in lista], [id_ for _, id_ in lista])
+
+    def buscar(self, prefixo, estado_id=None, limite=LIMITE_PADRAO):
+        prefixo = normalizar_nome(prefixo)
+        if not prefixo:
+            return []
+        encontrados = []
+        for grupo in (0, 1):
+            chaves, ids = self.listas.get((estado_id, grupo), ([], []))
+            inicio = bisect_left(chaves, prefixo)
+            fim = bisect_left(chaves, prefixo + '\uffff', inicio)
+            for id_ in ids[inicio:fim]:
+                if id_ not in encontrados:
+                    encontrados.append(id_)
+                    if len(encontrados) >= limite:
+                        return [self.payloads[i] for i in encontrados]
+        return [self.payloads[i] for i in encontrados]
+
+
+def _indice_cidades():
+    cidades = Cidade.objects.select_related('estado').only('id', 'nome', 'estado__id', 'estado__uf')
+    return IndicePrefixos(
+        (c.id, c.nome, c.estado_id, {'id': c.id, 'nome': c.nome, 'estado': c.estado_id, 'uf': c.estado.uf})
+        for c in cidades
+    )
+
+
+def _indice_instituicoes():
+    instituicoes = Instituicao.objects.select_related('cidade__estado').only(
+        'id', 'nome', 'cidade__id', 'cidade__nome', 'cidade__estado__id', 'cidade__estado__uf'
+    )
+    itens = []
+    for i in instituicoes:
+        cidade = i.cidade
+        estado_id = cidade.estado_id if cidade else None
+        itens.append((i.id, i.nome, estado_id, {
+            'id': i.id,
+            'nome': i.nome,
+            'cidade': cidade.nome if cidade else None,
+            'uf': cidade.estado.uf if cidade else None,
+        }))
+    return IndicePrefixos(itens)
+
+
+def _estados():
+    """uf, nome normalizado ou id → id do estado, para escopar sem consultar o banco."""
+    mapa = {}
+    for estado in Estado.objects.only('id', 'uf', 'nome'):
+        mapa[str(estado.id)] = estado.id
+        mapa[estado.uf.lower()] = estado.id
+        mapa[normalizar_nome(estado.nome)] = estado.id
+    return mapa
+
+
+CONSTRUTORES = {
+    'cidade': _indice_cidades,
+    'instituicao': _indice_instituicoes,
+}
+
+_indices = {}
+_trava = threading.Lock()
+
+
+def obter_indices():
+    """Índices da versão atual dos dados de referência, reconstruídos quando ela muda."""
+    versao = versao_vigente()
+    indices = _indices.get('atual')
+    if indices is None or indices['versao'] != versao:
+        with _trava:
+            indices = _indices.get('atual')
+            if indices is None or indices['versao'] != versao:
+                indices = {'versao': versao, 'estados': _estados()}
+                indices.update({tipo: construir() for tipo, construir in CONSTRUTORES.items()})
+                _indices['atual'] = indices
+    return indices
+
+
+def autocompletar(tipo, prefixo, estado=None, limite=LIMITE_PADRAO):
+    """
+    Até `limite` itens do tipo ('cidade' ou 'instituicao') cujo nome, ou uma
+    palavra dele, começa com `prefixo`. Retorna None se o estado não existir.
+    """
+    indices = obter_indices()
+    estado_id = None
+    if estado:
+        estado_id = indices['estados'].get(normalizar_nome(estado))
+        if estado_id is None:
+            return None
+    return indices[tipo].buscar(prefixo, estado_id, max(1, min(limite, LIMITE_MAXIMO)))
@@ -0,0 +1,161 @@
+import hashlib
+import mimetypes
+import os
+import re
+
+import magic
+from django.core.cache import cache
+from django.db.models import BinaryField
+from django.db.models.functions import Length, Substr
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import content_disposition_header, parse_etags, quote_etag
+
+TAMANHO_BLOCO = 64 * 1024
+BYTES_PARA_MIME = 2048
+TEMPO_CACHE_METADADOS = 60 * 60 * 24
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def detectar_mime(inicio_arquivo):
+    """Detecta o MIME a partir dos primeiros bytes do arquivo."""
+    try:
+        return magic.from_buffer(bytes(inicio_arquivo[:BYTES_PARA_MIME]), mime=True)
+    except Exception:
+        return 'application/octet-stream'
+
+
+def metadados_do_conteudo(conteudo, nome_original=''):
+    """Metadados de um documento, calculados uma única vez no momento do upload."""
+    return {
+        'mime_type': detectar_mime(conteudo),
+        'tamanho': len(conteudo),
+        'sha256': hashlib.sha256(conteudo).hexdigest(),
+        'nome_original': nome_original[:255],
+    }
+
+
+def ler_upload(arquivo):
+    """Lê um arquivo enviado e retorna (conteudo, nome_original)."""
+    return arquivo.read(), os.path.basename(getattr(arquivo, 'name', None) or '')
+
+
+def ler_em_blocos(queryset, campo, inicio=0, fim=None):
+    """
+    Lê o blob `campo` da linha selecionada pelo queryset entre os bytes
+    `inicio` e `fim` (inclusive), com uma consulta por bloco.
+    Nunca mantém mais de um bloco em memória. No PostgreSQL, as colunas lidas
+    aqui usam STORAGE EXTERNAL (sem compressão no TOAST), para que cada SUBSTR
+    leia só o trecho pedido; colunas binárias novas precisam do mesmo ajuste
+    (ver users/migrations/0008_armazenamento_anexos.py).
+    """
+    posicao = inicio
+    while fim is None or posicao <= fim:
+        tamanho = TAMANHO_BLOCO if fim is None else min(TAMANHO_BLOCO, fim - posicao + 1)
+        bloco = (
+            queryset
+            .annotate(_bloco=Substr(campo, posicao + 1, tamanho, output_field=BinaryField()))
+            .values_list('_bloco', flat=True)
+            .first()
+        )
+        if not bloco:
+            return
+        yield bytes(bloco)
+        posicao += len(bloco)
+
+
+def obter_metadados(queryset, campo, campo_versao='atualizado_em'):
+    """
+    Retorna tamanho, SHA-256 e MIME do blob `campo`, ou None se estiver vazio.
+    O cálculo percorre o blob em blocos e fica em cache até a linha mudar.
+    Usado apenas para documentos gravados sem metadados.
+    """
+    linha = queryset.annotate(_tamanho=Length(campo)).values('pk', '_tamanho', campo_versao).first()
+    if not linha or not linha['_tamanho']:
+        return None
+
+    chave = f"anexo:{queryset.model._meta.label_lower}:{linha['pk']}:{campo}:{linha[campo_versao].isoformat()}"
+    metadados = cache.get(chave)
+    if metadados is None:
+        sha256 = hashlib.sha256()
+        mime_type = None
+        for bloco in ler_em_blocos(queryset, campo):
+            if mime_type is None:
+                mime_type = detectar_mime(bloco)
+            sha256.update(bloco)
+        metadados = {
+            'tamanho': linha['_tamanho'],
+            'sha256': sha256.hexdigest(),
+            'mime_type': mime_type,
+        }
+        cache.set(chave, metadados, TEMPO_CACHE_METADADOS)
+    return metadados
+
+
+def _intervalo_solicitado(request, etag, tamanho):
+    """
+    Interpreta o cabeçalho Range (um único intervalo).
+    Retorna (inicio, fim), None para resposta completa ou False se o intervalo não puder ser atendido.
+    """
+    cabecalho = request.headers.get('Range')
+    if not cabecalho:
+        return None
+
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range.strip() != etag:
+        return None
+
+    encontrado = _RANGE_RE.match(cabecalho.strip())
+    if not encontrado or encontrado.groups() == ('', ''):
+        return None
+
+    inicio, fim = encontrado.groups()
+    if inicio == '':
+        sufixo = int(fim)
+        if sufixo == 0:
+            return False
+        return max(tamanho - sufixo, 0), tamanho - 1
+
+    inicio = int(inicio)
+    fim = int(fim) if fim else tamanho - 1
+    if inicio >= tamanho or fim < inicio:
+        return False
+    return inicio, min(fim, tamanho - 1)
+
+
+def responder_anexo(request, queryset, campo, nome_base, metadados):
+    """
+    Resposta de download do blob `campo` em blocos, com suporte a Range,
+    ETag (hash do conteúdo) e revalidação via If-None-Match.
+    """
+    etag = quote_etag(metadados['sha256'])
+
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and (if_none_match.strip() == '*' or etag in parse_etags(if_none_match)):
+        resposta = HttpResponseNotModified()
+        resposta['ETag'] = etag
+        return resposta
+
+    tamanho = metadados['tamanho']
+    intervalo = _intervalo_solicitado(request, etag, tamanho)
+    if intervalo is False:
+        resposta = HttpResponse(status=416)
+        resposta['Content-Range'] = f'bytes */{tamanho}'
+        return resposta
+
+    inicio, fim = intervalo or (0, tamanho - 1)
+    mime_type = metadados.get('mime_type') or 'application/octet-stream'
+    nome_arquivo = metadados.get('nome_original') or f"{nome_base}{mimetypes.guess_extension(mime_type) or '.bin'}"
+
+    resposta = StreamingHttpResponse(
+        ler_em_blocos(queryset, campo, inicio, fim),
+        status=206 if intervalo else 200,
+        content_type=mime_type,
+    )
+    resposta['Content-Length'] = str(fim - inicio + 1)
+    if intervalo:
+        resposta['Content-Range'] = f'bytes {inicio}-{fim}/{tamanho}'
+    resposta['Accept-Ranges'] = 'bytes'
+    resposta['ETag'] = etag
+    resposta['Content-Disposition'] = content_disposition_header(True, nome_arquivo)
+    return resposta
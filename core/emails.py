@@ -0,0 +1,133 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EmailPendente
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE = getattr(settings, 'EMAIL_FILA_TAMANHO_LOTE', 50)
+EMAILS_POR_SEGUNDO = getattr(settings, 'EMAIL_FILA_EMAILS_POR_SEGUNDO', 5)
+MAX_TENTATIVAS = getattr(settings, 'EMAIL_FILA_MAX_TENTATIVAS', 6)
+ESPERA_BASE = 30  # segundos; dobra a cada tentativa
+ESPERA_MAXIMA = 60 * 60
+TEMPO_RESERVA = timedelta(minutes=10)
+
+
+def enfileirar_email(assunto, texto, destinatarios, html='', remetente=None, referencia=''):
+    """Grava o email na fila de saída; o envio fica com o worker."""
+    return EmailPendente.objects.create(
+        assunto=assunto,
+        remetente=remetente or settings.DEFAULT_FROM_EMAIL,
+        destinatarios=list(destinatarios),
+        texto=texto,
+        html=html or '',
+        referencia=referencia,
+    )
+
+
+def antecipar_email(email):
+    """Um email ainda pendente (por exemplo, à espera de nova tentativa) vai para o início da fila."""
+    EmailPendente.objects.filter(pk=email.pk, status=EmailPendente.Status.PENDENTE).update(
+        proxima_tentativa=timezone.now(),
+    )
+
+
+def _reservar_lote(tamanho):
+    """
+    Reserva até `tamanho` emails vencidos para este worker. Emails reservados
+    por um worker que morreu voltam para a fila quando a reserva expira.
+    """
+    agora = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            EmailPendente.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                status__in=[EmailPendente.Status.PENDENTE, EmailPendente.Status.ENVIANDO],
+                proxima_tentativa__lte=agora,
+            )
+            .order_by('proxima_tentativa')
+            .values_list('id', flat=True)[:tamanho]
+        )
+        EmailPendente.objects.filter(id__in=ids).update(
+            status=EmailPendente.Status.ENVIANDO,
+            proxima_tentativa=agora + TEMPO_RESERVA,
+        )
+    return list(EmailPendente.objects.filter(id__in=ids).order_by('proxima_tentativa', 'id'))
+
+
+def _registrar_falha(email, erro):
+    email.tentativas += 1
+    email.ultimo_erro = str(erro)[:2000]
+    if email.tentativas >= MAX_TENTATIVAS:
+        email.status = EmailPendente.Status.FALHOU
+        # Não será mais enviado: o corpo (senha temporária) também é descartado
+        email.texto = ''
+        email.html = ''
+    else:
+        email.status = EmailPendente.Status.PENDENTE
+        espera = min(ESPERA_BASE * 2 ** (email.tentativas - 1), ESPERA_MAXIMA)
+        email.proxima_tentativa = timezone.now() + timedelta(seconds=espera)
+
+
+def processar_lote(tamanho=TAMANHO_LOTE, emails_por_segundo=EMAILS_POR_SEGUNDO):
+    """
+    Envia um lote da fila usando uma única conexão SMTP, respeitando o limite
+    de envios por segundo. Retorna (enviados, falhas).
+    """
+    lote = _reservar_lote(tamanho)
+    if not lote:
+        return 0, 0
+
+    intervalo = 1 / emails_por_segundo if emails_por_segundo else 0
+    enviados, falhas = [], []
+    conexao = get_connection()
+    try:
+        conexao.open()
+        ultimo_envio = 0
+        for email in lote:
+            espera = ultimo_envio + intervalo - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+            ultimo_envio = time.monotonic()
+
+            mensagem = EmailMultiAlternatives(
+                email.assunto, email.texto, email.remetente, email.destinatarios, connection=conexao
+            )
+            if email.html:
+                mensagem.attach_alternative(email.html, 'text/html')
+            try:
+                mensagem.send()
+            except Exception as e:
+                logger.warning("Falha ao enviar email %s: %s", email.id, e)
+                _registrar_falha(email, e)
+                falhas.append(email)
+                # A sessão SMTP pode ter ficado inutilizável
+                conexao.close()
+                conexao.open()
+            else:
+                enviados.append(email.id)
+    except Exception as e:
+        # Sem conexão com o servidor: o resto do lote volta para a fila
+        logger.warning("Falha na conexão SMTP: %s", e)
+        restantes = [email for email in lote if email.id not in enviados and email not in falhas]
+        for email in restantes:
+            _registrar_falha(email, e)
+        falhas.extend(restantes)
+    finally:
+        conexao.close()
+
+    if enviados:
+        # O corpo pode conter senha temporária: não fica guardado depois do envio
+        EmailPendente.objects.filter(id__in=enviados).update(
+            status=EmailPendente.Status.ENVIADO, enviado_em=timezone.now(), texto='', html='',
+        )
+    if falhas:
+        EmailPendente.objects.bulk_update(falhas, ['status', 'tentativas', 'ultimo_erro', 'proxima_tentativa', 'texto', 'html'])
+    return len(enviados), len(falhas)
@@ -0,0 +1,88 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Cidade, Estado, Regiao
+from core.nomes import normalizar_nome
+from core.referencia import invalidar_referencias
+
+ARQUIVO_PADRAO = Path(__file__).resolve().parents[2] / 'dados' / 'ibge.json'
+
+
+def sincronizar(model, queryset, itens, chave, campos):
+    """
+    Upsert em memória pela chave natural: cria o que falta e atualiza só o que
+    mudou, com um bulk_create e um bulk_update. Retorna {chave: instância}.
+    """
+    existentes = {chave(obj): obj for obj in queryset}
+    novos, alterados = [], []
+    for item in itens:
+        obj = existentes.get(chave(model(**item)))
+        if obj is None:
+            obj = model(**item)
+            novos.append(obj)
+            existentes[chave(obj)] = obj
+        elif any(getattr(obj, campo) != item[campo] for campo in campos):
+            for campo in campos:
+                setattr(obj, campo, item[campo])
+            alterados.append(obj)
+
+    model.objects.bulk_create(novos, batch_size=1000)
+    if alterados:
+        model.objects.bulk_update(alterados, campos, batch_size=1000)
+    return existentes, len(novos), len(alterados)
+
+
+class Command(BaseCommand):
+    help = "Carrega regiões, estados e municípios do IBGE a partir do snapshot em core/dados (sem acesso à rede)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--arquivo', default=str(ARQUIVO_PADRAO), help="Snapshot JSON no formato de core/dados/ibge.json.")
+
+    def handle(self, *args, **options):
+        with open(options['arquivo'], encoding='utf-8') as f:
+            dados = json.load(f)
+
+        with transaction.atomic():
+            regioes, criadas, atualizadas = sincronizar(
+                Regiao, Regiao.objects.all(),
+                [
+                    {'nome': r['nome'], 'nome_normalizado': normalizar_nome(r['nome']),
+                     'abreviacao': r['abreviacao'], 'descricao': r['descricao']}
+                    for r in dados['regioes']
+                ],
+                chave=lambda r: normalizar_nome(r.nome),
+                campos=['nome_normalizado', 'abreviacao', 'descricao'],
+            )
+            self.stdout.write(f"Regiões: {criadas} criadas, {atualizadas} atualizadas.")
+
+            regiao_por_codigo = {r['codigo']: regioes[normalizar_nome(r['nome'])] for r in dados['regioes']}
+            estados, criados, atualizados = sincronizar(
+                Estado, Estado.objects.all(),
+                [
+                    {'uf': e['uf'], 'nome': e['nome'], 'nome_normalizado': normalizar_nome(e['nome']),
+                     'regiao_id': regiao_por_codigo[e['regiao']].pk}
+                    for e in dados['estados']
+                ],
+                chave=lambda e: e.uf.upper(),
+                campos=['nome', 'nome_normalizado', 'regiao_id'],
+            )
+            self.stdout.write(f"Estados: {criados} criados, {atualizados} atualizados.")
+
+            _, criados, atualizados = sincronizar(
+                Cidade, Cidade.objects.only('id', 'nome', 'nome_normalizado', 'estado_id'),
+                [
+                    {'nome': nome, 'nome_normalizado': normalizar_nome(nome), 'estado_id': estados[uf].pk}
+                    for _, nome, uf in dados['municipios']
+                ],
+                chave=lambda c: (c.estado_id, normalizar_nome(c.nome)),
+                campos=['nome', 'nome_normalizado'],
+            )
+            self.stdout.write(f"Municípios: {criados} criados, {atualizados} atualizados.")
+
+            # bulk_create/bulk_update não disparam os sinais de core.signals
+            transaction.on_commit(invalidar_referencias)
+
+        self.stdout.write(self.style.SUCCESS("Dados do IBGE carregados."))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.emails import EMAILS_POR_SEGUNDO, TAMANHO_LOTE, processar_lote
+
+
+class Command(BaseCommand):
+    help = "Envia os emails pendentes da fila de saída (EmailPendente)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Continua consultando a fila indefinidamente.")
+        parser.add_argument('--intervalo', type=float, default=5, help="Segundos entre consultas quando a fila está vazia.")
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE)
+        parser.add_argument('--por-segundo', type=float, default=EMAILS_POR_SEGUNDO)
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            enviados, falhas = processar_lote(options['lote'], options['por_segundo'])
+            if enviados or falhas:
+                self.stdout.write(f"{enviados} enviados, {falhas} com falha.")
+
+            if not options['loop']:
+                # Sem --loop, esvazia o que está vencido e termina
+                if not enviados and not falhas:
+                    break
+                continue
+            if not enviados and not falhas:
+                time.sleep(options['intervalo'])
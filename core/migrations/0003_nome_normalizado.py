@@ -0,0 +1,45 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:53
+
+from django.db import migrations, models
+
+from core.nomes import normalizar_nome
+
+
+def preencher_nomes_normalizados(apps, schema_editor):
+    for nome_modelo in ['Regiao', 'Estado', 'Cidade']:
+        modelo = apps.get_model('core', nome_modelo)
+        objetos = list(modelo.objects.only('id', 'nome'))
+        for obj in objetos:
+            obj.nome_normalizado = normalizar_nome(obj.nome)
+        modelo.objects.bulk_update(objetos, ['nome_normalizado'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_fila_emails'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cidade',
+            name='nome_normalizado',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='estado',
+            name='nome_normalizado',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='regiao',
+            name='nome_normalizado',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='estado',
+            name='uf',
+            field=models.CharField(db_index=True, max_length=2),
+        ),
+        migrations.RunPython(preencher_nomes_normalizados, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 14:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_nome_normalizado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailpendente',
+            name='referencia',
+            field=models.CharField(blank=True, db_index=True, max_length=100),
+        ),
+    ]
@@ -1,10 +1,17 @@
 from django.db import models
+from django.utils import timezone
 
-class Regiao(models.Model):
+from .nomes import NomeNormalizadoMixin
+
+
+class Regiao(NomeNormalizadoMixin, models.Model):
     nome = models.CharField(max_length=100)
+    nome_normalizado = models.CharField(max_length=100, db_index=True, editable=False, default='')
     abreviacao = models.CharField(max_length=3)
     descricao = models.CharField(max_length=100)
 
+    campo_sigla = 'abreviacao'
+
     class Meta:
         unique_together = ('nome', 'descricao')
 
@@ -12,17 +19,21 @@ class Regiao(models.Model):
         return self.nome
 
 
-class Estado(models.Model):
-    uf = models.CharField(max_length=2)  # Ex: 'SP'
+class Estado(NomeNormalizadoMixin, models.Model):
+    uf = models.CharField(max_length=2, db_index=True)  # Ex: 'SP'
     nome = models.CharField(max_length=100)  # Ex: 'São Paulo'
+    nome_normalizado = models.CharField(max_length=100, db_index=True, editable=False, default='')  # Ex: 'sao paulo'
     regiao = models.ForeignKey(Regiao, on_delete=models.CASCADE, related_name='estados')
 
+    campo_sigla = 'uf'
+
     def __str__(self):
         return self.nome
 
 
-class Cidade(models.Model):
+class Cidade(NomeNormalizadoMixin, models.Model):
     nome = models.CharField(max_length=100)
+    nome_normalizado = models.CharField(max_length=100, db_index=True, editable=False, default='')
     estado = models.ForeignKey(Estado, on_delete=models.CASCADE, related_name='cidades')
 
     def __str__(self):
@@ -42,3 +53,35 @@ class Instituicao(models.Model):
 
     def __str__(self):
         return self.nome
+
+
+class EmailPendente(models.Model):
+    """Email na fila de saída, enviado em lote por `processar_fila_emails`."""
+
+    class Status(models.TextChoices):
+        PENDENTE = 'pendente', 'Pendente'
+        ENVIANDO = 'enviando', 'Enviando'
+        ENVIADO = 'enviado', 'Enviado'
+        FALHOU = 'falhou', 'Falhou'
+
+    assunto = models.CharField(max_length=255)
+    remetente = models.CharField(max_length=255)
+    destinatarios = models.JSONField(default=list)
+    texto = models.TextField(blank=True)
+    html = models.TextField(blank=True)
+
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDENTE)
+    tentativas = models.PositiveIntegerField(default=0)
+    # Próximo envio (pendente) ou fim da reserva do worker (enviando)
+    proxima_tentativa = models.DateTimeField(default=timezone.now)
+    ultimo_erro = models.TextField(blank=True)
+    # Identifica o email para quem o enfileirou (ex.: 'recuperacao_senha:<id da usuária>')
+    referencia = models.CharField(max_length=100, blank=True, db_index=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    enviado_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'proxima_tentativa'])]
+
+    def __str__(self):
+        return f"{self.assunto} → {', '.join(self.destinatarios)} ({self.status})"
@@ -0,0 +1,117 @@
+import hashlib
+import re
+import unicodedata
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from .referencia import versao_vigente
+
+_HIFENS = re.compile(r'[-‐‑–—]')
+# "Campinas - SP", "Campinas/SP"
+_NOME_COM_UF = re.compile(r'^(?P<nome>.+?)\s*[-/]\s*(?P<uf>[A-Za-z]{2})$')
+TEMPO_CACHE_IDS = 60 * 60
+
+
+def normalizar_nome(texto):
+    """
+    Chave de comparação sem acentos, caixa, hífens ou espaços repetidos:
+    'São  Paulo' → 'sao paulo', 'Centro-Oeste' → 'centro oeste'.
+    """
+    texto = unicodedata.normalize('NFKD', str(texto or '')).replace('’', "'")
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(_HIFENS.sub(' ', texto).casefold().split())
+
+
+class NomeNormalizadoMixin:
+    """Mantém `nome_normalizado` em dia a cada save(). Caminhos em lote devem preenchê-lo."""
+
+    def save(self, *args, **kwargs):
+        self.nome_normalizado = normalizar_nome(self.nome)
+        super().save(*args, **kwargs)
+
+
+def resolver_ids(model, valores):
+    """
+    Converte nomes livres, siglas ou ids em chaves primárias de Regiao, Estado
+    ou Cidade com uma única consulta indexada. Retorna {valor: [ids]}, com
+    lista vazia para o que não foi encontrado. Para Cidade, aceita também
+    "Nome - UF" para desambiguar homônimas.
+    """
+    valores = [str(v).strip() for v in valores if str(v).strip()]
+    campo_sigla = getattr(model, 'campo_sigla', None)
+
+    ids, nomes, siglas, nomes_com_uf = set(), set(), set(), set()
+    for valor in valores:
+        if valor.isdigit():
+            ids.add(int(valor))
+            continue
+        nomes.add(normalizar_nome(valor))
+        if campo_sigla:
+            siglas.add(valor.upper())
+        elif model._meta.model_name == 'cidade':
+            encontrado = _NOME_COM_UF.match(valor)
+            if encontrado:
+                nomes_com_uf.add((normalizar_nome(encontrado['nome']), encontrado['uf'].upper()))
+
+    if not valores:
+        return {}
+
+    filtro = Q(pk__in=ids) | Q(nome_normalizado__in=nomes)
+    colunas = ['pk', 'nome_normalizado']
+    if campo_sigla:
+        filtro |= Q(**{f'{campo_sigla}__in': siglas})
+        colunas.append(campo_sigla)
+    if nomes_com_uf:
+        filtro |= Q(nome_normalizado__in={nome for nome, _ in nomes_com_uf}, estado__uf__in={uf for _, uf in nomes_com_uf})
+        colunas.append('estado__uf')
+
+    por_id, por_nome, por_sigla, por_nome_uf = {}, defaultdict(list), defaultdict(list), defaultdict(list)
+    for linha in model.objects.filter(filtro).values_list(*colunas):
+        pk, nome = linha[0], linha[1]
+        por_id[pk] = pk
+        por_nome[nome].append(pk)
+        if campo_sigla:
+            por_sigla[linha[2]].append(pk)
+        if nomes_com_uf:
+            por_nome_uf[(nome, linha[-1])].append(pk)
+
+    resultado = {}
+    for valor in valores:
+        if valor.isdigit():
+            resultado[valor] = [por_id[int(valor)]] if int(valor) in por_id else []
+            continue
+        encontrados = por_nome.get(normalizar_nome(valor)) or por_sigla.get(valor.upper())
+        if not encontrados and nomes_com_uf:
+            encontrado = _NOME_COM_UF.match(valor)
+            if encontrado:
+                encontrados = por_nome_uf.get((normalizar_nome(encontrado['nome']), encontrado['uf'].upper()))
+        resultado[valor] = list(encontrados or [])
+    return resultado
+
+
+def ids_resolvidos(model, valores):
+    """Todos os ids encontrados para os valores, sem distinção de origem."""
+    return {pk for ids in resolver_ids(model, valores).values() for pk in ids}
+
+
+def ids_resolvidos_em_cache(model, valores):
+    """
+    Como ids_resolvidos, com o resultado no cache 'default' para cada
+    conjunto de valores. A chave inclui a versão dos dados de referência
+    (core.referencia), então alterar regiões, estados ou cidades invalida
+    as resoluções guardadas.
+    """
+    # A resolução não diferencia maiúsculas, então a chave também não
+    chaves = sorted({' '.join(str(v).split()).casefold() for v in valores} - {''})
+    if not chaves:
+        return set()
+    resumo = hashlib.sha256('\x1f'.join(chaves).encode()).hexdigest()
+    versao, periodo = versao_vigente()
+    chave = f'nomes:{model._meta.label_lower}:{versao}.{periodo}:{resumo}'
+    ids = cache.get(chave)
+    if ids is None:
+        ids = ids_resolvidos(model, valores)
+        cache.set(chave, ids, TEMPO_CACHE_IDS)
+    return ids
@@ -0,0 +1,179 @@
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def estimar_contagem(queryset):
+    """Linhas estimadas pelo planejador do PostgreSQL, sem contá-las; None nos outros bancos."""
+    conexao = connections[queryset.db]
+    if conexao.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with conexao.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plano = cursor.fetchone()[0]
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    return int(plano[0]['Plan']['Plan Rows'])
+
+
+def contar_com_cache(queryset, tempo=60, estimada=False, limite_exato=None):
+    """
+    Retorna (total, estimada). O total exato fica em cache por `tempo`
+    segundos, com a chave derivada do SQL da consulta, de modo que filtros
+    equivalentes (nome, sigla ou id do mesmo estado, por exemplo) dividem a
+    mesma entrada. Com `estimada`, ou quando a estimativa passa de
+    `limite_exato`, devolve a estimativa do banco sem contar as linhas.
+    O cache é consultado antes: a estimativa (EXPLAIN) só roda quando não há
+    total nem estimativa guardados, e também fica em cache.
+    """
+    queryset = queryset.order_by()
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        # Filtro que o Django já sabe que não casa com nada (um __in vazio, por exemplo)
+        return 0, False
+    chave = f"contagem:{queryset.db}:{hashlib.sha256(repr((sql, params)).encode()).hexdigest()}"
+    chave_estimativa = f"{chave}:estimada"
+    guardados = cache.get_many([chave, chave_estimativa])
+    if chave in guardados:
+        return guardados[chave], False
+
+    if estimada or limite_exato is not None:
+        estimativa = guardados.get(chave_estimativa)
+        if estimativa is None:
+            estimativa = estimar_contagem(queryset)
+            if estimativa is not None:
+                cache.set(chave_estimativa, estimativa, tempo)
+        if estimativa is not None and (estimada or estimativa > limite_exato):
+            return estimativa, True
+
+    total = queryset.count()
+    cache.set(chave, total, tempo)
+    return total, False
+
+
+class PaginacaoKeyset(BasePagination):
+    """
+    Paginação por cursor (keyset) sobre uma ordenação única, por exemplo
+    ('nome', 'id'). A próxima página é filtrada a partir dos valores da última
+    linha, então o custo não cresce com a profundidade da página, ao contrário
+    de OFFSET. Campos com '-' são ordenados de forma decrescente.
+
+    Com `contar`, a primeira página também traz `count` (ver contar_com_cache);
+    `?contagem=estimada` pede a estimativa do banco em vez do total exato.
+    """
+    ordenacao = ('id',)
+    tamanho_pagina = 50
+    tamanho_maximo = 500
+    cursor_query_param = 'cursor'
+    tamanho_query_param = 'limite'
+    contagem_query_param = 'contagem'
+    contar = False
+    tempo_cache_contagem = 60
+    limite_contagem_exata = None
+
+    def _tamanho(self, request):
+        try:
+            tamanho = int(request.query_params.get(self.tamanho_query_param, self.tamanho_pagina))
+        except ValueError:
+            return self.tamanho_pagina
+        return max(1, min(tamanho, self.tamanho_maximo))
+
+    def _campo(self, queryset, nome):
+        if nome in queryset.query.annotations:
+            return queryset.query.annotations[nome].output_field
+        return queryset.model._meta.get_field(nome)
+
+    def _decodificar(self, cursor, queryset):
+        """
+        Valores do cursor convertidos pelo to_python do campo de cada
+        ordenação: um cursor adulterado vira 404, não erro no banco.
+        """
+        try:
+            valores = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        except (ValueError, TypeError):
+            raise NotFound('Cursor inválido.')
+        if not isinstance(valores, list) or len(valores) != len(self.ordenacao):
+            raise NotFound('Cursor inválido.')
+        try:
+            return [
+                self._campo(queryset, campo.lstrip('-')).to_python(valor)
+                for campo, valor in zip(self.ordenacao, valores)
+            ]
+        except (ValidationError, FieldDoesNotExist, TypeError, ValueError):
+            raise NotFound('Cursor inválido.')
+
+    def _codificar(self, objeto):
+        valores = []
+        for campo in self.ordenacao:
+            valor = getattr(objeto, campo.lstrip('-'))
+            valores.append(valor if valor is None or isinstance(valor, (int, float, str)) else str(valor))
+        return base64.urlsafe_b64encode(json.dumps(valores).encode()).decode('ascii')
+
+    def _depois_de(self, valores):
+        """(a > x) OR (a = x AND b > y) OR ..., respeitando a direção de cada campo."""
+        filtro = Q()
+        iguais = Q()
+        for campo, valor in zip(self.ordenacao, valores):
+            nome = campo.lstrip('-')
+            operador = 'lt' if campo.startswith('-') else 'gt'
+            filtro |= iguais & Q(**{f'{nome}__{operador}': valor})
+            iguais &= Q(**{nome: valor})
+        return filtro
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        tamanho = self._tamanho(request)
+        queryset = queryset.order_by(*self.ordenacao)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        self.contagem = None
+        if self.contar and not cursor:
+            self.contagem = contar_com_cache(
+                queryset,
+                self.tempo_cache_contagem,
+                estimada=request.query_params.get(self.contagem_query_param) == 'estimada',
+                limite_exato=self.limite_contagem_exata,
+            )
+        if cursor:
+            queryset = queryset.filter(self._depois_de(self._decodificar(cursor, queryset)))
+
+        pagina = list(queryset[:tamanho + 1])
+        self.tem_proxima = len(pagina) > tamanho
+        pagina = pagina[:tamanho]
+        self.proximo_cursor = self._codificar(pagina[-1]) if self.tem_proxima else None
+        return pagina
+
+    def get_next_link(self):
+        if not self.proximo_cursor:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.proximo_cursor)
+
+    def get_paginated_response(self, data):
+        resposta = {'next': self.get_next_link(), 'results': data}
+        if self.contagem is not None:
+            total, estimada = self.contagem
+            resposta = {'count': total, 'contagem_estimada': estimada, **resposta}
+        return Response(resposta)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'description': 'Só na primeira página, quando a paginação conta.'},
+                'contagem_estimada': {'type': 'boolean'},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
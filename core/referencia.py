@@ -0,0 +1,89 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
+from rest_framework.renderers import JSONRenderer
+
+CHAVE_VERSAO = 'referencia:versao'
+# Sem cache compartilhado (REDIS_URL), a versão vive em cada processo e um
+# incremento não chega aos demais: o que é montado a partir dela vale então
+# no máximo este tempo. None quando o cache 'default' é compartilhado.
+TEMPO_LOCAL = getattr(settings, 'CACHE_LOCAL_SEGUNDOS', None)
+
+# {chave: (versao, conteudo, etag)}: payloads JSON já renderizados, por processo
+_payloads = {}
+
+
+def versao_atual(chave=CHAVE_VERSAO):
+    """
+    Versão dos dados de referência (ou de outra `chave`), guardada no cache
+    'default' para ser compartilhada entre os processos. Começa num timestamp
+    para que, se a chave for perdida, a nova versão nunca repita uma já vista.
+    """
+    versao = cache.get(chave)
+    if versao is None:
+        cache.add(chave, time.time_ns(), None)
+        versao = cache.get(chave)
+    return versao
+
+
+def versao_vigente(chave=CHAVE_VERSAO):
+    """
+    Versão para conferir o que foi montado em memória ou no cache: a versão
+    atual e, com cache local, o período de TEMPO_LOCAL em curso, de modo que
+    alterações feitas em outro processo apareçam no máximo um período depois.
+    """
+    periodo = int(time.time() // TEMPO_LOCAL) if TEMPO_LOCAL else 0
+    return versao_atual(chave), periodo
+
+
+def invalidar_referencias(chave=CHAVE_VERSAO):
+    """Torna obsoletos todos os payloads em cache (em todos os processos)."""
+    try:
+        cache.incr(chave)
+    except ValueError:
+        cache.set(chave, time.time_ns(), None)
+
+
+def obter_payload(chave, gerar_dados):
+    """Retorna (conteudo, etag) da chave, renderizando gerar_dados() só quando a versão muda."""
+    versao = versao_vigente()
+    item = _payloads.get(chave)
+    if item is None or item[0] != versao:
+        conteudo = JSONRenderer().render(gerar_dados())
+        item = (versao, conteudo, quote_etag(hashlib.sha256(conteudo).hexdigest()))
+        _payloads[chave] = item
+    return item[1], item[2]
+
+
+def responder_referencia(request, chave, gerar_dados):
+    """Resposta JSON pré-serializada com ETag forte e 304 em If-None-Match."""
+    conteudo, etag = obter_payload(chave, gerar_dados)
+
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and (if_none_match.strip() == '*' or etag in parse_etags(if_none_match)):
+        resposta = HttpResponseNotModified()
+    else:
+        resposta = HttpResponse(conteudo, content_type='application/json')
+    resposta['ETag'] = etag
+    resposta['Cache-Control'] = 'no-cache'
+    return resposta
+
+
+class ReferenciaEmCacheMixin:
+    """
+    list() servido de um payload pré-serializado, por endpoint e por filtro
+    da URL. Escritas nas tabelas de referência invalidam via core.signals.
+    """
+
+    def chave_referencia(self):
+        filtros = ':'.join(f'{k}={str(v).lower()}' for k, v in sorted(self.kwargs.items()))
+        return f'{self.__class__.__name__}:{filtros}'
+
+    def list(self, request, *args, **kwargs):
+        def gerar_dados():
+            return self.get_serializer(self.filter_queryset(self.get_queryset()), many=True).data
+        return responder_referencia(request, self.chave_referencia(), gerar_dados)
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Regiao, Estado, Cidade, Instituicao
+from .nomes import normalizar_nome, resolver_ids
 from users.models import Genero, Raca, Deficiencia
 
 class RegiaoSerializer(serializers.ModelSerializer):
@@ -11,15 +12,16 @@ class CidadeBulkSerializer(serializers.ListSerializer):
     def create(self, validated_data):
         cidades = []
         erros = []
+        # Uma consulta para o lote inteiro
+        estados = resolver_ids(Estado, [item['estado_nome'] for item in validated_data])
 
         for item in validated_data:
             estado_nome = item.pop('estado_nome')
-            try:
-                estado = Estado.objects.get(nome__iexact=estado_nome)
-                cidade = Cidade(estado=estado, **item)
-                cidades.append(cidade)
-            except Estado.DoesNotExist:
+            estado_ids = estados.get(estado_nome.strip())
+            if not estado_ids:
                 erros.append(f"Estado '{estado_nome}' não encontrado para cidade '{item.get('nome')}'.")
+                continue
+            cidades.append(Cidade(estado_id=estado_ids[0], nome_normalizado=normalizar_nome(item['nome']), **item))
 
         if erros:
             raise serializers.ValidationError({"erros": erros})
@@ -36,11 +38,10 @@ class EstadoSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         regiao_nome = validated_data.pop('regiao_nome')
-        try:
-            regiao = Regiao.objects.get(nome__iexact=regiao_nome)
-        except Regiao.DoesNotExist:
+        regioes = resolver_ids(Regiao, [regiao_nome]).get(regiao_nome.strip())
+        if not regioes:
             raise serializers.ValidationError(f"Região '{regiao_nome}' não encontrada.")
-        return Estado.objects.create(regiao=regiao, **validated_data)
+        return Estado.objects.create(regiao_id=regioes[0], **validated_data)
 
 
 class CidadeSerializer(serializers.ModelSerializer):
@@ -54,11 +55,10 @@ class CidadeSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         estado_nome = validated_data.pop('estado_nome')
-        try:
-            estado = Estado.objects.get(nome__iexact=estado_nome)
-        except Estado.DoesNotExist:
+        estados = resolver_ids(Estado, [estado_nome]).get(estado_nome.strip())
+        if not estados:
             raise serializers.ValidationError(f"Estado '{estado_nome}' não encontrado.")
-        return Cidade.objects.create(estado=estado, **validated_data)
+        return Cidade.objects.create(estado_id=estados[0], **validated_data)
 
 
 class InstituicaoSerializer(serializers.ModelSerializer):
@@ -74,11 +74,12 @@ class InstituicaoSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         cidade_nome = validated_data.pop('cidade_nome')
-        try:
-            cidade = Cidade.objects.get(nome__iexact=cidade_nome)
-        except Cidade.DoesNotExist:
+        cidades = resolver_ids(Cidade, [cidade_nome]).get(cidade_nome.strip())
+        if not cidades:
             raise serializers.ValidationError(f"Cidade '{cidade_nome}' não encontrada.")
-        return Instituicao.objects.create(cidade=cidade, **validated_data)
+        if len(cidades) > 1:
+            raise serializers.ValidationError(f"Há mais de uma cidade chamada '{cidade_nome}'. Informe no formato 'Nome - UF'.")
+        return Instituicao.objects.create(cidade_id=cidades[0], **validated_data)
 
 class RacaSerializer(serializers.ModelSerializer):
     class Meta:
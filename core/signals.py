@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+
+from users.models import Deficiencia, Genero, Raca
+from .models import Cidade, Estado, Instituicao, Regiao
+from .referencia import invalidar_referencias
+
+# Instituicao entra por causa do índice de core.autocomplete
+MODELOS_REFERENCIA = [Regiao, Estado, Cidade, Instituicao, Genero, Raca, Deficiencia]
+
+
+def referencia_alterada(sender, **kwargs):
+    invalidar_referencias()
+
+
+for modelo in MODELOS_REFERENCIA:
+    post_save.connect(referencia_alterada, sender=modelo, dispatch_uid=f'referencia_save_{modelo.__name__}')
+    post_delete.connect(referencia_alterada, sender=modelo, dispatch_uid=f'referencia_delete_{modelo.__name__}')
@@ -1,3 +1,354 @@
-from django.test import TestCase
+import json
+import os
+import socketserver
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
+from email import message_from_bytes
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from core import referencia
+from core.autocomplete import autocompletar
+from core.downloads import TAMANHO_BLOCO, ler_em_blocos
+from core.pagination import contar_com_cache
+from core.emails import MAX_TENTATIVAS, enfileirar_email, processar_lote
+from core.models import Cidade, EmailPendente, Estado, Instituicao, Regiao
+from core.nomes import ids_resolvidos_em_cache, normalizar_nome, resolver_ids
+from users.models import User, UserAnexo
+
+
+class LerEmBlocosTests(TestCase):
+    def setUp(self):
+        usuaria = User.objects.create_user(email='blocos@example.com', cpf='52998224725', password='x')
+        self.conteudo = bytes(range(256)) * (TAMANHO_BLOCO * 3 // 256 + 7)
+        UserAnexo.objects.create(usuario=usuaria, campo='foto', conteudo=self.conteudo)
+        self.queryset = UserAnexo.objects.filter(usuario=usuaria, campo='foto')
+
+    def test_le_o_blob_inteiro_em_varios_blocos(self):
+        blocos = list(ler_em_blocos(self.queryset, 'conteudo'))
+        self.assertEqual(len(blocos), 4)
+        self.assertEqual(b''.join(blocos), self.conteudo)
+
+    def test_intervalo_entre_blocos(self):
+        inicio, fim = TAMANHO_BLOCO - 10, 2 * TAMANHO_BLOCO + 5
+        self.assertEqual(b''.join(ler_em_blocos(self.queryset, 'conteudo', inicio, fim)), self.conteudo[inicio:fim + 1])
+
+
+class ServidorSMTPLocal(socketserver.ThreadingTCPServer):
+    """
+    Servidor SMTP mínimo em 127.0.0.1 para os testes da fila de emails.
+    Guarda as mensagens recebidas e recusa (550) os destinatários em `recusados`.
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, recusados=()):
+        super().__init__(('127.0.0.1', 0), _SessaoSMTP)
+        self.recusados = set(recusados)
+        self.mensagens = []
+
+    @property
+    def porta(self):
+        return self.server_address[1]
+
+    def configuracao(self):
+        return override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.porta,
+            EMAIL_USE_TLS=False, EMAIL_USE_SSL=False,
+            EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+        )
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *erro):
+        self.shutdown()
+        self.server_close()
+
+
+class _SessaoSMTP(socketserver.StreamRequestHandler):
+    def responder(self, linha):
+        self.wfile.write(linha.encode() + b'\r\n')
+
+    def handle(self):
+        self.responder('220 localhost')
+        destinatarios = []
+        for linha in self.rfile:
+            comando = linha.decode().strip()
+            verbo = comando[:4].upper()
+            if verbo in ('EHLO', 'HELO'):
+                self.responder('250 localhost')
+            elif verbo == 'MAIL':
+                destinatarios = []
+                self.responder('250 OK')
+            elif verbo == 'RCPT':
+                endereco = comando.split(':', 1)[1].strip().strip('<>')
+                if endereco in self.server.recusados:
+                    self.responder('550 Destinatario recusado')
+                else:
+                    destinatarios.append(endereco)
+                    self.responder('250 OK')
+            elif verbo == 'DATA':
+                self.responder('354 Fim com <CRLF>.<CRLF>')
+                corpo = b''.join(iter(lambda: self.rfile.readline(), b'.\r\n'))
+                self.server.mensagens.append((destinatarios, message_from_bytes(corpo)))
+                self.responder('250 OK')
+            elif verbo == 'QUIT':
+                self.responder('221 Tchau')
+                return
+            else:
+                self.responder('250 OK')
+
+
+class FilaEmailsTests(TestCase):
+    def test_envia_pelo_smtp_e_descarta_o_corpo(self):
+        email = enfileirar_email('Assunto', 'Sua nova senha é: abc', ['bia@example.com'], html='<p>abc</p>')
+
+        with ServidorSMTPLocal() as servidor, servidor.configuracao():
+            self.assertEqual(processar_lote(emails_por_segundo=0), (1, 0))
+
+        destinatarios, mensagem = servidor.mensagens[0]
+        self.assertEqual(destinatarios, ['bia@example.com'])
+        self.assertEqual(mensagem['Subject'], 'Assunto')
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.texto, email.html), (EmailPendente.Status.ENVIADO, '', ''))
+
+    def test_falha_definitiva_descarta_o_corpo(self):
+        email = enfileirar_email('Assunto', 'Sua nova senha é: abc', ['recusada@example.com'], html='<p>abc</p>')
+        EmailPendente.objects.filter(pk=email.pk).update(tentativas=MAX_TENTATIVAS - 1)
+        enfileirar_email('Outro', 'ok', ['bia@example.com'])
+
+        with ServidorSMTPLocal(recusados=['recusada@example.com']) as servidor, servidor.configuracao():
+            self.assertEqual(processar_lote(emails_por_segundo=0), (1, 1))
+
+        self.assertEqual(len(servidor.mensagens), 1)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.texto, email.html), (EmailPendente.Status.FALHOU, '', ''))
+        self.assertIn('recusado', email.ultimo_erro)
+
+    def test_falha_temporaria_mantem_o_email_na_fila(self):
+        email = enfileirar_email('Assunto', 'Sua nova senha é: abc', ['recusada@example.com'])
+
+        with ServidorSMTPLocal(recusados=['recusada@example.com']) as servidor, servidor.configuracao():
+            self.assertEqual(processar_lote(emails_por_segundo=0), (0, 1))
+
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.tentativas, email.texto), (EmailPendente.Status.PENDENTE, 1, 'Sua nova senha é: abc'))
+
+
+class ReferenciaVersaoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        referencia._payloads.clear()
+        regiao = Regiao.objects.create(nome='Nordeste', abreviacao='NE', descricao='Nordeste')
+        self.estado = Estado.objects.create(uf='PE', nome='Pernambuco', regiao=regiao)
+        Cidade.objects.create(nome='Recife', estado=self.estado)
+
+    def nomes_cidades(self):
+        return str(autocompletar('cidade', 'ol'))
+
+    def test_invalidacao_reconstroi_o_indice(self):
+        self.assertNotIn('Olinda', self.nomes_cidades())
+        Cidade.objects.create(nome='Olinda', estado=self.estado)
+        self.assertIn('Olinda', self.nomes_cidades())
+
+    def test_payload_refeito_quando_a_versao_muda(self):
+        dados = iter([{'n': 1}, {'n': 2}])
+        primeiro, _ = referencia.obter_payload('teste', lambda: next(dados))
+        self.assertEqual(referencia.obter_payload('teste', lambda: next(dados))[0], primeiro)
+
+        referencia.invalidar_referencias()
+
+        self.assertEqual(referencia.obter_payload('teste', lambda: next(dados))[0], b'{"n":2}')
+
+    def test_cache_local_expira_sem_a_invalidacao_de_outro_processo(self):
+        with mock.patch.object(referencia, 'TEMPO_LOCAL', 60), \
+                mock.patch.object(referencia.time, 'time', return_value=1000.0) as relogio:
+            self.assertNotIn('Olinda', self.nomes_cidades())
+            # Gravação feita por outro worker: o incremento da versão não chega aqui
+            Cidade.objects.bulk_create([Cidade(nome='Olinda', nome_normalizado='olinda', estado=self.estado)])
+            self.assertNotIn('Olinda', self.nomes_cidades())
+
+            relogio.return_value = 1000.0 + 60
+            self.assertIn('Olinda', self.nomes_cidades())
+
+
+class ContarComCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Regiao.objects.create(nome='Nordeste', abreviacao='NE', descricao='Nordeste')
+        self.queryset = Regiao.objects.filter(abreviacao='NE')
+
+    def test_total_em_cache_dispensa_a_estimativa(self):
+        with mock.patch('core.pagination.estimar_contagem', return_value=None) as estimar:
+            self.assertEqual(contar_com_cache(self.queryset, limite_exato=1000), (1, False))
+            self.assertEqual(estimar.call_count, 1)
+            Regiao.objects.create(nome='Norte', abreviacao='NE', descricao='Norte')
+
+            self.assertEqual(contar_com_cache(self.queryset, limite_exato=1000), (1, False))
+            self.assertEqual(estimar.call_count, 1)
+
+    def test_estimativa_acima_do_limite_fica_em_cache(self):
+        with mock.patch('core.pagination.estimar_contagem', return_value=5000) as estimar:
+            self.assertEqual(contar_com_cache(self.queryset, limite_exato=1000), (5000, True))
+            self.assertEqual(contar_com_cache(self.queryset, limite_exato=1000), (5000, True))
+
+        self.assertEqual(estimar.call_count, 1)
+
+    def test_filtro_que_nao_casa_com_nada(self):
+        self.assertEqual(contar_com_cache(Regiao.objects.filter(pk__in=[]), limite_exato=1000), (0, False))
+
+
+class CarregarIbgeTests(TestCase):
+    def carregar(self, dados=None):
+        saida = StringIO()
+        if dados is None:
+            call_command('carregar_ibge', stdout=saida)
+            return saida.getvalue()
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False, encoding='utf-8') as arquivo:
+            json.dump(dados, arquivo)
+        self.addCleanup(os.remove, arquivo.name)
+        call_command('carregar_ibge', arquivo=arquivo.name, stdout=saida)
+        return saida.getvalue()
+
+    def test_snapshot_completo_sem_rede_e_idempotente(self):
+        self.carregar()
+        self.assertEqual((Regiao.objects.count(), Estado.objects.count(), Cidade.objects.count()), (5, 27, 5571))
+        self.assertFalse(Cidade.objects.filter(nome_normalizado='').exists())
+        self.assertEqual(Cidade.objects.get(nome='São Paulo').estado.uf, 'SP')
+
+        saida = self.carregar()
+
+        self.assertIn('Municípios: 0 criados, 0 atualizados.', saida)
+        self.assertEqual(Cidade.objects.count(), 5571)
+
+    def test_upsert_pela_chave_natural(self):
+        regiao = Regiao.objects.create(nome='Nordeste', abreviacao='NE', descricao='antiga')
+        estado = Estado.objects.create(uf='PE', nome='Pernambuco', regiao=regiao)
+        recife = Cidade.objects.create(nome='RECIFE', estado=estado)
+
+        saida = self.carregar({
+            'regioes': [{'codigo': 2, 'nome': 'Nordeste', 'abreviacao': 'NE', 'descricao': 'Região Nordeste'}],
+            'estados': [{'codigo': 26, 'uf': 'PE', 'nome': 'Pernambuco', 'regiao': 2}],
+            'municipios': [[2611606, 'Recife', 'PE'], [2609600, 'Olinda', 'PE']],
+        })
+
+        self.assertIn('Regiões: 0 criadas, 1 atualizadas.', saida)
+        self.assertIn('Municípios: 1 criados, 1 atualizados.', saida)
+        recife.refresh_from_db()
+        self.assertEqual(recife.nome, 'Recife')
+        self.assertEqual(Regiao.objects.get().descricao, 'Região Nordeste')
+        self.assertEqual(set(Cidade.objects.values_list('nome', flat=True)), {'Recife', 'Olinda'})
+
+
+class ResolverNomesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        referencia._payloads.clear()
+        sudeste = Regiao.objects.create(nome='Sudeste', abreviacao='SE', descricao='Sudeste')
+        centro_oeste = Regiao.objects.create(nome='Centro-Oeste', abreviacao='CO', descricao='Centro-Oeste')
+        self.sp = Estado.objects.create(uf='SP', nome='São Paulo', regiao=sudeste)
+        self.go = Estado.objects.create(uf='GO', nome='Goiás', regiao=centro_oeste)
+        self.campinas = Cidade.objects.create(nome='Campinas', estado=self.sp)
+        self.sao_paulo = Cidade.objects.create(nome='São Paulo', estado=self.sp)
+        # Homônima em outro estado
+        self.campinas_go = Cidade.objects.create(nome='Campinas', estado=self.go)
+
+    def test_normalizar_nome(self):
+        self.assertEqual(normalizar_nome('  São   Paulo '), 'sao paulo')
+        self.assertEqual(normalizar_nome('Centro–Oeste'), 'centro oeste')
+        self.assertEqual(normalizar_nome("Alta Floresta D’Oeste"), "alta floresta d'oeste")
+        self.assertEqual(self.sao_paulo.nome_normalizado, 'sao paulo')
+
+    def test_nomes_siglas_e_ids_numa_consulta(self):
+        with self.assertNumQueries(1):
+            resolvidos = resolver_ids(Estado, ['sao paulo', 'go', str(self.sp.pk), 'Bahia', ''])
+
+        self.assertEqual(resolvidos, {
+            'sao paulo': [self.sp.pk], 'go': [self.go.pk], str(self.sp.pk): [self.sp.pk], 'Bahia': [],
+        })
+
+    def test_cidade_homonima_desambiguada_pela_uf(self):
+        resolvidos = resolver_ids(Cidade, ['campinas', 'Campinas - SP', 'CAMPINAS/go'])
+
+        self.assertCountEqual(resolvidos['campinas'], [self.campinas.pk, self.campinas_go.pk])
+        self.assertEqual(resolvidos['Campinas - SP'], [self.campinas.pk])
+        self.assertEqual(resolvidos['CAMPINAS/go'], [self.campinas_go.pk])
+
+    def test_resolucao_em_cache_invalidada_pelos_dados_de_referencia(self):
+        self.assertEqual(ids_resolvidos_em_cache(Cidade, ['Sao Paulo']), {self.sao_paulo.pk})
+        with self.assertNumQueries(0):
+            self.assertEqual(ids_resolvidos_em_cache(Cidade, [' SAO  PAULO']), {self.sao_paulo.pk})
+
+        self.sao_paulo.nome = 'Sampa'
+        self.sao_paulo.save()
+
+        self.assertEqual(ids_resolvidos_em_cache(Cidade, ['Sao Paulo']), set())
+
+    def test_rotas_por_nome_sem_acento(self):
+        cliente = APIClient()
+
+        estados = cliente.get('/api/regioes/centro oeste/estados/')
+        cidades = cliente.get('/api/estados/Sao Paulo/cidades/')
+
+        self.assertEqual([estado['uf'] for estado in estados.json()], ['GO'])
+        self.assertCountEqual([cidade['nome'] for cidade in cidades.json()], ['Campinas', 'São Paulo'])
+        self.assertEqual(cliente.get('/api/estados/Narnia/cidades/').status_code, 404)
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        sudeste = Regiao.objects.create(nome='Sudeste', abreviacao='SE', descricao='Sudeste')
+        sp = Estado.objects.create(uf='SP', nome='São Paulo', regiao=sudeste)
+        rj = Estado.objects.create(uf='RJ', nome='Rio de Janeiro', regiao=sudeste)
+        for nome in ['São Paulo', 'São Carlos', 'Santos', 'Campinas', 'Ilha Comprida', 'Poá']:
+            Cidade.objects.create(nome=nome, estado=sp)
+        self.sao_goncalo = Cidade.objects.create(nome='São Gonçalo', estado=rj)
+        Cidade.objects.create(nome='Rio de Janeiro', estado=rj)
+        Instituicao.objects.create(
+            nome='Escola Estadual Santos Dumont', email='escola@example.com', cidade=self.sao_goncalo,
+            bairro='Centro', rua='Rua A', numero='1',
+        )
+
+    def nomes(self, tipo, prefixo, estado=None, limite=10):
+        return [item['nome'] for item in autocompletar(tipo, prefixo, estado, limite)]
+
+    def test_prefixo_sem_acento_e_por_palavra(self):
+        self.assertEqual(self.nomes('cidade', 'sao'), ['São Carlos', 'São Gonçalo', 'São Paulo'])
+        # Nome inteiro antes de palavra do meio; "de" não inicia busca
+        self.assertEqual(self.nomes('cidade', 'c'), ['Campinas', 'São Carlos', 'Ilha Comprida'])
+        self.assertEqual(self.nomes('cidade', 'janeiro'), ['Rio de Janeiro'])
+        self.assertEqual(self.nomes('cidade', 'de'), [])
+        self.assertEqual(self.nomes('cidade', 'poa'), ['Poá'])
+
+    def test_escopo_por_estado_e_limite(self):
+        self.assertEqual(self.nomes('cidade', 'sao', estado='RJ'), ['São Gonçalo'])
+        self.assertEqual(self.nomes('cidade', 'sao', estado='sao paulo'), ['São Carlos', 'São Paulo'])
+        self.assertEqual(self.nomes('cidade', 's', limite=2), ['Santos', 'São Carlos'])
+        self.assertIsNone(autocompletar('cidade', 'sao', 'XX'))
+
+    def test_instituicoes_e_endpoint(self):
+        cliente = APIClient()
+
+        resposta = cliente.get('/api/autocomplete/', {'q': 'dumont', 'tipo': 'instituicao', 'estado': 'rj'})
+
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.data['results'], [{
+            'id': Instituicao.objects.get().pk, 'nome': 'Escola Estadual Santos Dumont', 'cidade': 'São Gonçalo', 'uf': 'RJ',
+        }])
+        self.assertEqual(cliente.get('/api/autocomplete/', {'q': 'sao', 'estado': 'XX'}).status_code, 404)
+        self.assertEqual(cliente.get('/api/autocomplete/', {'q': 'sao', 'tipo': 'bairro'}).status_code, 400)
+
+    def test_consulta_nao_vai_ao_banco(self):
+        autocompletar('cidade', 'sao')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.nomes('cidade', 'campi'), ['Campinas'])
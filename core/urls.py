@@ -9,7 +9,8 @@ from .views import (
     CidadeBulkCreateView, EstadosByRegiaoList,
     CidadesByEstadoView, GeneroListCreateAPIView,
     GeneroRetrieveUpdateDestroyAPIView,
-    RacaViewSet, DeficienciaViewSet
+    RacaViewSet, DeficienciaViewSet,
+    AutocompleteView
     )
 
 
@@ -35,6 +36,9 @@ urlpatterns = [
     path('cidades/<int:pk>/', CidadeRetrieveUpdateDestroyView.as_view(), name='cidade-detail'),
     path('cidades/criar_varios/', CidadeBulkCreateView.as_view(), name='cidades-bulk-create'),
 
+    # AUTOCOMPLETE (cidades e instituições)
+    path('autocomplete/', AutocompleteView.as_view(), name='autocomplete'),
+
     # INSTITUICAO
     path('instituicoes/', InstituicaoListCreateView.as_view(), name='instituicao-list-create'),
     path('instituicoes/<int:pk>/', InstituicaoRetrieveUpdateDestroyView.as_view(), name='instituicao-detail'),
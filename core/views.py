@@ -3,16 +3,18 @@ from rest_framework.exceptions import NotFound
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from .permissions import IsAdminOrReadOnly
-from django.db import models
+from .autocomplete import CONSTRUTORES, LIMITE_PADRAO, autocompletar
+from .nomes import resolver_ids
+from .referencia import ReferenciaEmCacheMixin, invalidar_referencias
 from .models import Regiao, Estado, Cidade, Instituicao
 from .serializers import RegiaoSerializer, EstadoSerializer, CidadeSerializer, InstituicaoSerializer
 from users.serializers import GeneroSerializer, RacaSerializer, DeficienciaSerializer
 from users.models import Genero, Raca, Deficiencia
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.permissions import AllowAny, IsAuthenticatedOrReadOnly
 
 
 # REGIAO
-class RegiaoListCreateView(generics.ListCreateAPIView):
+class RegiaoListCreateView(ReferenciaEmCacheMixin, generics.ListCreateAPIView):
     queryset = Regiao.objects.all()
     serializer_class = RegiaoSerializer
 
@@ -23,8 +25,8 @@ class RegiaoRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
 
 
 # ESTADO
-class EstadoListCreateView(generics.ListCreateAPIView):
-    queryset = Estado.objects.all()
+class EstadoListCreateView(ReferenciaEmCacheMixin, generics.ListCreateAPIView):
+    queryset = Estado.objects.select_related('regiao')
     serializer_class = EstadoSerializer
 
 
@@ -33,27 +35,21 @@ class EstadoRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = EstadoSerializer
 
 
-class EstadosByRegiaoList(generics.ListAPIView):
+class EstadosByRegiaoList(ReferenciaEmCacheMixin, generics.ListAPIView):
     serializer_class = EstadoSerializer
 
     def get_queryset(self):
         filtro = self.kwargs['filtro']
-        query = models.Q(nome__iexact=filtro) | models.Q(abreviacao__iexact=filtro)
-
-        if filtro.isdigit():
-            query |= models.Q(pk=int(filtro))
-
-        try:
-            regiao = Regiao.objects.get(query)
-        except Regiao.DoesNotExist:
+        regioes = resolver_ids(Regiao, [filtro]).get(filtro.strip())
+        if not regioes:
             raise NotFound("Região não encontrada.")
 
-        return Estado.objects.filter(regiao=regiao)
+        return Estado.objects.filter(regiao_id__in=regioes).select_related('regiao')
 
 
 # CIDADE
-class CidadeListCreateView(generics.ListCreateAPIView):
-    queryset = Cidade.objects.all()
+class CidadeListCreateView(ReferenciaEmCacheMixin, generics.ListCreateAPIView):
+    queryset = Cidade.objects.select_related('estado__regiao')
     serializer_class = CidadeSerializer
 
 
@@ -63,19 +59,15 @@ class CidadeRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
 
 
 
-class CidadesByEstadoView(generics.ListAPIView):
+class CidadesByEstadoView(ReferenciaEmCacheMixin, generics.ListAPIView):
     serializer_class = CidadeSerializer
 
     def get_queryset(self):
         filtro = self.kwargs['filtro']
-        try:
-            query = models.Q(uf__iexact=filtro) | models.Q(nome__iexact=filtro)
-            if filtro.isdigit():
-                query |= models.Q(pk=int(filtro))
-            estado = Estado.objects.get(query)
-        except Estado.DoesNotExist:
+        estados = resolver_ids(Estado, [filtro]).get(filtro.strip())
+        if not estados:
             raise NotFound("Estado não encontrado.")
-        return Cidade.objects.filter(estado=estado)
+        return Cidade.objects.filter(estado_id__in=estados).select_related('estado__regiao')
 
 
 class CidadeBulkCreateView(APIView):
@@ -83,12 +75,36 @@ class CidadeBulkCreateView(APIView):
         serializer = CidadeSerializer(data=request.data, many=True)
         if serializer.is_valid():
             serializer.save()
+            # bulk_create não dispara post_save
+            invalidar_referencias()
             return Response(
                 {"message": f"{len(serializer.validated_data)} cidades criadas."},
                 status=status.HTTP_201_CREATED
             )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+class AutocompleteView(APIView):
+    """
+    GET ?q=<prefixo>&tipo=cidade|instituicao&estado=<uf, nome ou id>&limite=N
+    Respondido pelo índice em memória de core.autocomplete, sem consultar o banco.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        tipo = request.query_params.get('tipo', 'cidade')
+        if tipo not in CONSTRUTORES:
+            return Response({"detail": "Tipo inválido. Use 'cidade' ou 'instituicao'."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limite = int(request.query_params.get('limite', LIMITE_PADRAO))
+        except ValueError:
+            limite = LIMITE_PADRAO
+
+        resultados = autocompletar(tipo, request.query_params.get('q', ''), request.query_params.get('estado'), limite)
+        if resultados is None:
+            raise NotFound("Estado não encontrado.")
+        return Response({"results": resultados})
+
+
 # INSTITUICAO
 class InstituicaoListCreateView(generics.ListCreateAPIView):
     queryset = Instituicao.objects.all()
@@ -101,7 +117,7 @@ class InstituicaoRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView
 
 
 # GENERO
-class GeneroListCreateAPIView(generics.ListCreateAPIView):
+class GeneroListCreateAPIView(ReferenciaEmCacheMixin, generics.ListCreateAPIView):
     queryset = Genero.objects.all()
     serializer_class = GeneroSerializer
 
@@ -113,11 +129,11 @@ class GeneroRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
 
 
 
-class RacaViewSet(viewsets.ModelViewSet):
+class RacaViewSet(ReferenciaEmCacheMixin, viewsets.ModelViewSet):
     queryset = Raca.objects.all()
     serializer_class = RacaSerializer
 
 
-class DeficienciaViewSet(viewsets.ModelViewSet):
+class DeficienciaViewSet(ReferenciaEmCacheMixin, viewsets.ModelViewSet):
     queryset = Deficiencia.objects.all()
     serializer_class = DeficienciaSerializer
@@ -8,9 +8,7 @@ HEADERS = {
     'Content-Type': 'application/json',
 }
 
-# --- 1. REGIÕES ---
-print("Obtendo dados de estados do IBGE...")
-ibge_estados = requests.get('https://servicodados.ibge.gov.br/api/v1/localidades/estados').json()
+# Regiões, estados e municípios: python manage.py carregar_ibge (snapshot local, sem rede)
 
 
 
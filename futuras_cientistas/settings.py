@@ -188,6 +188,43 @@ SIMPLE_JWT = {
 
 AUTH_USER_MODEL = 'users.User' 
 
+# Com REDIS_URL, os caches compartilhados ficam no Redis e valem para todos os
+# workers do gunicorn e das filas; sem ele (desenvolvimento, processo único),
+# ficam na memória de cada processo.
+REDIS_URL = os.environ.get('REDIS_URL')
+
+
+def cache_compartilhado(nome, **opcoes):
+    if REDIS_URL:
+        return {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL, 'KEY_PREFIX': nome, **opcoes}
+    return {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': nome,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+        **opcoes,
+    }
+
+
+# Sem Redis, índices e payloads montados a partir das versões em cache são
+# refeitos ao menos a cada CACHE_LOCAL_SEGUNDOS (ver core.referencia)
+CACHE_LOCAL_SEGUNDOS = None if REDIS_URL else 60
+
+CACHES = {
+    # Versões dos dados de referência (core.referencia), contagens e throttles
+    'default': cache_compartilhado('default'),
+    # Snapshots de usuárias usados por CookieJWTAuthentication (users.cache)
+    'usuarios': cache_compartilhado('usuarios', TIMEOUT=60),
+}
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        # Com o token no cookie, requisições não seguras precisam do CSRF (ver users.authentication)
+        'users.authentication.CookieJWTAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+}
+
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'  # Definir o backend SMTP
 EMAIL_HOST = 'smtp.gmail.com'  
 EMAIL_PORT = 587  
@@ -196,6 +233,26 @@ EMAIL_HOST_USER = 'centeneprojetofuturascientista@gmail.com'
 EMAIL_HOST_PASSWORD = 'ycgq ontk thpv seip'  
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER  
 
+# Fila de saída (core.emails): enviada pelo worker `processar_fila_emails`
+EMAIL_FILA_TAMANHO_LOTE = 50
+EMAIL_FILA_EMAILS_POR_SEGUNDO = 5
+EMAIL_FILA_MAX_TENTATIVAS = 6
+
+# Lista de projetos: contagem em cache por combinação de filtros; acima do
+# limite (PostgreSQL), a primeira página traz a estimativa do planejador
+PROJETOS_CONTAGEM_CACHE_SEGUNDOS = 60
+PROJETOS_LIMITE_CONTAGEM_EXATA = 50000
+
+# Importação de projetos (projects.services): processada pelo worker `processar_importacoes`.
+# Com EAGER, a importação roda na própria requisição (útil em testes).
+IMPORTACAO_PROJETOS_TAMANHO_LOTE = 500
+# Chave natural usada no modo "atualizar" quando a planilha não traz a coluna id
+IMPORTACAO_PROJETOS_CHAVE = ['nome', 'inicio_inscricoes']
+# Processos da validação sem gravação (?dry_run=1), feita pelo worker processar_importacoes;
+# None = até 4, conforme as CPUs
+IMPORTACAO_PROJETOS_PROCESSOS = None
+IMPORTACAO_PROJETOS_EAGER = False
+
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
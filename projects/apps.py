@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ProjectsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'projects'
+
+    def ready(self):
+        import projects.signals
+        from projects.busca import garantir_gatilhos
+
+        # Migrações que recriam projects_project no SQLite levam junto os gatilhos da busca
+        post_migrate.connect(garantir_gatilhos, sender=self)
@@ -0,0 +1,125 @@
+"""
+Busca textual em Project.nome e Project.descricao com índice invertido.
+
+- PostgreSQL: índice GIN sobre a expressão tsvector (DOCUMENTO_PG), com uma
+  configuração de busca em português que remove acentos (unaccent) e reduz
+  as palavras ao radical. O índice acompanha a tabela sem gatilhos.
+- SQLite (desenvolvimento): tabela FTS5 mantida por gatilhos, com
+  tokenizer que remove acentos. Cada linha guarda o id (UUID) do projeto
+  numa coluna não indexada: o rowid implícito de projects_project muda
+  quando o SQLite recria a tabela, e content_rowid só aceita chave inteira.
+  O FTS5 não tem radicalizador de português; cada termo é buscado como
+  prefixo ("ciencia" acha "ciências").
+- Outros bancos: icontains, sem relevância.
+
+Os gatilhos do SQLite somem quando uma migração recria projects_project
+(o SQLite não altera colunas no lugar); garantir_gatilhos, ligado ao
+post_migrate, os recria e reindexa ao fim do migrate.
+"""
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+CONFIGURACAO_PG = 'projetos_pt'
+INDICE_PG = 'projects_project_busca_gin'
+DOCUMENTO_PG = (
+    f"setweight(to_tsvector('{CONFIGURACAO_PG}', coalesce(\"projects_project\".\"nome\", '')), 'A') || "
+    f"setweight(to_tsvector('{CONFIGURACAO_PG}', coalesce(\"projects_project\".\"descricao\", '')), 'B')"
+)
+TABELA_FTS = 'projects_project_busca'
+GATILHOS_FTS = [f'{TABELA_FTS}_{sufixo}' for sufixo in ('ai', 'ad', 'au')]
+# Pesos do bm25 do SQLite por coluna: projeto_id (não indexada), nome e descrição
+PESOS_FTS = (0.0, 10.0, 1.0)
+
+
+def criar_gatilhos_sqlite(cursor):
+    cursor.execute(
+        f'CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_ai AFTER INSERT ON projects_project BEGIN '
+        f'INSERT INTO {TABELA_FTS}(projeto_id, nome, descricao) VALUES (new.id, new.nome, new.descricao); END'
+    )
+    cursor.execute(
+        f'CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_ad AFTER DELETE ON projects_project BEGIN '
+        f'DELETE FROM {TABELA_FTS} WHERE projeto_id = old.id; END'
+    )
+    cursor.execute(
+        f'CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_au AFTER UPDATE OF id, nome, descricao ON projects_project BEGIN '
+        f'DELETE FROM {TABELA_FTS} WHERE projeto_id = old.id; '
+        f'INSERT INTO {TABELA_FTS}(projeto_id, nome, descricao) VALUES (new.id, new.nome, new.descricao); END'
+    )
+
+
+def _reconstruir_sqlite(cursor):
+    cursor.execute(f'DELETE FROM {TABELA_FTS}')
+    cursor.execute(
+        f'INSERT INTO {TABELA_FTS}(projeto_id, nome, descricao) SELECT id, nome, descricao FROM projects_project'
+    )
+
+
+def reindexar(conexao):
+    """Recria gatilhos e conteúdo do índice do SQLite; no PostgreSQL, reconstrói o GIN."""
+    with conexao.cursor() as cursor:
+        if conexao.vendor == 'postgresql':
+            cursor.execute(f'REINDEX INDEX {INDICE_PG}')
+        elif conexao.vendor == 'sqlite':
+            criar_gatilhos_sqlite(cursor)
+            _reconstruir_sqlite(cursor)
+
+
+def garantir_gatilhos(using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    post_migrate: no SQLite, se a tabela de busca existe mas falta algum
+    gatilho, recria os gatilhos e reindexa (o que foi gravado sem eles não
+    entrou no índice).
+    """
+    conexao = connections[using]
+    if conexao.vendor != 'sqlite':
+        return
+    with conexao.cursor() as cursor:
+        marcadores = ', '.join(['%s'] * len(GATILHOS_FTS))
+        cursor.execute(
+            f"SELECT name FROM sqlite_master WHERE (type = 'table' AND name = %s) "
+            f"OR (type = 'trigger' AND name IN ({marcadores}))",
+            [TABELA_FTS, *GATILHOS_FTS],
+        )
+        existentes = {nome for nome, in cursor.fetchall()}
+    if TABELA_FTS in existentes and not existentes.issuperset(GATILHOS_FTS):
+        reindexar(conexao)
+
+
+def _consulta_fts(texto):
+    # Cada palavra vira um prefixo entre aspas: o texto da usuária nunca é lido como sintaxe do FTS5
+    return ' '.join(f'"{termo}"*' for termo in re.findall(r'\w+', texto.lower()))
+
+
+def buscar(queryset, texto):
+    """
+    Projetos do queryset que contêm todas as palavras de `texto`, anotados
+    com `relevancia` (maior = mais relevante; o nome pesa mais que a descrição).
+    """
+    conexao = connections[queryset.db]
+
+    if conexao.vendor == 'postgresql':
+        consulta = f"websearch_to_tsquery('{CONFIGURACAO_PG}', %s)"
+        encontrados = RawSQL(f'SELECT "projects_project"."id" FROM "projects_project" WHERE ({DOCUMENTO_PG}) @@ {consulta}', [texto])
+        relevancia = RawSQL(f'ts_rank({DOCUMENTO_PG}, {consulta})', [texto], output_field=FloatField())
+        return queryset.filter(pk__in=encontrados).annotate(relevancia=relevancia)
+
+    if conexao.vendor == 'sqlite':
+        consulta = _consulta_fts(texto)
+        if not consulta:
+            return queryset.none()
+        encontrados = RawSQL(f'SELECT projeto_id FROM {TABELA_FTS} WHERE {TABELA_FTS} MATCH %s', [consulta])
+        # bm25 é menor quanto mais relevante; o sinal é invertido para ordenar como no PostgreSQL
+        relevancia = RawSQL(
+            f'SELECT -bm25({TABELA_FTS}, {", ".join(map(str, PESOS_FTS))}) FROM {TABELA_FTS} '
+            f'WHERE {TABELA_FTS} MATCH %s AND {TABELA_FTS}.projeto_id = "projects_project"."id"',
+            [consulta],
+            output_field=FloatField(),
+        )
+        return queryset.filter(pk__in=encontrados).annotate(relevancia=relevancia)
+
+    return queryset.filter(Q(nome__icontains=texto) | Q(descricao__icontains=texto)).annotate(
+        relevancia=Value(0.0, output_field=FloatField())
+    )
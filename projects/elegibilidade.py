@@ -0,0 +1,144 @@
+"""
+Manutenção e consulta de ElegibilidadeProjeto: em quais cidades cada
+projeto aceita estudantes.
+"""
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+from core.models import Cidade, Estado
+from core.nomes import ids_resolvidos_em_cache
+from .models import ElegibilidadeProjeto, Project
+
+CAMPOS_GEOGRAFICOS = ['regioes_aceitas', 'estados_aceitos', 'cidades_aceitas']
+TAMANHO_LOTE = 5000
+
+
+def _aceitos(projetos_ids):
+    """{projeto_id: [regiões, estados, cidades]} lidos das tabelas intermediárias, uma consulta por campo."""
+    aceitos = {pk: [set(), set(), set()] for pk in projetos_ids}
+    for posicao, campo in enumerate(CAMPOS_GEOGRAFICOS):
+        campo_m2m = Project._meta.get_field(campo)
+        coluna_projeto = f'{campo_m2m.m2m_field_name()}_id'
+        coluna_destino = f'{campo_m2m.m2m_reverse_field_name()}_id'
+        linhas = campo_m2m.remote_field.through.objects.filter(**{f'{coluna_projeto}__in': projetos_ids})
+        for projeto_id, destino_id in linhas.values_list(coluna_projeto, coluna_destino):
+            aceitos[projeto_id][posicao].add(destino_id)
+    return aceitos
+
+
+def _cidades(regioes, estados, cidades):
+    """Cidades de cada região e de cada estado pedidos, e o estado de cada cidade, em uma consulta."""
+    por_regiao, por_estado, estado_da_cidade = defaultdict(set), defaultdict(set), {}
+    if regioes or estados or cidades:
+        consulta = Cidade.objects.filter(
+            Q(estado__regiao_id__in=regioes) | Q(estado_id__in=estados) | Q(pk__in=cidades)
+        )
+        for cidade_id, estado_id, regiao_id in consulta.values_list('id', 'estado_id', 'estado__regiao_id'):
+            por_regiao[regiao_id].add(cidade_id)
+            por_estado[estado_id].add(cidade_id)
+            estado_da_cidade[cidade_id] = estado_id
+    return por_regiao, por_estado, estado_da_cidade
+
+
+def _inserir(linhas):
+    """
+    INSERT das tuplas (projeto_id, cidade_id, estado_id) com executemany: um
+    projeto aberto a uma região gera milhares de linhas, e instanciar um
+    modelo para cada uma custaria mais do que o próprio INSERT.
+    """
+    opcoes = ElegibilidadeProjeto._meta
+    tabela = connection.ops.quote_name(opcoes.db_table)
+    colunas = ', '.join(
+        connection.ops.quote_name(opcoes.get_field(campo).column) for campo in ('projeto', 'cidade', 'estado')
+    )
+    with connection.cursor() as cursor:
+        for inicio in range(0, len(linhas), TAMANHO_LOTE):
+            cursor.executemany(
+                f'INSERT INTO {tabela} ({colunas}) VALUES (%s, %s, %s)',
+                linhas[inicio:inicio + TAMANHO_LOTE],
+            )
+
+
+def atualizar_elegibilidade(projetos_ids, novos=False):
+    """
+    Recalcula as linhas de ElegibilidadeProjeto dos projetos, inserindo e
+    apagando só a diferença para o que já está gravado. Com `novos`, os
+    projetos acabaram de ser criados e a leitura das linhas atuais é pulada.
+    """
+    projetos_ids = list(set(projetos_ids))
+    if not projetos_ids:
+        return
+
+    remotos = dict(Project.objects.filter(pk__in=projetos_ids).values_list('pk', 'eh_remoto'))
+    aceitos = _aceitos(projetos_ids)
+    por_regiao, por_estado, estado_da_cidade = _cidades(
+        {pk for regioes, _, _ in aceitos.values() for pk in regioes},
+        {pk for _, estados, _ in aceitos.values() for pk in estados},
+        {pk for _, _, cidades in aceitos.values() for pk in cidades},
+    )
+
+    desejadas = {}
+    for projeto_id, (regioes, estados, cidades) in aceitos.items():
+        if remotos.get(projeto_id) or not (regioes or estados or cidades):
+            desejadas[projeto_id] = {None}
+            continue
+        desejadas[projeto_id] = (
+            set(cidades).intersection(estado_da_cidade)
+            .union(*(por_regiao[pk] for pk in regioes))
+            .union(*(por_estado[pk] for pk in estados))
+        )
+
+    atuais = defaultdict(dict)
+    if not novos:
+        linhas = ElegibilidadeProjeto.objects.filter(projeto_id__in=projetos_ids)
+        for pk, projeto_id, cidade_id in linhas.values_list('pk', 'projeto_id', 'cidade_id'):
+            atuais[projeto_id][cidade_id] = pk
+
+    campo_projeto = ElegibilidadeProjeto._meta.get_field('projeto')
+    inserir, apagar = [], []
+    for projeto_id, cidades in desejadas.items():
+        existentes = atuais.get(projeto_id, {})
+        valor_projeto = campo_projeto.get_db_prep_save(projeto_id, connection)
+        inserir.extend(
+            (valor_projeto, cidade_id, estado_da_cidade.get(cidade_id))
+            for cidade_id in cidades - existentes.keys()
+        )
+        apagar.extend(existentes[cidade_id] for cidade_id in existentes.keys() - cidades)
+
+    with transaction.atomic():
+        for inicio in range(0, len(apagar), TAMANHO_LOTE):
+            ElegibilidadeProjeto.objects.filter(pk__in=apagar[inicio:inicio + TAMANHO_LOTE]).delete()
+        _inserir(inserir)
+
+
+def localizar_usuario(usuario):
+    """
+    (cidade_id, estado_id) a partir da cidade e da UF do cadastro; None onde
+    o valor está vazio ou não corresponde a exatamente um registro.
+    """
+    estado_id = cidade_id = None
+    if usuario.estado:
+        estados = ids_resolvidos_em_cache(Estado, [usuario.estado])
+        if len(estados) == 1:
+            estado_id = next(iter(estados))
+    if usuario.cidade:
+        valor = f'{usuario.cidade} - {usuario.estado}' if usuario.estado else usuario.cidade
+        cidades = ids_resolvidos_em_cache(Cidade, [valor])
+        if len(cidades) == 1:
+            cidade_id = next(iter(cidades))
+    return cidade_id, estado_id
+
+
+def projetos_elegiveis(cidade_id=None, estado_id=None):
+    """
+    Subconsulta com os ids dos projetos abertos à cidade (ou, sem cidade, a
+    alguma cidade do estado), incluindo os abertos a todas as cidades.
+    """
+    filtro = Q(cidade__isnull=True)
+    if cidade_id:
+        filtro |= Q(cidade_id=cidade_id)
+    elif estado_id:
+        filtro |= Q(estado_id=estado_id)
+    return ElegibilidadeProjeto.objects.filter(filtro).values('projeto_id')
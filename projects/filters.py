@@ -2,16 +2,20 @@ import django_filters
 from django_filters import rest_framework as filters
 from .models import Project, FORMATOS, STATUS_PROJETO
 from core.models import Regiao, Estado, Cidade
+from core.nomes import ids_resolvidos_em_cache
+from .busca import buscar
 from django.contrib.auth import get_user_model
-from django.db.models import Q
-from functools import reduce
-from operator import or_
 
 
 User = get_user_model()
 
 class BaseInFilter(django_filters.BaseInFilter):
-    fields = []
+    """
+    Nomes, siglas ou ids separados por vírgula, resolvidos para ids por
+    core.nomes (com cache). Filtra por uma subconsulta na tabela
+    intermediária do M2M, sem join nem DISTINCT na consulta de projetos.
+    """
+    modelo = None
 
     def filter(self, qs, value):
         if not value:
@@ -22,31 +26,31 @@ class BaseInFilter(django_filters.BaseInFilter):
         else:
             values = value
 
-        queries = []
-        for val in values:
-            queries.append(
-                reduce(or_, (Q(**{f"{self.field_name}__{field}__iexact": val}) for field in self.fields))
-            )
-        q = reduce(or_, queries) if queries else Q()
-
-        return qs.filter(q).distinct()
+        ids = ids_resolvidos_em_cache(self.modelo, values)
+        campo = qs.model._meta.get_field(self.field_name)
+        vinculados = campo.remote_field.through.objects.filter(
+            **{f'{campo.m2m_reverse_field_name()}_id__in': ids}
+        ).values(f'{campo.m2m_field_name()}_id')
+        return qs.filter(pk__in=vinculados)
 
 
 class RegiaoFilter(BaseInFilter):
     field_name = 'regioes_aceitas'
-    fields = ['nome', 'abreviacao']
+    modelo = Regiao
 
 class CidadeFilter(BaseInFilter):
     field_name = 'cidades_aceitas'
-    fields = ['nome', 'regiao__nome', 'regiao__abreviacao']
+    modelo = Cidade
 
 class EstadoFilter(BaseInFilter):
     field_name = 'estados_aceitos'
-    fields = ['nome', 'abreviacao']
+    modelo = Estado
     
 class ProjectFilter(django_filters.FilterSet):
     nome = filters.CharFilter(lookup_expr='icontains')
     descricao = filters.CharFilter(lookup_expr='icontains')
+    # Busca textual em nome e descrição, ordenada por relevância (ver projects.busca)
+    q = filters.CharFilter(method='filtrar_busca', label="Busca")
     criado_por = filters.CharFilter(lookup_expr='icontains')
     atualizado_por = filters.CharFilter(lookup_expr='icontains')
 
@@ -57,7 +61,7 @@ class ProjectFilter(django_filters.FilterSet):
     regioes_aceitas = RegiaoFilter(field_name='regioes_aceitas')
     estados_aceitos = EstadoFilter(field_name='estados_aceitos')
     cidades_aceitas = CidadeFilter(field_name='cidades_aceitas')
-    regiao = django_filters.NumberFilter(field_name="regioes_aceitas__id", label="ID da Região")
+    regiao = RegiaoFilter(field_name='regioes_aceitas', label="ID da Região")
 
 
     formato = filters.ChoiceFilter(choices=FORMATOS)
@@ -71,6 +75,9 @@ class ProjectFilter(django_filters.FilterSet):
     criado_em = django_filters.DateFilter(field_name='criado_em', lookup_expr='gte')
     atualizado_em = django_filters.DateFilter(field_name='atualizado_em', lookup_expr='lte')
     
+    def filtrar_busca(self, queryset, name, value):
+        return buscar(queryset, value) if value.strip() else queryset
+
     class Meta:
         model = Project
         fields = [
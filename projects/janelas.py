@@ -0,0 +1,120 @@
+"""
+Índice em memória das janelas de inscrição dos projetos ativos, para
+responder "posso me inscrever?" sem consultar o banco a cada projeto.
+Serve só às consultas de leitura: a validação da inscrição
+(Application.clean) continua conferindo as datas no banco.
+"""
+import threading
+from bisect import bisect_left, bisect_right
+
+from django.db import transaction
+
+from core.referencia import invalidar_referencias, versao_vigente
+from .models import Project
+
+CHAVE_VERSAO = 'projetos:janelas:versao'
+
+
+class IndiceJanelas:
+    """
+    Janelas [inicio, fim] por projeto e, para listar os projetos abertos num
+    instante, duas listas ordenadas: pelo início e pelo fim. Um bisect em
+    cada uma dá os que já abriram (prefixo dos inícios) e os que ainda não
+    fecharam (sufixo dos fins); só o menor dos dois conjuntos é percorrido.
+    Com o histórico de ciclos encerrados, o sufixo dos fins costuma ser bem
+    menor que o total de projetos.
+    """
+
+    def __init__(self, itens):
+        # itens: (id, inicio, fim)
+        self.janelas = {}
+        ordenados = []
+        for id_, inicio, fim in itens:
+            self.janelas[id_] = (inicio, fim)
+            ordenados.append((inicio, fim, id_))
+        ordenados.sort(key=lambda item: item[0])
+        self.inicios = [inicio for inicio, _, _ in ordenados]
+        self.ordenados = ordenados
+        # Posições em `ordenados`, pela data de fim
+        por_fim = sorted(range(len(ordenados)), key=lambda posicao: ordenados[posicao][1])
+        self.fins = [ordenados[posicao][1] for posicao in por_fim]
+        self.posicoes_por_fim = por_fim
+
+    def janela(self, projeto_id):
+        return self.janelas.get(projeto_id)
+
+    def abertos_em(self, instante):
+        """Ids dos projetos com inicio <= instante <= fim, na ordem do início."""
+        abertos = bisect_right(self.inicios, instante)
+        nao_fechados = bisect_left(self.fins, instante)
+        if abertos <= len(self.fins) - nao_fechados:
+            return [id_ for _, fim, id_ in self.ordenados[:abertos] if fim >= instante]
+        posicoes = sorted(posicao for posicao in self.posicoes_por_fim[nao_fechados:] if posicao < abertos)
+        return [self.ordenados[posicao][2] for posicao in posicoes]
+
+
+_indices = {}
+_trava = threading.Lock()
+
+
+def obter_indice():
+    """Índice da versão atual das janelas, reconstruído quando algum projeto muda."""
+    versao = versao_vigente(CHAVE_VERSAO)
+    indice = _indices.get('atual')
+    if indice is None or indice[0] != versao:
+        with _trava:
+            indice = _indices.get('atual')
+            if indice is None or indice[0] != versao:
+                projetos = Project.objects.filter(ativo=True).values_list('id', 'inicio_inscricoes', 'fim_inscricoes')
+                indice = (versao, IndiceJanelas(projetos))
+                _indices['atual'] = indice
+    return indice[1]
+
+
+def invalidar_janelas():
+    """
+    Descarta o índice deste processo na hora e, depois do commit, avisa os
+    demais processos, para que nenhum reconstrua a partir de dados ainda
+    não gravados.
+    """
+    _indices.pop('atual', None)
+    transaction.on_commit(lambda: invalidar_referencias(CHAVE_VERSAO))
+
+
+def janelas_inscricao(projetos_ids):
+    """
+    {id: (inicio, fim)} dos projetos pelo índice; os que não estão nele
+    (inativos) vêm do banco numa única consulta. Ids inexistentes ficam de fora.
+    """
+    indice = obter_indice()
+    janelas, faltando = {}, []
+    for projeto_id in projetos_ids:
+        janela = indice.janela(projeto_id)
+        if janela is None:
+            faltando.append(projeto_id)
+        else:
+            janelas[projeto_id] = janela
+    if faltando:
+        for projeto_id, inicio, fim in Project.objects.filter(pk__in=faltando).values_list(
+            'id', 'inicio_inscricoes', 'fim_inscricoes'
+        ):
+            janelas[projeto_id] = (inicio, fim)
+    return janelas
+
+
+def janela_inscricao(projeto_id):
+    """(inicio, fim) do projeto, ativo ou não. None se não existir."""
+    return janelas_inscricao([projeto_id]).get(projeto_id)
+
+
+def situacao_inscricao(janela, agora):
+    """Situação da janela no instante `agora`, com os segundos até a próxima mudança."""
+    inicio, fim = janela
+    if agora < inicio:
+        return {'situacao': 'nao_iniciada', 'pode_inscrever': False,
+                'segundos_para_abrir': int((inicio - agora).total_seconds()), 'segundos_para_fechar': None}
+    if agora > fim:
+        return {'situacao': 'encerrada', 'pode_inscrever': False,
+                'segundos_para_abrir': None, 'segundos_para_fechar': None}
+    return {'situacao': 'aberta', 'pode_inscrever': True,
+            'segundos_para_abrir': None, 'segundos_para_fechar': int((fim - agora).total_seconds())}
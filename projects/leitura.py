@@ -0,0 +1,207 @@
+"""
+Leitura em lotes das planilhas de importação.
+
+Cada leitor é um gerador de DataFrames com no máximo `tamanho_lote` linhas,
+nomes de coluna sem espaços nas pontas e índice contínuo entre os lotes
+(posição da linha de dados no arquivo), para que a memória usada não
+dependa do tamanho da planilha.
+"""
+import csv
+import glob
+import hashlib
+import os
+import pickle
+
+import pandas as pd
+from openpyxl import load_workbook
+
+TAMANHO_LOTE_LEITURA = 500
+# Incrementar quando a saída dos leitores mudar, para invalidar os caches gravados
+VERSAO_LEITURA = 1
+
+
+def detectar_formato(caminho):
+    """'xlsx', 'parquet', 'xls' ou 'csv', pelos primeiros bytes do arquivo."""
+    with open(caminho, 'rb') as arquivo:
+        inicio = arquivo.read(8)
+    if inicio.startswith(b'PAR1'):
+        return 'parquet'
+    if inicio.startswith(b'PK\x03\x04'):
+        return 'xlsx'
+    if inicio.startswith(b'\xd0\xcf\x11\xe0'):
+        return 'xls'
+    return 'csv'
+
+
+def _nomes_colunas(cabecalho):
+    return [
+        str(nome).strip() if nome is not None else f'Unnamed: {posicao}'
+        for posicao, nome in enumerate(cabecalho)
+    ]
+
+
+def contar_linhas(caminho):
+    """Total de linhas de dados quando o formato informa sem ler o arquivo; senão None."""
+    formato = detectar_formato(caminho)
+    if formato == 'xlsx':
+        planilha = load_workbook(caminho, read_only=True, data_only=True)
+        try:
+            total = planilha.active.max_row
+        finally:
+            planilha.close()
+        return max(total - 1, 0) if total else None
+    if formato == 'parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            return None
+        return pq.ParquetFile(caminho).metadata.num_rows
+    return None
+
+
+def ler_xlsx(caminho, colunas=None, tamanho_lote=TAMANHO_LOTE_LEITURA):
+    """
+    Percorre a primeira aba com openpyxl em modo read_only, sem montar a
+    árvore do workbook. Linhas vazias no fim da aba são descartadas, como
+    faz o pd.read_excel.
+    """
+    planilha = load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        linhas = planilha.active.iter_rows(values_only=True)
+        nomes = _nomes_colunas(next(linhas, ()))
+        posicoes = [i for i, nome in enumerate(nomes) if colunas is None or nome in colunas]
+        nomes = [nomes[i] for i in posicoes]
+
+        lote, vazias, inicio = [], [], 0
+        for linha in linhas:
+            valores = tuple(linha[i] if i < len(linha) else None for i in posicoes)
+            if all(valor is None for valor in linha):
+                vazias.append(valores)
+                continue
+            lote.extend(vazias)
+            vazias = []
+            lote.append(valores)
+            if len(lote) >= tamanho_lote:
+                yield pd.DataFrame.from_records(lote[:tamanho_lote], columns=nomes, index=range(inicio, inicio + tamanho_lote))
+                inicio += tamanho_lote
+                lote = lote[tamanho_lote:]
+        if lote:
+            yield pd.DataFrame.from_records(lote, columns=nomes, index=range(inicio, inicio + len(lote)))
+    finally:
+        planilha.close()
+
+
+def ler_csv(caminho, colunas=None, tamanho_lote=TAMANHO_LOTE_LEITURA, colunas_texto=()):
+    """
+    Lê o CSV em pedaços com o engine C do pandas, só com as colunas pedidas.
+    O separador (vírgula ou ponto e vírgula) é detectado pela primeira linha;
+    `colunas_texto` são lidas como str, sem inferência de tipo.
+    """
+    with open(caminho, newline='', encoding='utf-8-sig') as arquivo:
+        primeira_linha = arquivo.readline()
+    try:
+        separador = csv.Sniffer().sniff(primeira_linha, delimiters=',;\t').delimiter
+    except csv.Error:
+        separador = ','
+
+    cabecalho = next(csv.reader([primeira_linha], delimiter=separador), [])
+    originais = [nome for nome in cabecalho if colunas is None or nome.strip() in colunas]
+    tipos = {nome: str for nome in originais if nome.strip() in colunas_texto}
+
+    pedacos = pd.read_csv(
+        caminho,
+        sep=separador,
+        encoding='utf-8-sig',
+        engine='c',
+        usecols=originais,
+        dtype=tipos,
+        chunksize=tamanho_lote,
+    )
+    with pedacos:
+        for pedaco in pedacos:
+            pedaco.columns = pedaco.columns.str.strip()
+            yield pedaco
+
+
+def ler_parquet(caminho, colunas=None, tamanho_lote=TAMANHO_LOTE_LEITURA):
+    """Lê os row groups do Parquet em lotes; requer o pacote opcional pyarrow."""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("A leitura de arquivos Parquet requer o pacote pyarrow.")
+
+    arquivo = pq.ParquetFile(caminho)
+    originais = [nome for nome in arquivo.schema_arrow.names if colunas is None or nome.strip() in colunas]
+    inicio = 0
+    for lote in arquivo.iter_batches(batch_size=tamanho_lote, columns=originais):
+        df = lote.to_pandas()
+        df.columns = df.columns.str.strip()
+        df.index = range(inicio, inicio + len(df))
+        inicio += len(df)
+        yield df
+
+
+def ler_em_lotes(caminho, colunas=None, tamanho_lote=TAMANHO_LOTE_LEITURA, colunas_texto=()):
+    """Gerador de lotes da planilha, escolhendo o leitor pelo formato do arquivo."""
+    formato = detectar_formato(caminho)
+    if formato == 'xlsx':
+        return ler_xlsx(caminho, colunas, tamanho_lote)
+    if formato == 'parquet':
+        return ler_parquet(caminho, colunas, tamanho_lote)
+    if formato == 'xls':
+        raise ValueError("Formato .xls não suportado; salve a planilha como .xlsx ou .csv.")
+    return ler_csv(caminho, colunas, tamanho_lote, colunas_texto)
+
+
+def _caminho_cache(caminho, sha256, colunas, tamanho_lote, colunas_texto):
+    # O tamanho do lote entra na assinatura: o cache guarda os lotes já cortados
+    assinatura = hashlib.sha256(repr((
+        VERSAO_LEITURA, pd.__version__, sorted(colunas or []), tamanho_lote, sorted(colunas_texto or []),
+    )).encode()).hexdigest()[:16]
+    return os.path.join(os.path.dirname(caminho), 'cache', f'{sha256}-{assinatura}.pkl')
+
+
+def _ler_cache(caminho_cache):
+    # O arquivo é gerado pelo próprio servidor (ver ler_em_lotes_com_cache), nunca enviado por usuários.
+    with open(caminho_cache, 'rb') as entrada:
+        while True:
+            try:
+                yield pickle.load(entrada)
+            except EOFError:
+                return
+
+
+def remover_cache(caminho, sha256):
+    """Apaga os lotes em cache de um conteúdo, para qualquer versão e colunas."""
+    for caminho_cache in glob.glob(os.path.join(os.path.dirname(caminho), 'cache', f'{glob.escape(sha256)}-*.pkl')):
+        os.remove(caminho_cache)
+
+
+def ler_em_lotes_com_cache(caminho, sha256, colunas=None, tamanho_lote=TAMANHO_LOTE_LEITURA, colunas_texto=()):
+    """
+    Como ler_em_lotes, mas grava os lotes lidos em `cache/`, ao lado do
+    arquivo, identificados pelo sha256 do conteúdo, pela versão do leitor,
+    pelas colunas pedidas e pelo tamanho do lote. Reimportar o mesmo conteúdo lê os lotes já
+    convertidos em vez de interpretar a planilha de novo.
+    """
+    if not sha256:
+        yield from ler_em_lotes(caminho, colunas, tamanho_lote, colunas_texto)
+        return
+
+    caminho_cache = _caminho_cache(caminho, sha256, colunas, tamanho_lote, colunas_texto)
+    if os.path.exists(caminho_cache):
+        yield from _ler_cache(caminho_cache)
+        return
+
+    os.makedirs(os.path.dirname(caminho_cache), exist_ok=True)
+    temporario = f'{caminho_cache}.{os.getpid()}.tmp'
+    try:
+        with open(temporario, 'wb') as saida:
+            for df in ler_em_lotes(caminho, colunas, tamanho_lote, colunas_texto):
+                pickle.dump(df, saida, protocol=pickle.HIGHEST_PROTOCOL)
+                yield df
+        # Só um arquivo lido até o fim vira cache
+        os.replace(temporario, caminho_cache)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from projects.models import ImportacaoProjeto
+from projects.services import calcular_sha256
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula o sha256 das importações gravadas antes do controle por conteúdo "
+        "e faz as cópias repetidas de um mesmo arquivo apontarem para uma só."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--remover', action='store_true', help="Apaga do storage as cópias que deixaram de ser usadas.")
+
+    def handle(self, *args, **options):
+        storage = ImportacaoProjeto._meta.get_field('arquivo').storage
+        canonicos = {}
+        for sha256, nome in ImportacaoProjeto.objects.exclude(sha256='').exclude(arquivo='').values_list('sha256', 'arquivo'):
+            canonicos.setdefault(sha256, nome)
+
+        substituidos = set()
+        pendentes = ImportacaoProjeto.objects.filter(sha256='').exclude(arquivo='').order_by('data_importacao')
+        for importacao in pendentes.iterator():
+            nome = importacao.arquivo.name
+            if not storage.exists(nome):
+                continue
+            with storage.open(nome, 'rb') as arquivo:
+                sha256 = calcular_sha256(arquivo)
+            canonico = canonicos.setdefault(sha256, nome)
+            if canonico != nome:
+                substituidos.add(nome)
+            ImportacaoProjeto.objects.filter(pk=importacao.pk).update(sha256=sha256, arquivo=canonico)
+
+        removidos = 0
+        if options['remover']:
+            for nome in substituidos:
+                if not ImportacaoProjeto.objects.filter(arquivo=nome).exists():
+                    storage.delete(nome)
+                    removidos += 1
+
+        self.stdout.write(f"{len(canonicos)} arquivos distintos; {len(substituidos)} cópias repetidas, {removidos} removidas.")
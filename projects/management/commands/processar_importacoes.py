@@ -0,0 +1,46 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from projects.services import PROCESSOS_VALIDACAO, processar_importacao, reservar_importacao, validar_planilha_projetos
+
+
+class Command(BaseCommand):
+    help = "Processa as importações de planilhas de projetos que estão na fila."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Continua consultando a fila indefinidamente.")
+        parser.add_argument('--intervalo', type=float, default=5, help="Segundos entre consultas quando a fila está vazia.")
+        parser.add_argument(
+            '--validar', metavar='ARQUIVO',
+            help="Só valida a planilha, sem gravar, com os lotes divididos entre processos (não consome a fila).",
+        )
+        parser.add_argument('--com-id', action='store_true', help="Com --validar: valida para o modo atualizar.")
+        parser.add_argument('--processos', type=int, default=PROCESSOS_VALIDACAO, help="Com --validar: processos usados.")
+
+    def handle(self, *args, **options):
+        if options['validar']:
+            resultado = validar_planilha_projetos(
+                options['validar'], com_id=options['com_id'], processos=options['processos'],
+            )
+            self.stdout.write(json.dumps(resultado, ensure_ascii=False, indent=2))
+            return
+
+        while True:
+            close_old_connections()
+            importacao = reservar_importacao()
+            if importacao is not None:
+                sucesso = processar_importacao(importacao)
+                self.stdout.write(
+                    f"Importação {importacao.pk}: {importacao.get_status_display()} "
+                    f"({importacao.projetos_criados} criados, {importacao.projetos_ignorados} ignorados)."
+                )
+                if not sucesso:
+                    self.stderr.write(importacao.erro)
+                continue
+
+            if not options['loop']:
+                break
+            time.sleep(options['intervalo'])
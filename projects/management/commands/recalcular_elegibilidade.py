@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from projects.elegibilidade import atualizar_elegibilidade
+from projects.models import Project
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula o índice de elegibilidade geográfica (ElegibilidadeProjeto) de todos os projetos, "
+        "por exemplo depois de alterar cidades, estados ou regiões em core."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help="Projetos recalculados por vez (padrão: 500).")
+
+    def handle(self, *args, **options):
+        ids = list(Project.objects.order_by('pk').values_list('pk', flat=True))
+        for inicio in range(0, len(ids), options['lote']):
+            atualizar_elegibilidade(ids[inicio:inicio + options['lote']])
+        self.stdout.write(f"Elegibilidade recalculada para {len(ids)} projetos.")
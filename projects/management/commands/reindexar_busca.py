@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from projects.busca import reindexar
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstrói o índice da busca textual de projetos. No SQLite, recria também os gatilhos, "
+        "que se perdem quando uma migração recria a tabela projects_project."
+    )
+
+    def handle(self, *args, **options):
+        reindexar(connection)
+        self.stdout.write("Índice de busca reconstruído.")
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def concluir_importacoes_existentes(apps, schema_editor):
+    # Importações anteriores já rodaram dentro da requisição; não devem voltar à fila.
+    ImportacaoProjeto = apps.get_model('projects', 'ImportacaoProjeto')
+    ImportacaoProjeto.objects.update(status='concluida', concluida_em=models.F('data_importacao'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0003_projectstatuslog_status_anterior_display_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importacaoprojeto',
+            name='concluida_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='importacaoprojeto',
+            name='erro',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='importacaoprojeto',
+            name='iniciada_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='importacaoprojeto',
+            name='status',
+            field=models.CharField(choices=[('na_fila', 'Na fila'), ('lendo', 'Lendo planilha'), ('gravando', 'Gravando projetos'), ('concluida', 'Concluída'), ('falhou', 'Falhou')], default='na_fila', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='importacaoprojeto',
+            name='usuario',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='importacoes_projetos', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='importacaoprojeto',
+            index=models.Index(fields=['status', 'data_importacao'], name='projects_im_status_53d5d3_idx'),
+        ),
+        migrations.RunPython(concluir_importacoes_existentes, migrations.RunPython.noop),
+    ]
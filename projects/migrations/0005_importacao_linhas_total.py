@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0004_importacao_em_segundo_plano'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importacaoprojeto',
+            name='linhas_total',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
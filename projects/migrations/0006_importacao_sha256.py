@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0005_importacao_linhas_total'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importacaoprojeto',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
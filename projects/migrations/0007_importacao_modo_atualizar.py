@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0006_importacao_sha256'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importacaoprojeto',
+            name='chave',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='importacaoprojeto',
+            name='modo',
+            field=models.CharField(choices=[('criar', 'Criar projetos'), ('atualizar', 'Criar ou atualizar projetos')], default='criar', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='importacaoprojeto',
+            name='projetos_atualizados',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importacaoprojeto',
+            name='projetos_inalterados',
+            field=models.IntegerField(default=0),
+        ),
+    ]
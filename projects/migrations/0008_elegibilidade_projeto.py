@@ -0,0 +1,67 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def preencher_elegibilidade(apps, schema_editor):
+    # Cópia simplificada de projects.elegibilidade.atualizar_elegibilidade, com os modelos históricos
+    Project = apps.get_model('projects', 'Project')
+    Cidade = apps.get_model('core', 'Cidade')
+    ElegibilidadeProjeto = apps.get_model('projects', 'ElegibilidadeProjeto')
+
+    cidades_por_regiao, cidades_por_estado, estado_da_cidade = {}, {}, {}
+    for cidade_id, estado_id, regiao_id in Cidade.objects.values_list('id', 'estado_id', 'estado__regiao_id'):
+        cidades_por_regiao.setdefault(regiao_id, set()).add(cidade_id)
+        cidades_por_estado.setdefault(estado_id, set()).add(cidade_id)
+        estado_da_cidade[cidade_id] = estado_id
+
+    aceitos = {pk: [set(), set(), set()] for pk in Project.objects.values_list('pk', flat=True)}
+    for posicao, (campo, coluna) in enumerate([
+        ('regioes_aceitas', 'regiao_id'), ('estados_aceitos', 'estado_id'), ('cidades_aceitas', 'cidade_id'),
+    ]):
+        through = Project._meta.get_field(campo).remote_field.through
+        for projeto_id, destino_id in through.objects.values_list('project_id', coluna):
+            aceitos[projeto_id][posicao].add(destino_id)
+
+    remotos = set(Project.objects.filter(eh_remoto=True).values_list('pk', flat=True))
+    linhas = []
+    for projeto_id, (regioes, estados, cidades) in aceitos.items():
+        if projeto_id in remotos or not (regioes or estados or cidades):
+            linhas.append(ElegibilidadeProjeto(projeto_id=projeto_id))
+            continue
+        cidades = set(cidades).intersection(estado_da_cidade)
+        for regiao_id in regioes:
+            cidades |= cidades_por_regiao.get(regiao_id, set())
+        for estado_id in estados:
+            cidades |= cidades_por_estado.get(estado_id, set())
+        linhas.extend(
+            ElegibilidadeProjeto(projeto_id=projeto_id, cidade_id=cidade_id, estado_id=estado_da_cidade[cidade_id])
+            for cidade_id in cidades
+        )
+    ElegibilidadeProjeto.objects.bulk_create(linhas, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_nome_normalizado'),
+        ('projects', '0007_importacao_modo_atualizar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ElegibilidadeProjeto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cidade', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.cidade')),
+                ('estado', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.estado')),
+                ('projeto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='elegibilidade', to='projects.project')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['estado', 'projeto'], name='projects_el_estado__558e8d_idx')],
+                'constraints': [models.UniqueConstraint(fields=('cidade', 'projeto'), name='elegibilidade_cidade_projeto')],
+            },
+        ),
+        migrations.RunPython(preencher_elegibilidade, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+from django.db import migrations
+
+# SQL copiado para a migração: ela não deve mudar quando projects.busca mudar
+CONFIGURACAO_PG = 'projetos_pt'
+INDICE_PG = 'projects_project_busca_gin'
+DOCUMENTO_PG = (
+    f"setweight(to_tsvector('{CONFIGURACAO_PG}', coalesce(\"projects_project\".\"nome\", '')), 'A') || "
+    f"setweight(to_tsvector('{CONFIGURACAO_PG}', coalesce(\"projects_project\".\"descricao\", '')), 'B')"
+)
+TABELA_FTS = 'projects_project_busca'
+
+SQL_PG = [
+    'CREATE EXTENSION IF NOT EXISTS unaccent',
+    f'CREATE TEXT SEARCH CONFIGURATION {CONFIGURACAO_PG} (COPY = pg_catalog.portuguese)',
+    f'ALTER TEXT SEARCH CONFIGURATION {CONFIGURACAO_PG} '
+    'ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem',
+    f'CREATE INDEX {INDICE_PG} ON projects_project USING GIN (({DOCUMENTO_PG}))',
+]
+SQL_PG_REVERSO = [
+    f'DROP INDEX IF EXISTS {INDICE_PG}',
+    f'DROP TEXT SEARCH CONFIGURATION IF EXISTS {CONFIGURACAO_PG}',
+]
+
+SQL_SQLITE = [
+    f"CREATE VIRTUAL TABLE {TABELA_FTS} USING fts5(projeto_id UNINDEXED, nome, descricao, "
+    "tokenize='unicode61 remove_diacritics 2')",
+    f'CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_ai AFTER INSERT ON projects_project BEGIN '
+    f'INSERT INTO {TABELA_FTS}(projeto_id, nome, descricao) VALUES (new.id, new.nome, new.descricao); END',
+    f'CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_ad AFTER DELETE ON projects_project BEGIN '
+    f'DELETE FROM {TABELA_FTS} WHERE projeto_id = old.id; END',
+    f'CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_au AFTER UPDATE OF id, nome, descricao ON projects_project BEGIN '
+    f'DELETE FROM {TABELA_FTS} WHERE projeto_id = old.id; '
+    f'INSERT INTO {TABELA_FTS}(projeto_id, nome, descricao) VALUES (new.id, new.nome, new.descricao); END',
+    f'INSERT INTO {TABELA_FTS}(projeto_id, nome, descricao) SELECT id, nome, descricao FROM projects_project',
+]
+SQL_SQLITE_REVERSO = [
+    f'DROP TRIGGER IF EXISTS {TABELA_FTS}_ai',
+    f'DROP TRIGGER IF EXISTS {TABELA_FTS}_ad',
+    f'DROP TRIGGER IF EXISTS {TABELA_FTS}_au',
+    f'DROP TABLE IF EXISTS {TABELA_FTS}',
+]
+
+
+def _executar(schema_editor, comandos):
+    with schema_editor.connection.cursor() as cursor:
+        for sql in comandos.get(schema_editor.connection.vendor, []):
+            cursor.execute(sql)
+
+
+def criar(apps, schema_editor):
+    _executar(schema_editor, {'postgresql': SQL_PG, 'sqlite': SQL_SQLITE})
+
+
+def remover(apps, schema_editor):
+    _executar(schema_editor, {'postgresql': SQL_PG_REVERSO, 'sqlite': SQL_SQLITE_REVERSO})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0008_elegibilidade_projeto'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar, remover),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 14:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0009_busca_textual'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importacaoprojeto',
+            name='nomes_nao_encontrados',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='importacaoprojeto',
+            name='projetos_validos',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importacaoprojeto',
+            name='somente_validar',
+            field=models.BooleanField(default=False),
+        ),
+    ]
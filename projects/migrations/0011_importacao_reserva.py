@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 14:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0010_importacao_somente_validar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importacaoprojeto',
+            name='reservada_ate',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-18 14:34
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remover_duplicadas(apps, schema_editor):
+    # Antes da restrição, mais de uma linha sem cidade por projeto era aceita; fica a primeira
+    ElegibilidadeProjeto = apps.get_model('projects', 'ElegibilidadeProjeto')
+    sem_cidade = ElegibilidadeProjeto.objects.filter(cidade__isnull=True)
+    manter = sem_cidade.values('projeto_id').annotate(primeira=Min('id')).values('primeira')
+    sem_cidade.exclude(pk__in=manter).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0011_importacao_reserva'),
+    ]
+
+    operations = [
+        migrations.RunPython(remover_duplicadas, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='elegibilidadeprojeto',
+            constraint=models.UniqueConstraint(condition=models.Q(('cidade__isnull', True)), fields=('projeto',), name='elegibilidade_projeto_todas_cidades'),
+        ),
+    ]
@@ -27,10 +27,14 @@ class ProjectStatusLog(models.Model):
     modificado_por = models.CharField(max_length=255, null=True, blank=True, verbose_name='Modificado por (nome e e-mail)')
     data_modificacao = models.DateTimeField(auto_now_add=True)
 
-    def save(self, *args, **kwargs):
+    def preencher_displays(self):
+        """Preenche os rótulos dos status; chamado no save() e antes de bulk_create."""
         get_display = lambda code: dict(STATUS_PROJETO).get(code, code or '')
         self.status_anterior_display = get_display(self.status_anterior)
         self.status_novo_display = get_display(self.status_novo)
+
+    def save(self, *args, **kwargs):
+        self.preencher_displays()
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -106,13 +110,87 @@ class Project(models.Model):
         verbose_name = 'Projeto'
         verbose_name_plural = 'Projetos'
 
+class ElegibilidadeProjeto(models.Model):
+    """
+    Índice desnormalizado das cidades aceitas por cada projeto, com regiões e
+    estados aceitos expandidos até as cidades. Projetos remotos ou sem
+    restrição geográfica têm uma única linha sem cidade (aberto a todas).
+    Mantido por projects.elegibilidade; não deve ser editado à mão.
+    """
+    projeto = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='elegibilidade')
+    cidade = models.ForeignKey(Cidade, null=True, on_delete=models.CASCADE, related_name='+')
+    # Copiado de cidade.estado, para a consulta por UF quando a cidade da usuária não é conhecida
+    estado = models.ForeignKey(Estado, null=True, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cidade', 'projeto'], name='elegibilidade_cidade_projeto'),
+            # NULLs não colidem na restrição acima: uma única linha "todas as cidades" por projeto
+            models.UniqueConstraint(
+                fields=['projeto'], condition=models.Q(cidade__isnull=True), name='elegibilidade_projeto_todas_cidades',
+            ),
+        ]
+        indexes = [models.Index(fields=['estado', 'projeto'])]
+
+    def __str__(self):
+        return f"{self.projeto_id} → {self.cidade_id or 'todas as cidades'}"
+
 class ImportacaoProjeto(models.Model):
+    """Importação de planilha de projetos, processada em segundo plano por `processar_importacoes`."""
+
+    class Status(models.TextChoices):
+        NA_FILA = 'na_fila', 'Na fila'
+        LENDO = 'lendo', 'Lendo planilha'
+        GRAVANDO = 'gravando', 'Gravando projetos'
+        CONCLUIDA = 'concluida', 'Concluída'
+        FALHOU = 'falhou', 'Falhou'
+
+    class Modo(models.TextChoices):
+        CRIAR = 'criar', 'Criar projetos'
+        ATUALIZAR = 'atualizar', 'Criar ou atualizar projetos'
+
     arquivo = models.FileField(upload_to='importacoes/')
+    # Hash do conteúdo: reenvios do mesmo arquivo apontam para a mesma cópia gravada
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
     data_importacao = models.DateTimeField(auto_now_add=True)
+    usuario = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='importacoes_projetos')
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.NA_FILA)
+    modo = models.CharField(max_length=10, choices=Modo.choices, default=Modo.CRIAR)
+    # Campos separados por vírgula que identificam um projeto existente no modo atualizar
+    chave = models.CharField(max_length=255, blank=True)
+    # Simulação (?dry_run=1): o worker valida a planilha sem gravar projetos
+    somente_validar = models.BooleanField(default=False)
+    iniciada_em = models.DateTimeField(null=True, blank=True)
+    # Fim da reserva do worker; renovada a cada lote (ver services.reservar_importacao)
+    reservada_ate = models.DateTimeField(null=True, blank=True)
+    concluida_em = models.DateTimeField(null=True, blank=True)
+    erro = models.TextField(blank=True)
+    # Linhas de dados do arquivo, quando o formato permite saber antes de ler (xlsx, Parquet)
+    linhas_total = models.IntegerField(null=True, blank=True)
     linhas_lidas = models.IntegerField(default=0)
     projetos_criados = models.IntegerField(default=0)
     projetos_ignorados = models.IntegerField(default=0)
+    projetos_atualizados = models.IntegerField(default=0)
+    projetos_inalterados = models.IntegerField(default=0)
+    projetos_validos = models.IntegerField(default=0)
+    nomes_nao_encontrados = models.JSONField(default=dict, blank=True)
     linhas_ignoradas_texto = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['status', 'data_importacao'])]
+
+    @property
+    def campos_chave(self):
+        return [campo.strip() for campo in self.chave.split(',') if campo.strip()]
+
+    @property
+    def progresso(self):
+        """Percentual de linhas já lidas, ou None se o total de linhas não é conhecido."""
+        if self.status == self.Status.CONCLUIDA:
+            return 100
+        if not self.linhas_total:
+            return None if self.linhas_lidas else 0
+        return min(round(100 * self.linhas_lidas / self.linhas_total), 99)
+
     def __str__(self):
         return f"Importação em {self.data_importacao.strftime('%d/%m/%Y %H:%M')}"
\ No newline at end of file
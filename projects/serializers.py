@@ -1,8 +1,10 @@
 from typing import List, Type
-from django.db.models import Q, Model, QuerySet
+from django.db.models import Model
 from rest_framework import serializers
 from core.models import Regiao, Estado, Cidade
-from .models import Project
+from core.nomes import ids_resolvidos
+from .elegibilidade import atualizar_elegibilidade
+from .models import Project, ImportacaoProjeto
 
 class ProjectSerializer(serializers.ModelSerializer):
     regioes_aceitas = serializers.CharField(write_only=True, required=False)
@@ -36,30 +38,20 @@ class ProjectSerializer(serializers.ModelSerializer):
             return []
         return [v.strip() for v in value.split(',') if v.strip()]
 
-    def _fetch_related_objs(
+    def _fetch_related_ids(
         self,
         model: Type[Model],
         values: List[str],
-        lookup_fields: List[str]
-    ) -> QuerySet:
+    ) -> set[int]:
         if not values:
-            return model.objects.none()
-
-        queries = Q()
-        for val in values:
-            val_queries = Q()
-            for field in lookup_fields:
-                val_queries |= Q(**{f"{field}__iexact": val})
-            queries |= val_queries
-
-        return model.objects.filter(queries).distinct()
+            return set()
+        return ids_resolvidos(model, values)
 
     def _handle_m2m_field(
         self,
         instance: Project,
         field_name: str,
         model: Type[Model],
-        lookup_fields: List[str],
         data: dict
     ):
         raw_value = data.get(field_name, None)
@@ -67,8 +59,8 @@ class ProjectSerializer(serializers.ModelSerializer):
             return
 
         values = self._parse_values(raw_value)
-        related_objs = self._fetch_related_objs(model, values, lookup_fields)
-        getattr(instance, field_name).set(related_objs)
+        related_ids = self._fetch_related_ids(model, values)
+        getattr(instance, field_name).set(related_ids)
 
     def create(self, validated_data):
         m2m_fields = ['regioes_aceitas', 'estados_aceitos', 'cidades_aceitas']
@@ -88,9 +80,10 @@ class ProjectSerializer(serializers.ModelSerializer):
             ids = self._parse_ids(m2m_data['cidades_aceitas'])
             instance.cidades_aceitas.set(Cidade.objects.filter(id__in=ids))
 
-        # self._handle_m2m_field(instance, 'regioes_aceitas', Regiao, ['nome', 'abreviacao'], m2m_data)
-        # self._handle_m2m_field(instance, 'estados_aceitos', Estado, ['nome', 'uf'], m2m_data)
-        # self._handle_m2m_field(instance, 'cidades_aceitas', Cidade, ['nome', 'regiao__nome', 'regiao__abreviacao'], m2m_data)
+        # self._handle_m2m_field(instance, 'regioes_aceitas', Regiao, m2m_data)
+        # self._handle_m2m_field(instance, 'estados_aceitos', Estado, m2m_data)
+        # self._handle_m2m_field(instance, 'cidades_aceitas', Cidade, m2m_data)
+        atualizar_elegibilidade([instance.pk], novos=True)
         return instance
 
     def update(self, instance, validated_data):
@@ -101,8 +94,25 @@ class ProjectSerializer(serializers.ModelSerializer):
             setattr(instance, attr, value)
         instance.save()
 
-        self._handle_m2m_field(instance, 'regioes_aceitas', Regiao, ['nome', 'abreviacao'], m2m_data)
-        self._handle_m2m_field(instance, 'estados_aceitos', Estado, ['nome', 'uf'], m2m_data)
-        self._handle_m2m_field(instance, 'cidades_aceitas', Cidade, ['nome', 'regiao__nome', 'regiao__abreviacao'], m2m_data)
+        self._handle_m2m_field(instance, 'regioes_aceitas', Regiao, m2m_data)
+        self._handle_m2m_field(instance, 'estados_aceitos', Estado, m2m_data)
+        self._handle_m2m_field(instance, 'cidades_aceitas', Cidade, m2m_data)
+        atualizar_elegibilidade([instance.pk])
 
         return instance
+
+
+class ImportacaoProjetoSerializer(serializers.ModelSerializer):
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    progresso = serializers.IntegerField(read_only=True, allow_null=True)
+    linhas_ignoradas = serializers.CharField(source='linhas_ignoradas_texto', read_only=True)
+
+    class Meta:
+        model = ImportacaoProjeto
+        fields = [
+            'id', 'status', 'status_display', 'modo', 'chave', 'somente_validar', 'progresso', 'data_importacao',
+            'iniciada_em', 'concluida_em', 'linhas_total', 'linhas_lidas', 'projetos_criados', 'projetos_atualizados',
+            'projetos_inalterados', 'projetos_validos', 'projetos_ignorados', 'nomes_nao_encontrados',
+            'linhas_ignoradas', 'erro',
+        ]
+        read_only_fields = fields
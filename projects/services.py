@@ -1,27 +1,46 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import uuid
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from itertools import chain, islice
+
+from django.conf import settings
 from django.utils import timezone
-from django.db import transaction
+from django.db import connections, transaction
 from .models import *
 from core.models import Regiao, Estado, Cidade
-from django.db.models import Q
+from core.nomes import resolver_ids
+from .elegibilidade import atualizar_elegibilidade
+from .janelas import invalidar_janelas
+from .leitura import contar_linhas, ler_em_lotes_com_cache, remover_cache
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxLengthValidator
+from django.db import models
 import pandas as pd
-import math
-import numpy as np
 
-def parse_multivalor(valor):
-    if not valor or (isinstance(valor, float) and math.isnan(valor)) or str(valor).strip() == '':
-        return []
-    itens = [item.strip() for item in str(valor).split(',')]
-    return [item for item in itens if item and item.lower() != 'nan']
+CAMPOS_DATETIME = ['data_inicio', 'data_fim', 'inicio_inscricoes', 'fim_inscricoes']
+CAMPOS_MULTIVALOR = ['regioes_aceitas', 'estados_aceitos', 'cidades_aceitas']
+FORMATOS_DATA = ['ISO8601', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y']
+TAMANHO_LOTE_IMPORTACAO = getattr(settings, 'IMPORTACAO_PROJETOS_TAMANHO_LOTE', 500)
+# Um worker que não renova a reserva por este tempo é dado como morto
+TEMPO_RESERVA_IMPORTACAO = timedelta(minutes=10)
+CHAVE_IMPORTACAO = getattr(settings, 'IMPORTACAO_PROJETOS_CHAVE', ['nome', 'inicio_inscricoes'])
+PROCESSOS_VALIDACAO = getattr(settings, 'IMPORTACAO_PROJETOS_PROCESSOS', None) or min(4, os.cpu_count() or 1)
+
+logger = logging.getLogger(__name__)
 
-def preprocess_dataframe(caminho_arquivo):
-    df = pd.read_excel(caminho_arquivo)
-    df.columns = df.columns.str.strip()
-    return df
+
+def _identificar_usuario(usuario):
+    return f"{usuario.nome} ({usuario.email})" if usuario else None
 
 def registrar_log_status(projeto, status_anterior, status_novo, usuario=None):
     from .models import ProjectStatusLog 
 
-    nome_email = f"{usuario.nome} ({usuario.email})" if usuario else None
+    nome_email = _identificar_usuario(usuario)
 
     if status_anterior != status_novo:
         ProjectStatusLog.objects.create(
@@ -31,95 +50,753 @@ def registrar_log_status(projeto, status_anterior, status_novo, usuario=None):
             modificado_por=nome_email
         )
 
-def parse_linha_para_dados(row, campos_validos, campos_datetime):
-    dados = {}
-    for col in row.index:
-        if col not in campos_validos or col in ['id']:
+def _tabela_m2m(campo):
+    """(through, coluna do projeto, coluna do destino) do campo M2M de Project."""
+    campo_m2m = Project._meta.get_field(campo)
+    return (
+        campo_m2m.remote_field.through,
+        f'{campo_m2m.m2m_field_name()}_id',
+        f'{campo_m2m.m2m_reverse_field_name()}_id',
+    )
+
+
+def _ids_m2m(campo, listas_de_nomes, ids_por_nome):
+    """
+    Conjunto de ids de `campo` para cada lista de nomes, resolvendo todos os
+    nomes distintos com uma única consulta ao model relacionado.
+    `ids_por_nome` guarda as resoluções entre chamadas; só nomes novos são consultados.
+    """
+    novos = {str(nome).strip() for nomes in listas_de_nomes for nome in nomes} - ids_por_nome.keys()
+    if novos:
+        ids_por_nome.update(resolver_ids(Project._meta.get_field(campo).related_model, novos))
+    return [{pk for nome in nomes for pk in ids_por_nome.get(str(nome).strip(), [])} for nomes in listas_de_nomes]
+
+
+def vinculos_m2m(projetos, listas_de_nomes, campo, ids_por_nome=None):
+    """Linhas da tabela intermediária de `campo` para projetos novos."""
+    through, coluna_projeto, coluna_destino = _tabela_m2m(campo)
+    ids = _ids_m2m(campo, listas_de_nomes, {} if ids_por_nome is None else ids_por_nome)
+    vinculos = [
+        through(**{coluna_projeto: projeto.pk, coluna_destino: pk})
+        for projeto, ids_projeto in zip(projetos, ids) for pk in ids_projeto
+    ]
+    return through, vinculos
+
+
+def sincronizar_vinculos_m2m(projetos, listas_de_nomes, campo, ids_por_nome=None):
+    """
+    Deixa os vínculos de `campo` dos projetos iguais aos da planilha,
+    inserindo só os que faltam e apagando só os que sobraram.
+    Retorna os pks dos projetos cujos vínculos mudaram.
+    """
+    through, coluna_projeto, coluna_destino = _tabela_m2m(campo)
+    desejados = _ids_m2m(campo, listas_de_nomes, {} if ids_por_nome is None else ids_por_nome)
+
+    atuais = defaultdict(dict)
+    linhas = through.objects.filter(**{f'{coluna_projeto}__in': [projeto.pk for projeto in projetos]})
+    for pk, projeto_id, destino_id in linhas.values_list('pk', coluna_projeto, coluna_destino):
+        atuais[projeto_id][destino_id] = pk
+
+    novos, removidos, alterados = [], [], set()
+    for projeto, ids in zip(projetos, desejados):
+        existentes = atuais.get(projeto.pk, {})
+        faltando = ids - existentes.keys()
+        sobrando = existentes.keys() - ids
+        novos.extend(through(**{coluna_projeto: projeto.pk, coluna_destino: pk}) for pk in faltando)
+        removidos.extend(existentes[pk] for pk in sobrando)
+        if faltando or sobrando:
+            alterados.add(projeto.pk)
+
+    if removidos:
+        through.objects.filter(pk__in=removidos).delete()
+    through.objects.bulk_create(novos)
+    return alterados
+
+def _converter_datas(serie):
+    """
+    Converte textos de data só pelos formatos explícitos de FORMATOS_DATA,
+    um por vez sobre as células ainda não convertidas; o que não casa com
+    nenhum vira NaT (a linha é rejeitada), sem adivinhar a ordem de dia e
+    mês. Cada valor distinto é convertido uma vez.
+    """
+    distintos = pd.Series(serie.dropna().unique())
+    convertidos = pd.Series(pd.NaT, index=distintos.index, dtype='datetime64[ns]')
+    for formato in FORMATOS_DATA:
+        faltando = convertidos.isna()
+        if not faltando.any():
+            break
+        convertidos[faltando] = pd.to_datetime(distintos[faltando], errors='coerce', format=formato)
+    return serie.map(dict(zip(distintos, convertidos))).astype('datetime64[ns]')
+
+
+def _localizar_datas(serie, fuso):
+    """Coluna de datas como datetimes com fuso; células que não são datas viram NaT."""
+    if not pd.api.types.is_datetime64_any_dtype(serie):
+        serie = _converter_datas(serie)
+    if serie.dt.tz is None:
+        serie = serie.dt.tz_localize(fuso, ambiguous=True, nonexistent='shift_forward')
+    return serie
+
+
+def _separar_multivalores(df):
+    """
+    Uma única passada de split/explode sobre as colunas multivaloradas.
+    Retorna {coluna: Series de listas}, com [] onde a célula está vazia.
+    """
+    presentes = [col for col in CAMPOS_MULTIVALOR if col in df.columns]
+    listas = {}
+    if presentes:
+        itens = df[presentes].stack().astype(str).str.split(',').explode().str.strip()
+        itens = itens[(itens != '') & (itens.str.lower() != 'nan')]
+        agrupados = itens.groupby(level=[0, 1], sort=False).agg(list)
+        for col in presentes:
+            if col in agrupados.index.get_level_values(1):
+                listas[col] = agrupados.xs(col, level=1).reindex(df.index)
+    vazio = pd.Series([[] for _ in range(len(df))], index=df.index, dtype=object)
+    return {
+        col: listas[col].where(listas[col].notna(), vazio) if col in listas else vazio.copy()
+        for col in CAMPOS_MULTIVALOR
+    }
+
+
+def preparar_dados(df):
+    """
+    Etapa de parsing da importação, coluna a coluna: só colunas que são campos
+    de Project, NaN → None, datas com o fuso atual e campos multivalorados
+    como listas de nomes. Retorna (dados, datas_invalidas), onde
+    datas_invalidas marca células de data preenchidas que não são datas
+    (essas células mantêm o valor original, para a mensagem de erro).
+    """
+    campos_validos = {f.name for f in Project._meta.get_fields()}
+    colunas = [col for col in df.columns if col in campos_validos and col != 'id' and col not in CAMPOS_MULTIVALOR]
+    fuso = timezone.get_current_timezone()
+
+    dados = pd.DataFrame(index=df.index)
+    datas_invalidas = pd.DataFrame(index=df.index)
+    for col in colunas:
+        serie = df[col]
+        if col in CAMPOS_DATETIME:
+            convertida = _localizar_datas(serie, fuso)
+            invalidas = serie.notna() & convertida.isna()
+            datas_invalidas[col] = invalidas
+            dados[col] = convertida.astype(object).where(convertida.notna(), None).where(~invalidas, serie)
             continue
-        valor = row[col]
-        if pd.isna(valor) or valor == np.nan:
-            dados[col] = None
+        dados[col] = serie.astype(object).where(serie.notna(), None)
+
+    for col, listas in _separar_multivalores(df).items():
+        dados[col] = listas
+    return dados, datas_invalidas
+
+
+def _mensagem_campo(campo, chave, **params):
+    mensagem = campo.error_messages[chave]
+    return str(mensagem % params if params else mensagem)
+
+
+def validar_dados(dados, datas_invalidas):
+    """
+    Validações de campo de Project sobre colunas inteiras (obrigatórios, vazio,
+    max_length, choices, datas). Retorna uma Series com o dict de erros de cada
+    linha, no formato de ValidationError.message_dict, ou None se não houver
+    erro. As demais regras continuam em full_clean().
+    """
+    erros_por_campo = []
+    total = len(dados)
+    for campo in Project._meta.concrete_fields:
+        if campo.auto_created or not campo.editable or campo.primary_key:
             continue
-        if col in campos_datetime and timezone.is_naive(valor):
-            valor = timezone.make_aware(valor, timezone.get_current_timezone())
-        dados[col] = valor
-
-    dados['regioes_aceitas'] = parse_multivalor(row.get('regioes_aceitas'))
-    dados['estados_aceitos'] = parse_multivalor(row.get('estados_aceitos'))
-    dados['cidades_aceitas'] = parse_multivalor(row.get('cidades_aceitas'))
-    return dados
-
-def importar_planilha_projetos(importacao_obj, request):
-    df = preprocess_dataframe(importacao_obj.arquivo.path)
-    campos_validos = [f.name for f in Project._meta.get_fields()]
-    campos_datetime = ['data_inicio', 'data_fim', 'inicio_inscricoes', 'fim_inscricoes']
-
-    projetos = []
-    regioes_aceitas_list = []
-    estados_aceitos_list = []
-    cidades_aceitas_list = []
-    ignoradas = []
-    total_linhas = len(df)
+        nome = campo.name
+        mensagens = pd.Series('', index=dados.index)
+
+        if nome not in dados.columns:
+            if not campo.has_default() and not campo.null and not campo.blank:
+                mensagens[:] = _mensagem_campo(campo, 'null')
+                erros_por_campo.append((nome, mensagens))
+            continue
+
+        serie = dados[nome]
+        nulos = serie.isna().to_numpy()
+        if nome in datas_invalidas.columns:
+            invalidas = datas_invalidas[nome]
+            for valor in serie[invalidas].unique():
+                mensagens[invalidas & (serie == valor)] = _mensagem_campo(campo, 'invalid', value=valor)
+        if not campo.null:
+            mensagens[(mensagens == '') & nulos] = _mensagem_campo(campo, 'null')
+
+        if isinstance(campo, (models.CharField, models.TextField)):
+            texto = serie.where(~nulos, '').astype(str)
+            if not campo.blank:
+                mensagens[(mensagens == '') & ~nulos & (texto == '')] = _mensagem_campo(campo, 'blank')
+            if campo.choices:
+                validos = [valor for valor, _ in campo.flatchoices]
+                invalidos = (mensagens == '') & ~nulos & (texto != '') & ~texto.isin(validos)
+                for valor in texto[invalidos].unique():
+                    mensagens[invalidos & (texto == valor)] = _mensagem_campo(campo, 'invalid_choice', value=valor)
+            if campo.max_length:
+                tamanho = texto.str.len()
+                excedidos = (mensagens == '') & (tamanho > campo.max_length)
+                for atual in tamanho[excedidos].unique():
+                    mensagens[excedidos & (tamanho == atual)] = str(
+                        MaxLengthValidator.message % {'limit_value': campo.max_length, 'show_value': atual}
+                    )
+
+        if (mensagens != '').any():
+            erros_por_campo.append((nome, mensagens))
+
+    erros = pd.Series([None] * total, index=dados.index, dtype=object)
+    if not erros_por_campo:
+        return erros
+    tabela = pd.DataFrame({nome: mensagens for nome, mensagens in erros_por_campo})
+    com_erro = (tabela != '').any(axis=1)
+    erros[com_erro] = [
+        {nome: [mensagem] for nome, mensagem in linha.items() if mensagem}
+        for linha in tabela[com_erro].to_dict('records')
+    ]
+    return erros
+
+
+def gravar_lote_projetos(projetos, nomes_m2m, usuario=None, ids_por_nome=None):
+    """
+    Grava um lote de projetos válidos com os vínculos de `nomes_m2m`
+    ({campo: [nomes por projeto]}) e o log de status inicial de cada um.
+    `ids_por_nome` ({campo: {nome: ids}}) reaproveita resoluções de lotes anteriores.
+    """
+    ids_por_nome = {} if ids_por_nome is None else ids_por_nome
+    projetos = Project.objects.bulk_create(projetos)
+
+    for campo, listas_de_nomes in nomes_m2m.items():
+        through, vinculos = vinculos_m2m(projetos, listas_de_nomes, campo, ids_por_nome.setdefault(campo, {}))
+        through.objects.bulk_create(vinculos)
+
+    atualizar_elegibilidade([proj.pk for proj in projetos], novos=True)
+    if projetos:
+        invalidar_janelas()
+    _gravar_logs_status([(proj, None) for proj in projetos], usuario)
+    return projetos
+
+
+def _gravar_logs_status(mudancas, usuario=None):
+    """Um ProjectStatusLog por (projeto, status anterior), em um único INSERT."""
+    modificado_por = _identificar_usuario(usuario)
+    logs = [
+        ProjectStatusLog(projeto=proj, status_anterior=anterior, status_novo=proj.status, modificado_por=modificado_por)
+        for proj, anterior in mudancas
+    ]
+    for log in logs:
+        log.preencher_displays()
+    ProjectStatusLog.objects.bulk_create(logs)
+
+
+def _chave_natural(projeto, chave):
+    # Timestamps do pandas e datetimes do banco precisam gerar a mesma chave
+    return tuple(
+        valor.to_pydatetime() if isinstance(valor, pd.Timestamp) else valor
+        for valor in (getattr(projeto, campo) for campo in chave)
+    )
+
+
+def _localizar_existentes(projetos, ids_planilha, chave):
+    """
+    Projeto já gravado que corresponde a cada projeto da planilha (ou None),
+    com uma única consulta: pelo id, quando a planilha informa, senão pela
+    chave natural `chave`.
+    """
+    por_id = {pk for pk in ids_planilha if pk}
+    sem_id = [projeto for projeto, pk in zip(projetos, ids_planilha) if not pk]
+
+    filtro = models.Q(pk__in=por_id)
+    if sem_id:
+        filtro |= models.Q(**{f'{campo}__in': {getattr(projeto, campo) for projeto in sem_id} for campo in chave})
+
+    gravados_por_id, gravados_por_chave = {}, {}
+    if por_id or sem_id:
+        for gravado in Project.objects.filter(filtro).order_by('criado_em', 'pk'):
+            gravados_por_id[gravado.pk] = gravado
+            gravados_por_chave.setdefault(_chave_natural(gravado, chave), gravado)
+
+    return [
+        gravados_por_id.get(pk) if pk else gravados_por_chave.get(_chave_natural(projeto, chave))
+        for projeto, pk in zip(projetos, ids_planilha)
+    ]
+
+
+def atualizar_lote_projetos(projetos, ids_planilha, nomes_m2m, campos, chave, usuario=None, ids_por_nome=None):
+    """
+    Modo de atualização da importação. Projetos que já existem (pelo id ou
+    pela chave natural) recebem só os `campos` que mudaram, com um
+    bulk_update por combinação de campos; os demais são criados. Vínculos
+    M2M são sincronizados e o log de status só é gravado quando o status muda.
+    Retorna (criados, atualizados, inalterados).
+    """
+    ids_por_nome = {} if ids_por_nome is None else ids_por_nome
+    existentes = _localizar_existentes(projetos, ids_planilha, chave)
+
+    novos, finais, mudancas_status = [], [], []
+    alteracoes, geografia_alterada = {}, set()
+    for projeto, pk, existente in zip(projetos, ids_planilha, existentes):
+        if existente is None:
+            # Um id informado que ainda não existe é mantido, para que reimportar a planilha o encontre
+            if pk:
+                projeto.pk = pk
+            novos.append(projeto)
+            finais.append(projeto)
+            continue
+        alterados = [campo for campo in campos if getattr(existente, campo) != getattr(projeto, campo)]
+        if 'status' in alterados:
+            mudancas_status.append((existente, existente.status))
+        for campo in alterados:
+            setattr(existente, campo, getattr(projeto, campo))
+        if alterados:
+            alteracoes[existente.pk] = alterados
+        if 'eh_remoto' in alterados:
+            geografia_alterada.add(existente.pk)
+        finais.append(existente)
+
+    Project.objects.bulk_create(novos)
+    ids_novos = {projeto.pk for projeto in novos}
+
+    for campo, listas_de_nomes in nomes_m2m.items():
+        for pk in sincronizar_vinculos_m2m(finais, listas_de_nomes, campo, ids_por_nome.setdefault(campo, {})):
+            if pk not in ids_novos:
+                alteracoes.setdefault(pk, [])
+                geografia_alterada.add(pk)
+
+    agora = timezone.now()
+    modificado_por = _identificar_usuario(usuario)
+    por_campos = defaultdict(list)
+    for projeto in finais:
+        if projeto.pk in alteracoes and projeto.pk not in ids_novos:
+            projeto.atualizado_por = modificado_por
+            projeto.atualizado_em = agora
+            por_campos[tuple(alteracoes[projeto.pk]) + ('atualizado_por', 'atualizado_em')].append(projeto)
+    for campos_alterados, grupo in por_campos.items():
+        Project.objects.bulk_update(grupo, campos_alterados)
+
+    atualizar_elegibilidade(ids_novos, novos=True)
+    atualizar_elegibilidade(geografia_alterada)
+    if novos or por_campos:
+        invalidar_janelas()
+    _gravar_logs_status([(proj, None) for proj in novos] + mudancas_status, usuario)
+    atualizados = len(alteracoes.keys() - ids_novos)
+    return len(novos), atualizados, len(finais) - len(novos) - atualizados
+
 
-    for index, row in df.iterrows():
+def _ids_planilha(df):
+    """
+    Coluna `id` da planilha como UUIDs (None onde está vazia) e as mensagens
+    de erro das células que não são UUIDs válidos, por índice da linha.
+    """
+    campo_id = Project._meta.get_field('id')
+    ids = pd.Series([None] * len(df), index=df.index, dtype=object)
+    erros = {}
+    if 'id' not in df.columns:
+        return ids, erros
+    for index, valor in df['id'].items():
+        if pd.isna(valor) or str(valor).strip() == '':
+            continue
         try:
-            dados = parse_linha_para_dados(row, campos_validos, campos_datetime)
-            regioes = dados.pop('regioes_aceitas', [])
-            estados = dados.pop('estados_aceitos', [])
-            cidades = dados.pop('cidades_aceitas', [])
+            ids[index] = uuid.UUID(str(valor).strip())
+        except ValueError:
+            erros[index] = _mensagem_campo(campo_id, 'invalid', value=valor)
+    return ids, erros
+
 
-            projeto = Project(**dados)
-            projeto.full_clean()
+def _validar_lote(df, com_id=False):
+    """
+    Projetos válidos do lote com o índice da linha de cada um, os ids
+    informados na coluna `id` (só com `com_id`), os nomes multivalorados e o
+    relatório das linhas ignoradas.
+    """
+    dados, datas_invalidas = preparar_dados(df)
+    erros = validar_dados(dados, datas_invalidas)
+    ids, erros_id = _ids_planilha(df) if com_id else (pd.Series([None] * len(df), index=df.index, dtype=object), {})
+
+    projetos, linhas, ids_validos = [], [], []
+    nomes_m2m = {campo: [] for campo in CAMPOS_MULTIVALOR}
+    ignoradas = []
+
+    for index, linha, erro, pk in zip(dados.index, dados.to_dict('records'), erros, ids):
+        valores_m2m = {campo: linha.pop(campo) for campo in CAMPOS_MULTIVALOR}
+        try:
+            if index in erros_id:
+                erro = {**(erro or {}), 'id': [erros_id[index]]}
+            if erro:
+                raise ValidationError(erro)
+            projeto = Project(**linha)
+            # O único campo único é o UUID recém-gerado; dispensa uma consulta por linha.
+            projeto.full_clean(validate_unique=False)
 
             projetos.append(projeto)
-            regioes_aceitas_list.append(regioes)
-            estados_aceitos_list.append(estados)
-            cidades_aceitas_list.append(cidades)
+            linhas.append(index)
+            ids_validos.append(pk)
+            for campo, valores in valores_m2m.items():
+                nomes_m2m[campo].append(valores)
 
         except Exception as e:
             ignoradas.append(
                 f"Linha {index + 2} - não processada\n"
-                f"    Conteúdo: {dados}\n"
+                f"    Conteúdo: {linha}\n"
                 f"    Motivo: {str(e)}\n"
             )
+    return projetos, linhas, ids_validos, nomes_m2m, ignoradas
+
+
+def _remover_chaves_repetidas(projetos, linhas, ids, nomes_m2m, chave):
+    """
+    Quando duas linhas do lote apontam para o mesmo projeto (mesmo id ou
+    mesma chave natural), vale a última; as anteriores vão para o relatório.
+    """
+    chaves = [pk or _chave_natural(projeto, chave) for projeto, pk in zip(projetos, ids)]
+    ultima = {valor: posicao for posicao, valor in enumerate(chaves)}
+    if len(ultima) == len(chaves):
+        return projetos, ids, nomes_m2m, []
+
+    manter = sorted(ultima.values())
+    ignoradas = [
+        f"Linha {linhas[posicao] + 2} - não processada\n"
+        f"    Motivo: substituída pela linha {linhas[ultima[valor]] + 2}, que aponta para o mesmo projeto.\n"
+        for posicao, valor in enumerate(chaves) if ultima[valor] != posicao
+    ]
+    return (
+        [projetos[posicao] for posicao in manter],
+        [ids[posicao] for posicao in manter],
+        {campo: [listas[posicao] for posicao in manter] for campo, listas in nomes_m2m.items()},
+        ignoradas,
+    )
+
+
+def calcular_sha256(arquivo):
+    """SHA-256 de um File do Django, lido em blocos."""
+    sha256 = hashlib.sha256()
+    for bloco in arquivo.chunks():
+        sha256.update(bloco)
+    return sha256.hexdigest()
+
+
+def armazenar_planilha(arquivo):
+    """
+    Grava o arquivo enviado uma única vez por conteúdo e retorna
+    (nome no storage, sha256). Um reenvio do mesmo arquivo reaproveita a
+    cópia já gravada, e com ela o cache de leitura (ver projects.leitura).
+    """
+    sha256 = calcular_sha256(arquivo)
+
+    storage = ImportacaoProjeto._meta.get_field('arquivo').storage
+    existentes = (
+        ImportacaoProjeto.objects
+        .filter(sha256=sha256)
+        .exclude(arquivo='')
+        .values_list('arquivo', flat=True)
+        .distinct()
+    )
+    for nome in existentes:
+        if storage.exists(nome):
+            return nome, sha256
+
+    extensao = os.path.splitext(arquivo.name or '')[1].lower()
+    nome = f'importacoes/{sha256}{extensao}'
+    if not storage.exists(nome):
+        nome = storage.save(nome, arquivo)
+    return nome, sha256
+
+
+def _colunas_importacao():
+    """Colunas lidas da planilha e, entre elas, as que são lidas como texto."""
+    campos = Project._meta.get_fields()
+    colunas_texto = {f.name for f in campos if isinstance(f, (models.CharField, models.TextField))}
+    return {f.name for f in campos}, colunas_texto | set(CAMPOS_MULTIVALOR)
+
+
+def _resumir_lote(df, com_id=False):
+    """
+    Valida um lote sem gravar nada e devolve só dados simples (roda também
+    nos processos do pool): linhas lidas, projetos válidos, relatório das
+    linhas ignoradas e nomes multivalorados distintos por campo.
+    """
+    projetos, _, _, nomes_m2m, ignoradas = _validar_lote(df, com_id)
+    nomes = {
+        campo: {str(nome).strip() for nomes_projeto in listas for nome in nomes_projeto}
+        for campo, listas in nomes_m2m.items() if campo in df.columns
+    }
+    return len(df), len(projetos), ignoradas, nomes
+
+
+def _resumir_em_paralelo(lotes, com_id, processos):
+    """
+    Distribui os lotes entre `processos` processos, mantendo no máximo dois
+    lotes por processo em espera, e devolve os resumos na ordem dos lotes.
+    """
+    # Os processos filhos não podem herdar a conexão aberta do pai
+    connections.close_all()
+    with ProcessPoolExecutor(processos, mp_context=multiprocessing.get_context('fork')) as pool:
+        pendentes = deque()
+        for df in lotes:
+            pendentes.append(pool.submit(_resumir_lote, df, com_id))
+            if len(pendentes) >= 2 * processos:
+                yield pendentes.popleft().result()
+        while pendentes:
+            yield pendentes.popleft().result()
+
+
+def validar_planilha_projetos(caminho, sha256='', com_id=False, tamanho_lote=None, processos=1, ao_validar_lote=None):
+    """
+    Simulação da importação: leitura, validação (incluindo full_clean) e
+    resolução dos nomes de regiões, estados e cidades, sem gravar nada no
+    banco. Retorna as contagens, o relatório das linhas ignoradas e os nomes
+    que não correspondem a nenhum registro.
+    Com `processos` > 1, planilhas com mais de um lote são validadas em
+    paralelo por processos criados com fork; por isso só o worker
+    (processar_importacoes) passa processos > 1, nunca uma requisição web.
+    `ao_validar_lote(linhas)` é chamada a cada lote validado.
+    """
+    tamanho_lote = tamanho_lote or TAMANHO_LOTE_IMPORTACAO
+    campos_validos, colunas_texto = _colunas_importacao()
+
+    lotes = ler_em_lotes_com_cache(caminho, sha256, campos_validos, tamanho_lote, colunas_texto)
+    iniciais = list(islice(lotes, 2))
+    if len(iniciais) > 1 and processos > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        resumos = _resumir_em_paralelo(chain(iniciais, lotes), com_id, processos)
+    else:
+        resumos = (_resumir_lote(df, com_id) for df in chain(iniciais, lotes))
+
+    linhas_lidas, projetos_validos, ignoradas = 0, 0, []
+    nomes = defaultdict(set)
+    for linhas_lote, validos_lote, ignoradas_lote, nomes_lote in resumos:
+        if ao_validar_lote is not None:
+            ao_validar_lote(linhas_lote)
+        linhas_lidas += linhas_lote
+        projetos_validos += validos_lote
+        ignoradas.extend(ignoradas_lote)
+        for campo, nomes_campo in nomes_lote.items():
+            nomes[campo] |= nomes_campo
+
+    nao_encontrados = {}
+    for campo, nomes_campo in nomes.items():
+        ids_por_nome = resolver_ids(Project._meta.get_field(campo).related_model, nomes_campo)
+        faltando = sorted(nome for nome, ids in ids_por_nome.items() if not ids)
+        if faltando:
+            nao_encontrados[campo] = faltando
+
+    return {
+        'linhas_lidas': linhas_lidas,
+        'projetos_validos': projetos_validos,
+        'projetos_ignorados': len(ignoradas),
+        'nomes_nao_encontrados': nao_encontrados,
+        'linhas_ignoradas': "\n".join(ignoradas),
+    }
 
+
+def importar_planilha_projetos(importacao_obj, usuario=None, tamanho_lote=None):
+    """
+    Lê a planilha em lotes de `tamanho_lote` linhas (ver projects.leitura),
+    validando e gravando cada lote na sua própria transação, de modo que a
+    memória usada não cresce com o tamanho do arquivo. Os contadores da
+    importação são atualizados a cada lote para acompanhar o progresso.
+    """
+    tamanho_lote = tamanho_lote or TAMANHO_LOTE_IMPORTACAO
+    caminho = importacao_obj.arquivo.path
+
+    importacao_obj.status = ImportacaoProjeto.Status.LENDO
+    importacao_obj.linhas_total = None
+    if importacao_obj.sha256:
+        # Mesmo conteúdo já importado: o total é conhecido sem abrir a planilha
+        importacao_obj.linhas_total = (
+            ImportacaoProjeto.objects
+            .filter(sha256=importacao_obj.sha256, status=ImportacaoProjeto.Status.CONCLUIDA)
+            .exclude(pk=importacao_obj.pk)
+            .values_list('linhas_lidas', flat=True)
+            .first()
+        )
+    if importacao_obj.linhas_total is None:
+        importacao_obj.linhas_total = contar_linhas(caminho)
+    importacao_obj.reservada_ate = timezone.now() + TEMPO_RESERVA_IMPORTACAO
+    importacao_obj.save(update_fields=['status', 'linhas_total', 'reservada_ate'])
+
+    campos_validos, colunas_texto = _colunas_importacao()
+    atualizar = importacao_obj.modo == ImportacaoProjeto.Modo.ATUALIZAR
+    chave = importacao_obj.campos_chave or CHAVE_IMPORTACAO
+
+    ignoradas = []
+    ids_por_nome = {}
+    for df in ler_em_lotes_com_cache(caminho, importacao_obj.sha256, campos_validos, tamanho_lote, colunas_texto):
+        projetos, linhas, ids, nomes_m2m, ignoradas_lote = _validar_lote(df, com_id=atualizar)
+        criados, atualizados, inalterados = len(projetos), 0, 0
+
+        with transaction.atomic():
+            if atualizar:
+                projetos, ids, nomes_m2m, repetidas = _remover_chaves_repetidas(projetos, linhas, ids, nomes_m2m, chave)
+                ignoradas_lote += repetidas
+                # Só as colunas presentes na planilha são comparadas e atualizadas
+                campos = [
+                    f.name for f in Project._meta.concrete_fields
+                    if f.editable and not f.primary_key and f.name in df.columns
+                ]
+                nomes_m2m = {campo: listas for campo, listas in nomes_m2m.items() if campo in df.columns}
+                criados, atualizados, inalterados = atualizar_lote_projetos(
+                    projetos, ids, nomes_m2m, campos, chave, usuario, ids_por_nome,
+                )
+            else:
+                gravar_lote_projetos(projetos, nomes_m2m, usuario, ids_por_nome)
+
+            importacao_obj.status = ImportacaoProjeto.Status.GRAVANDO
+            importacao_obj.reservada_ate = timezone.now() + TEMPO_RESERVA_IMPORTACAO
+            importacao_obj.linhas_lidas += len(df)
+            importacao_obj.projetos_criados += criados
+            importacao_obj.projetos_atualizados += atualizados
+            importacao_obj.projetos_inalterados += inalterados
+            importacao_obj.projetos_ignorados += len(ignoradas_lote)
+            importacao_obj.save(update_fields=[
+                'status', 'reservada_ate', 'linhas_lidas', 'projetos_criados', 'projetos_atualizados',
+                'projetos_inalterados', 'projetos_ignorados',
+            ])
+        ignoradas.extend(ignoradas_lote)
+
+    importacao_obj.status = ImportacaoProjeto.Status.CONCLUIDA
+    importacao_obj.concluida_em = timezone.now()
+    importacao_obj.linhas_ignoradas_texto = "\n".join(ignoradas)
+    importacao_obj.save(update_fields=['status', 'concluida_em', 'linhas_ignoradas_texto'])
+
+
+def validar_importacao(importacao_obj):
+    """
+    Importação em modo `somente_validar`: valida a planilha com o pool de
+    PROCESSOS_VALIDACAO processos, guarda o resultado no registro (consultado
+    pelo detalhe da importação) e descarta a planilha enviada.
+    """
+    importacao_obj.status = ImportacaoProjeto.Status.LENDO
+    importacao_obj.linhas_total = contar_linhas(importacao_obj.arquivo.path)
+    importacao_obj.reservada_ate = timezone.now() + TEMPO_RESERVA_IMPORTACAO
+    importacao_obj.save(update_fields=['status', 'linhas_total', 'reservada_ate'])
+
+    def ao_validar_lote(linhas):
+        importacao_obj.linhas_lidas += linhas
+        importacao_obj.reservada_ate = timezone.now() + TEMPO_RESERVA_IMPORTACAO
+        importacao_obj.save(update_fields=['linhas_lidas', 'reservada_ate'])
+
+    try:
+        resultado = validar_planilha_projetos(
+            importacao_obj.arquivo.path,
+            importacao_obj.sha256,
+            com_id=importacao_obj.modo == ImportacaoProjeto.Modo.ATUALIZAR,
+            processos=PROCESSOS_VALIDACAO,
+            ao_validar_lote=ao_validar_lote,
+        )
+    finally:
+        descartar_planilha(importacao_obj)
+
+    importacao_obj.status = ImportacaoProjeto.Status.CONCLUIDA
+    importacao_obj.concluida_em = timezone.now()
+    importacao_obj.linhas_lidas = resultado['linhas_lidas']
+    importacao_obj.projetos_validos = resultado['projetos_validos']
+    importacao_obj.projetos_ignorados = resultado['projetos_ignorados']
+    importacao_obj.nomes_nao_encontrados = resultado['nomes_nao_encontrados']
+    importacao_obj.linhas_ignoradas_texto = resultado['linhas_ignoradas']
+    importacao_obj.save(update_fields=[
+        'status', 'concluida_em', 'linhas_lidas', 'projetos_validos', 'projetos_ignorados',
+        'nomes_nao_encontrados', 'linhas_ignoradas_texto',
+    ])
+
+
+def descartar_planilha(importacao_obj):
+    """
+    Apaga a planilha de uma simulação e os lotes em cache dela, a menos que
+    outra importação aponte para o mesmo arquivo (ver armazenar_planilha).
+    """
+    nome = importacao_obj.arquivo.name
+    if not nome:
+        return
+    ImportacaoProjeto.objects.filter(pk=importacao_obj.pk).update(arquivo='')
+    importacao_obj.arquivo = ''
+    if ImportacaoProjeto.objects.filter(arquivo=nome).exists():
+        return
+    storage = ImportacaoProjeto._meta.get_field('arquivo').storage
+    if importacao_obj.sha256:
+        remover_cache(storage.path(nome), importacao_obj.sha256)
+    storage.delete(nome)
+
+
+def _recuperar_importacao_expirada(importacao):
+    """
+    Importação cujo worker parou sem renovar a reserva. Volta para a fila
+    quando repetir é seguro: simulação, modo atualizar (cada lote é um
+    upsert) ou nada gravado ainda. No modo criar com lotes já gravados,
+    repetir duplicaria projetos, então ela é marcada como falha.
+    """
+    gravou = importacao.projetos_criados or importacao.status == ImportacaoProjeto.Status.GRAVANDO
+    if importacao.somente_validar or importacao.modo == ImportacaoProjeto.Modo.ATUALIZAR or not gravou:
+        importacao.status = ImportacaoProjeto.Status.NA_FILA
+        importacao.reservada_ate = None
+        importacao.linhas_lidas = 0
+        importacao.projetos_criados = importacao.projetos_atualizados = 0
+        importacao.projetos_inalterados = importacao.projetos_ignorados = importacao.projetos_validos = 0
+        importacao.save(update_fields=[
+            'status', 'reservada_ate', 'linhas_lidas', 'projetos_criados', 'projetos_atualizados',
+            'projetos_inalterados', 'projetos_ignorados', 'projetos_validos',
+        ])
+        return
+    importacao.status = ImportacaoProjeto.Status.FALHOU
+    importacao.erro = (
+        f"O processamento foi interrompido; {importacao.linhas_lidas} linhas já tinham sido lidas e "
+        f"{importacao.projetos_criados} projetos gravados. Reenvie só as linhas restantes."
+    )
+    importacao.concluida_em = timezone.now()
+    importacao.save(update_fields=['status', 'erro', 'concluida_em'])
+
+
+def reservar_importacao():
+    """
+    Retira da fila a importação mais antiga e a marca como iniciada, com uma
+    reserva de TEMPO_RESERVA_IMPORTACAO renovada a cada lote. Antes, as
+    importações com reserva vencida (worker morto) voltam para a fila ou
+    falham (ver _recuperar_importacao_expirada). Vários workers podem
+    consultar a fila ao mesmo tempo sem pegar a mesma.
+    """
+    agora = timezone.now()
     with transaction.atomic():
-        Project.objects.bulk_create(projetos)
-        projetos_criados = Project.objects.order_by('-id')[:len(projetos)][::-1]
-
-        todas_regioes = Regiao.objects.all()
-        todos_estados = Estado.objects.all()
-        todas_cidades = Cidade.objects.select_related('estado__regiao').all()
-
-        def filtrar_objs(model_objs, nomes, campos_lookup):
-            if not nomes:
-                return model_objs.none()
-            queries = Q()
-            for val in nomes:
-                q = Q()
-                for campo in campos_lookup:
-                    q |= Q(**{f"{campo}__iexact": val})
-                queries |= q
-            return model_objs.filter(queries).distinct()
-
-        for proj, reg_names, est_names, cid_names in zip(projetos_criados, regioes_aceitas_list, estados_aceitos_list, cidades_aceitas_list):
-            regioes_objs = filtrar_objs(todas_regioes, reg_names, ['nome', 'abreviacao'])
-            estados_objs = filtrar_objs(todos_estados, est_names, ['nome', 'uf'])
-            cidades_objs = filtrar_objs(todas_cidades, cid_names, ['nome', 'estado__regiao__nome', 'estado__regiao__abreviacao'])
-
-            proj.regioes_aceitas.set(regioes_objs)
-            proj.estados_aceitos.set(estados_objs)
-            proj.cidades_aceitas.set(cidades_objs)
-
-            registrar_log_status(
-                projeto=proj,
-                status_anterior=None,  
-                status_novo=proj.status,
-                usuario=request.user
-            )
+        expiradas = (
+            ImportacaoProjeto.objects
+            .select_for_update(skip_locked=True)
+            .filter(status__in=[ImportacaoProjeto.Status.LENDO, ImportacaoProjeto.Status.GRAVANDO])
+            .filter(models.Q(reservada_ate__lt=agora) | models.Q(reservada_ate__isnull=True))
+        )
+        for importacao in expiradas:
+            logger.warning("Reserva da importação de projetos %s expirou", importacao.pk)
+            _recuperar_importacao_expirada(importacao)
+
+        importacao = (
+            ImportacaoProjeto.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=ImportacaoProjeto.Status.NA_FILA)
+            .order_by('data_importacao', 'id')
+            .first()
+        )
+        if importacao is None:
+            return None
+        importacao.status = ImportacaoProjeto.Status.LENDO
+        importacao.iniciada_em = agora
+        importacao.reservada_ate = agora + TEMPO_RESERVA_IMPORTACAO
+        importacao.save(update_fields=['status', 'iniciada_em', 'reservada_ate'])
+    return importacao
+
 
-        importacao_obj.linhas_lidas = total_linhas
-        importacao_obj.projetos_criados = len(projetos)
-        importacao_obj.projetos_ignorados = len(ignoradas)
-        importacao_obj.linhas_ignoradas_texto = "\n".join(ignoradas)
-        importacao_obj.save()
+def processar_importacao(importacao):
+    """
+    Executa a importação e registra a falha no próprio registro. Os lotes já
+    gravados antes de uma falha são mantidos e contados em `projetos_criados`.
+    """
+    if importacao.iniciada_em is None:
+        importacao.iniciada_em = timezone.now()
+        importacao.save(update_fields=['iniciada_em'])
+    try:
+        if importacao.somente_validar:
+            validar_importacao(importacao)
+        else:
+            importar_planilha_projetos(importacao, importacao.usuario)
+    except Exception as e:
+        logger.exception("Falha na importação de projetos %s", importacao.pk)
+        importacao.status = ImportacaoProjeto.Status.FALHOU
+        importacao.erro = str(e)[:2000]
+        importacao.concluida_em = timezone.now()
+        importacao.save(update_fields=['status', 'erro', 'concluida_em'])
+        return False
+    return True
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete, post_save
+
+from .janelas import invalidar_janelas
+from .models import Project
+
+
+def projeto_alterado(sender, **kwargs):
+    invalidar_janelas()
+
+
+# Escritas em lote (importação) não disparam sinais e invalidam em projects.services
+post_save.connect(projeto_alterado, sender=Project, dispatch_uid='janelas_save_project')
+post_delete.connect(projeto_alterado, sender=Project, dispatch_uid='janelas_delete_project')
@@ -1,3 +1,767 @@
-from django.test import TestCase
+import os
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from openpyxl import Workbook
+import pandas as pd
+from rest_framework.test import APIClient
+
+from core.models import Cidade, Estado, Regiao
+from core.nomes import ids_resolvidos
+from users.models import User
+
+from . import services
+from .elegibilidade import atualizar_elegibilidade
+from .janelas import IndiceJanelas
+from .leitura import contar_linhas, ler_em_lotes, ler_em_lotes_com_cache, remover_cache
+from .models import ElegibilidadeProjeto, ImportacaoProjeto, Project, ProjectStatusLog
+from .services import _converter_datas, _resumir_lote, processar_importacao, reservar_importacao
+
+
+def criar_projeto(inicio, fim, **extras):
+    agora = timezone.now()
+    return Project.objects.create(
+        nome=extras.pop('nome', 'Projeto'), descricao=extras.pop('descricao', 'Descrição'), vagas=10,
+        inicio_inscricoes=inicio, fim_inscricoes=fim,
+        data_inicio=agora + timedelta(days=30), data_fim=agora + timedelta(days=60), **extras,
+    )
+
+
+def planilha_projetos(linhas, nome='projetos.csv'):
+    """CSV de projetos com os campos obrigatórios preenchidos; `linhas` traz só o que muda."""
+    padrao = {
+        'descricao': 'Descrição', 'vagas': 10, 'status': 'rascunho',
+        'inicio_inscricoes': '01/03/2030', 'fim_inscricoes': '31/03/2030',
+        'data_inicio': '01/04/2030', 'data_fim': '30/06/2030',
+    }
+    df = pd.DataFrame([{**padrao, **linha} for linha in linhas])
+    return SimpleUploadedFile(nome, df.to_csv(index=False).encode(), content_type='text/csv')
+
+
+class ImportacaoProjetosMixin:
+    """Storage temporário, regiões/estados/cidades e um admin para os testes de importação."""
+
+    def setUp(self):
+        caches['default'].clear()
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        configuracao = override_settings(MEDIA_ROOT=pasta.name, IMPORTACAO_PROJETOS_EAGER=True)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        nordeste = Regiao.objects.create(nome='Nordeste', abreviacao='NE', descricao='Nordeste')
+        self.nordeste = nordeste
+        self.pe = Estado.objects.create(uf='PE', nome='Pernambuco', regiao=nordeste)
+        self.ba = Estado.objects.create(uf='BA', nome='Bahia', regiao=nordeste)
+        self.recife = Cidade.objects.create(nome='Recife', estado=self.pe)
+        self.salvador = Cidade.objects.create(nome='Salvador', estado=self.ba)
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(User.objects.create_user(
+            email='admin@example.com', cpf='52998224725', password='Senha@123', is_staff=True,
+        ))
+
+    def importar(self, linhas, **parametros):
+        resposta = self.cliente.post(
+            '/projetos/importar-projetos/', {'arquivo': planilha_projetos(linhas), **parametros}, format='multipart',
+        )
+        self.assertEqual(resposta.status_code, 202, resposta.data)
+        return ImportacaoProjeto.objects.get(pk=resposta.data['id'])
+
+
+class VerificarInscricoesTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        agora = timezone.now()
+        self.aberto = criar_projeto(agora - timedelta(days=1), agora + timedelta(days=1))
+        self.encerrado = criar_projeto(agora - timedelta(days=3), agora - timedelta(days=2))
+        self.inativo = criar_projeto(agora - timedelta(days=1), agora + timedelta(days=1), ativo=False)
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(
+            User.objects.create_user(email='ana@example.com', cpf='52998224725', password='Senha@123')
+        )
+
+    def situacoes(self, *projetos_ids):
+        resposta = self.cliente.get('/projetos/verificar-inscricoes/', {'ids': ','.join(map(str, projetos_ids))})
+        self.assertEqual(resposta.status_code, 200)
+        return {str(item['id']): item for item in resposta.data['projetos']}
+
+    def test_lote_e_projeto_unico_concordam(self):
+        inexistente = uuid.uuid4()
+        situacoes = self.situacoes(self.aberto.pk, self.encerrado.pk, self.inativo.pk, inexistente)
+
+        for projeto in (self.aberto, self.encerrado, self.inativo):
+            unico = self.cliente.get(f'/projetos/verificar-inscricao/{projeto.pk}/')
+            self.assertEqual(unico.data['pode_inscrever'], situacoes[str(projeto.pk)]['pode_inscrever'])
+        self.assertEqual(situacoes[str(self.encerrado.pk)]['situacao'], 'encerrada')
+        self.assertEqual(situacoes[str(self.inativo.pk)]['situacao'], 'aberta')
+        self.assertEqual(situacoes[str(inexistente)]['situacao'], 'nao_encontrado')
+        self.assertEqual(self.cliente.get(f'/projetos/verificar-inscricao/{inexistente}/').status_code, 404)
+
+    def test_sem_ids_lista_os_ativos_abertos(self):
+        resposta = self.cliente.get('/projetos/verificar-inscricoes/')
+        self.assertEqual([item['id'] for item in resposta.data['projetos']], [self.aberto.pk])
+
+    def test_alteracao_de_prazo_aparece_no_lote(self):
+        self.situacoes(self.aberto.pk)
+        self.aberto.fim_inscricoes = timezone.now() - timedelta(minutes=1)
+        self.aberto.save()
+
+        self.assertEqual(self.situacoes(self.aberto.pk)[str(self.aberto.pk)]['situacao'], 'encerrada')
+
+
+class BuscaProjetosTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        agora = timezone.now()
+        janela = (agora - timedelta(days=1), agora + timedelta(days=1))
+        self.no_nome = criar_projeto(*janela, nome='Robótica para meninas', descricao='Oficinas de montagem.')
+        self.na_descricao = criar_projeto(*janela, nome='Oficina de ciências', descricao='Inclui robótica básica.')
+        self.outro = criar_projeto(*janela, nome='Astronomia', descricao='Observação do céu.')
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(
+            User.objects.create_user(email='ana@example.com', cpf='52998224725', password='Senha@123')
+        )
+
+    def ids_buscados(self, texto):
+        resposta = self.cliente.get('/projetos/todos/', {'q': texto})
+        self.assertEqual(resposta.status_code, 200)
+        return [item['id'] for item in resposta.data['results']]
+
+    def test_nome_pesa_mais_que_a_descricao(self):
+        self.assertEqual(self.ids_buscados('robotica'), [str(self.no_nome.pk), str(self.na_descricao.pk)])
+
+    def test_prefixo_sem_acento_e_todas_as_palavras(self):
+        self.assertEqual(self.ids_buscados('ciencia oficina'), [str(self.na_descricao.pk)])
+        self.assertEqual(self.ids_buscados('ceu'), [str(self.outro.pk)])
+
+    def test_alteracao_e_exclusao_atualizam_o_indice(self):
+        self.outro.nome = 'Robótica espacial'
+        self.outro.save()
+        self.na_descricao.delete()
+
+        self.assertCountEqual(self.ids_buscados('robotica'), [str(self.no_nome.pk), str(self.outro.pk)])
+
+    def test_post_migrate_recria_gatilhos_perdidos(self):
+        from django.db import connection
+
+        from .busca import GATILHOS_FTS, garantir_gatilhos
+
+        if connection.vendor != 'sqlite':
+            self.skipTest('gatilhos só existem no SQLite')
+        with connection.cursor() as cursor:
+            for gatilho in GATILHOS_FTS:
+                cursor.execute(f'DROP TRIGGER {gatilho}')
+        sem_indice = criar_projeto(timezone.now(), timezone.now(), nome='Química verde')
+        self.assertEqual(self.ids_buscados('quimica'), [])
+
+        garantir_gatilhos()
+
+        self.assertEqual(self.ids_buscados('quimica'), [str(sem_indice.pk)])
+        sem_indice.delete()
+        self.assertEqual(self.ids_buscados('quimica'), [])
+
+
+class FiltrosGeograficosTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        nordeste = Regiao.objects.create(nome='Nordeste', abreviacao='NE', descricao='Nordeste')
+        sudeste = Regiao.objects.create(nome='Sudeste', abreviacao='SE', descricao='Sudeste')
+        self.pe = Estado.objects.create(uf='PE', nome='Pernambuco', regiao=nordeste)
+        self.ba = Estado.objects.create(uf='BA', nome='Bahia', regiao=nordeste)
+        self.sp = Estado.objects.create(uf='SP', nome='São Paulo', regiao=sudeste)
+        recife = Cidade.objects.create(nome='Recife', estado=self.pe)
+        campinas = Cidade.objects.create(nome='Campinas', estado=self.sp)
+
+        agora = timezone.now()
+        janela = (agora - timedelta(days=1), agora + timedelta(days=1))
+        self.em_pe = criar_projeto(*janela, nome='Pernambuco')
+        self.em_pe_e_ba = criar_projeto(*janela, nome='Pernambuco e Bahia')
+        self.em_sp = criar_projeto(*janela, nome='São Paulo')
+        self.em_pe.estados_aceitos.set([self.pe])
+        self.em_pe_e_ba.estados_aceitos.set([self.pe, self.ba])
+        self.em_sp.estados_aceitos.set([self.sp])
+        self.em_pe_e_ba.regioes_aceitas.set([nordeste])
+        self.em_sp.regioes_aceitas.set([sudeste])
+        self.em_pe.cidades_aceitas.set([recife])
+        self.em_sp.cidades_aceitas.set([campinas])
+
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(
+            User.objects.create_user(email='ana@example.com', cpf='52998224725', password='Senha@123')
+        )
+
+    def ids_filtrados(self, **parametros):
+        resposta = self.cliente.get('/projetos/todos/', parametros)
+        self.assertEqual(resposta.status_code, 200)
+        return {item['id'] for item in resposta.data['results']}
+
+    def test_nome_sigla_ou_id(self):
+        pe_e_ba = {str(self.em_pe.pk), str(self.em_pe_e_ba.pk)}
+        self.assertEqual(self.ids_filtrados(estados_aceitos='pe, Bahia'), pe_e_ba)
+        self.assertEqual(self.ids_filtrados(estados_aceitos=f'{self.pe.pk},{self.ba.pk}'), pe_e_ba)
+        self.assertEqual(self.ids_filtrados(regioes_aceitas='NE'), {str(self.em_pe_e_ba.pk)})
+        self.assertEqual(self.ids_filtrados(regiao='sudeste'), {str(self.em_sp.pk)})
+        self.assertEqual(self.ids_filtrados(cidades_aceitas='recife'), {str(self.em_pe.pk)})
+
+    def test_sem_acento_e_valores_desconhecidos(self):
+        self.assertEqual(self.ids_filtrados(estados_aceitos='sao paulo'), {str(self.em_sp.pk)})
+        self.assertEqual(self.ids_filtrados(estados_aceitos='Atlântida'), set())
+
+    def test_projeto_em_varios_estados_aparece_uma_vez_sem_distinct(self):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.cliente.get('/projetos/todos/', {'estados_aceitos': 'PE,BA'})
+
+        ids = [item['id'] for item in resposta.data['results']]
+        self.assertCountEqual(ids, [str(self.em_pe.pk), str(self.em_pe_e_ba.pk)])
+        self.assertEqual(resposta.data['count'], 2)
+        self.assertFalse(any('DISTINCT' in consulta['sql'].upper() for consulta in consultas.captured_queries))
+
+    def test_resolucao_de_nomes_fica_em_cache(self):
+        with mock.patch('core.nomes.ids_resolvidos', wraps=ids_resolvidos) as resolver:
+            self.ids_filtrados(estados_aceitos='PE,Bahia')
+            self.ids_filtrados(estados_aceitos='bahia, pe')
+
+        resolver.assert_called_once()
+
+
+class ValidacaoImportacaoTests(TestCase):
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        configuracao = override_settings(MEDIA_ROOT=pasta.name)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(User.objects.create_user(
+            email='admin@example.com', cpf='52998224725', password='Senha@123', is_staff=True,
+        ))
+
+    def planilha(self, linhas=5):
+        corpo = ''.join(f'Projeto {n},Descrição {n},10\n' for n in range(linhas))
+        return SimpleUploadedFile('projetos.csv', f'nome,descricao,vagas\n{corpo}'.encode(), content_type='text/csv')
+
+    def arquivos_gravados(self):
+        return sorted(
+            os.path.relpath(os.path.join(raiz, nome), settings.MEDIA_ROOT)
+            for raiz, _, nomes in os.walk(settings.MEDIA_ROOT) for nome in nomes
+        )
+
+    @mock.patch('projects.services.TAMANHO_LOTE_IMPORTACAO', 2)
+    @mock.patch('projects.services.PROCESSOS_VALIDACAO', 4)
+    @mock.patch('projects.services._resumir_em_paralelo', side_effect=lambda lotes, com_id, processos: (
+        _resumir_lote(df, com_id) for df in lotes
+    ))
+    def test_dry_run_vai_para_o_pool_do_worker(self, em_paralelo):
+        resposta = self.cliente.post('/projetos/importar-projetos/?dry_run=1', {'arquivo': self.planilha()}, format='multipart')
+
+        self.assertEqual(resposta.status_code, 202, resposta.data)
+        self.assertTrue(resposta.data['somente_validar'])
+        em_paralelo.assert_not_called()
+
+        importacao = reservar_importacao()
+        self.assertTrue(processar_importacao(importacao))
+
+        self.assertEqual(em_paralelo.call_args.args[2], 4)
+        detalhe = self.cliente.get(resposta['Location']).data
+        self.assertEqual((detalhe['status'], detalhe['linhas_lidas'], detalhe['projetos_ignorados']), ('concluida', 5, 5))
+        self.assertFalse(Project.objects.exists())
+        # A planilha da simulação e os lotes em cache não ficam no storage
+        self.assertEqual(self.arquivos_gravados(), [])
+
+    def test_planilha_usada_por_outra_importacao_e_mantida(self):
+        self.cliente.post('/projetos/importar-projetos/', {'arquivo': self.planilha()}, format='multipart')
+        self.cliente.post('/projetos/importar-projetos/?dry_run=1', {'arquivo': self.planilha()}, format='multipart')
+        validacao = ImportacaoProjeto.objects.get(somente_validar=True)
+
+        processar_importacao(validacao)
+
+        importacao = ImportacaoProjeto.objects.get(somente_validar=False)
+        self.assertIn(importacao.arquivo.name, self.arquivos_gravados())
+        self.assertEqual(ImportacaoProjeto.objects.get(pk=validacao.pk).arquivo.name, '')
+
+
+class ImportacaoM2MTests(ImportacaoProjetosMixin, TestCase):
+    def test_nomes_resolvidos_e_vinculos_gravados(self):
+        importacao = self.importar([
+            {'nome': 'A', 'regioes_aceitas': 'nordeste', 'status': 'inscricoes_abertas'},
+            {'nome': 'B', 'estados_aceitos': 'pe, Bahia', 'cidades_aceitas': 'recife - PE'},
+            {'nome': 'C', 'estados_aceitos': 'Narnia'},
+        ])
+
+        self.assertEqual((importacao.status, importacao.projetos_criados), ('concluida', 3))
+        projetos = {projeto.nome: projeto for projeto in Project.objects.all()}
+        self.assertEqual(list(projetos['A'].regioes_aceitas.all()), [self.nordeste])
+        self.assertCountEqual(projetos['B'].estados_aceitos.all(), [self.pe, self.ba])
+        self.assertEqual(list(projetos['B'].cidades_aceitas.all()), [self.recife])
+        # Nome sem correspondência não vira vínculo
+        self.assertFalse(projetos['C'].estados_aceitos.exists())
+        self.assertEqual(
+            dict(ProjectStatusLog.objects.values_list('projeto__nome', 'status_novo')),
+            {'A': 'inscricoes_abertas', 'B': 'rascunho', 'C': 'rascunho'},
+        )
+
+    def consultas_da_importacao(self, linhas):
+        with CaptureQueriesContext(connection) as consultas:
+            self.importar(linhas)
+        return len(consultas)
+
+    def test_consultas_nao_crescem_com_as_linhas(self):
+        linha = {'regioes_aceitas': 'Nordeste', 'estados_aceitos': 'PE,BA', 'cidades_aceitas': 'Recife,Salvador'}
+
+        poucas = self.consultas_da_importacao([{'nome': f'P{n}', **linha} for n in range(2)])
+        muitas = self.consultas_da_importacao([{'nome': f'M{n}', 'descricao': f'D{n}', **linha} for n in range(30)])
+
+        self.assertEqual(muitas, poucas)
+        self.assertEqual(Project.objects.count(), 32)
+
+
+class ImportacaoEmLotesTests(ImportacaoProjetosMixin, TestCase):
+    def linhas(self, total=5):
+        return [{'nome': f'Projeto {n}'} for n in range(total)]
+
+    @override_settings(IMPORTACAO_PROJETOS_EAGER=False)
+    def test_post_devolve_202_e_o_worker_processa_a_fila(self):
+        resposta = self.cliente.post(
+            '/projetos/importar-projetos/', {'arquivo': planilha_projetos(self.linhas())}, format='multipart',
+        )
+
+        self.assertEqual(resposta.status_code, 202)
+        self.assertEqual(resposta.data['status'], 'na_fila')
+        self.assertFalse(Project.objects.exists())
+
+        call_command('processar_importacoes', stdout=StringIO())
+
+        detalhe = self.cliente.get(resposta['Location']).data
+        self.assertEqual(
+            (detalhe['status'], detalhe['linhas_lidas'], detalhe['projetos_criados']), ('concluida', 5, 5),
+        )
+        self.assertIsNotNone(detalhe['iniciada_em'])
+        self.assertIsNotNone(detalhe['concluida_em'])
+
+    @mock.patch('projects.services.TAMANHO_LOTE_IMPORTACAO', 2)
+    def test_falha_num_lote_mantem_os_anteriores(self):
+        gravar = services.gravar_lote_projetos
+
+        def falhar_no_segundo(projetos, *args, **kwargs):
+            if gravar_lote.call_count == 2:
+                raise RuntimeError('banco indisponível')
+            return gravar(projetos, *args, **kwargs)
+
+        with mock.patch('projects.services.gravar_lote_projetos', side_effect=falhar_no_segundo) as gravar_lote, \
+                self.assertLogs('projects.services', 'ERROR'):
+            importacao = self.importar(self.linhas())
+
+        self.assertEqual(importacao.status, 'falhou')
+        self.assertEqual(importacao.erro, 'banco indisponível')
+        self.assertEqual((importacao.linhas_lidas, importacao.projetos_criados), (2, 2))
+        self.assertEqual(Project.objects.count(), 2)
+
+    @mock.patch('projects.services.TAMANHO_LOTE_IMPORTACAO', 2)
+    def test_progresso_por_lote_e_total_de_reenvio(self):
+        progresso = []
+        salvar = ImportacaoProjeto.save
+
+        def registrar(importacao, *args, **kwargs):
+            if 'linhas_lidas' in kwargs.get('update_fields', ()):
+                progresso.append((importacao.status, importacao.linhas_lidas))
+            return salvar(importacao, *args, **kwargs)
+
+        with mock.patch.object(ImportacaoProjeto, 'save', autospec=True, side_effect=registrar):
+            primeira = self.importar(self.linhas())
+        reenvio = self.importar(self.linhas())
+
+        self.assertEqual(progresso, [('gravando', 2), ('gravando', 4), ('gravando', 5)])
+        # CSV não informa o total; no reenvio do mesmo conteúdo, vem da importação anterior
+        self.assertIsNone(primeira.linhas_total)
+        self.assertEqual(reenvio.linhas_total, 5)
+        self.assertEqual(reenvio.arquivo.name, primeira.arquivo.name)
+
+
+class ImportacaoAtualizarTests(ImportacaoProjetosMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.importar([
+            {'nome': 'A', 'vagas': 10, 'estados_aceitos': 'PE'},
+            {'nome': 'B', 'vagas': 20},
+        ])
+        self.a = Project.objects.get(nome='A')
+
+    def test_reimportacao_atualiza_so_o_que_mudou(self):
+        importacao = self.importar([
+            {'nome': 'A', 'vagas': 15, 'estados_aceitos': 'PE'},
+            {'nome': 'B', 'vagas': 20},
+            {'nome': 'C', 'vagas': 5},
+        ], modo='atualizar')
+
+        self.assertEqual(
+            (importacao.projetos_criados, importacao.projetos_atualizados, importacao.projetos_inalterados), (1, 1, 1),
+        )
+        self.assertEqual(dict(Project.objects.values_list('nome', 'vagas')), {'A': 15, 'B': 20, 'C': 5})
+        self.assertEqual(Project.objects.get(nome='A').pk, self.a.pk)
+
+    def test_vinculos_sincronizados_sem_recriar_os_que_ficam(self):
+        through = Project.estados_aceitos.through
+        vinculo_pe = through.objects.get(project=self.a).pk
+
+        self.importar([{'nome': 'A', 'vagas': 10, 'estados_aceitos': 'PE,BA'}], modo='atualizar')
+        self.assertEqual(through.objects.get(project=self.a, estado=self.pe).pk, vinculo_pe)
+        self.assertCountEqual(self.a.estados_aceitos.all(), [self.pe, self.ba])
+
+        self.importar([{'nome': 'A', 'vagas': 10, 'estados_aceitos': 'BA'}], modo='atualizar')
+        self.assertEqual(list(self.a.estados_aceitos.all()), [self.ba])
+        # Elegibilidade acompanha os vínculos
+        self.assertEqual(set(self.a.elegibilidade.values_list('estado_id', flat=True)), {self.ba.pk})
+
+    def test_log_de_status_so_quando_o_status_muda(self):
+        self.importar([{'nome': 'A', 'vagas': 10, 'status': 'rascunho'}], modo='atualizar')
+        self.importar([{'nome': 'A', 'vagas': 10, 'status': 'inscricoes_abertas'}], modo='atualizar')
+
+        logs = self.a.logs_status.order_by('data_modificacao', 'id').values_list('status_anterior', 'status_novo')
+        self.assertEqual(list(logs), [(None, 'rascunho'), ('rascunho', 'inscricoes_abertas')])
+
+    def test_chave_configuravel_e_coluna_id(self):
+        renomeado = self.importar(
+            [{'id': str(self.a.pk), 'nome': 'A renomeado', 'vagas': 10}], modo='atualizar',
+        )
+        por_vagas = self.importar([{'nome': 'B novo nome', 'vagas': 20}], modo='atualizar', chave='vagas')
+
+        self.assertEqual((renomeado.projetos_atualizados, por_vagas.projetos_atualizados), (1, 1))
+        self.assertEqual(set(Project.objects.values_list('nome', flat=True)), {'A renomeado', 'B novo nome'})
+
+    def test_linhas_repetidas_vale_a_ultima(self):
+        importacao = self.importar([
+            {'nome': 'A', 'vagas': 11},
+            {'nome': 'A', 'vagas': 12},
+        ], modo='atualizar')
+
+        self.assertEqual(Project.objects.get(nome='A').vagas, 12)
+        self.assertEqual(importacao.projetos_ignorados, 1)
+        self.assertIn('substituída pela linha 3', importacao.linhas_ignoradas_texto)
+
+
+class ReservaImportacaoTests(TestCase):
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        configuracao = override_settings(MEDIA_ROOT=pasta.name)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(User.objects.create_user(
+            email='admin@example.com', cpf='52998224725', password='Senha@123', is_staff=True,
+        ))
+
+    def importacao(self, **campos):
+        corpo = ''.join(f'Projeto {n},Descrição {n},10\n' for n in range(5))
+        arquivo = SimpleUploadedFile('projetos.csv', f'nome,descricao,vagas\n{corpo}'.encode(), content_type='text/csv')
+        resposta = self.cliente.post('/projetos/importar-projetos/', {'arquivo': arquivo}, format='multipart')
+        importacao = ImportacaoProjeto.objects.get(pk=resposta.data['id'])
+        if campos:
+            ImportacaoProjeto.objects.filter(pk=importacao.pk).update(**campos)
+            importacao.refresh_from_db()
+        return importacao
+
+    def vencida(self, **campos):
+        return self.importacao(reservada_ate=timezone.now() - timedelta(seconds=1), iniciada_em=timezone.now(), **campos)
+
+    def test_reserva_ativa_nao_e_tomada(self):
+        self.importacao(status=ImportacaoProjeto.Status.GRAVANDO, reservada_ate=timezone.now() + timedelta(minutes=5))
+
+        self.assertIsNone(reservar_importacao())
+
+    def test_worker_morto_antes_de_gravar_volta_para_a_fila(self):
+        importacao = self.vencida(status=ImportacaoProjeto.Status.LENDO, linhas_lidas=2)
+
+        retomada = reservar_importacao()
+
+        self.assertEqual(retomada.pk, importacao.pk)
+        self.assertEqual(retomada.status, ImportacaoProjeto.Status.LENDO)
+        self.assertGreater(retomada.reservada_ate, timezone.now())
+        self.assertTrue(processar_importacao(retomada))
+        retomada.refresh_from_db()
+        # A leitura recomeça do início, sem somar as linhas da tentativa anterior
+        self.assertEqual((retomada.status, retomada.linhas_lidas), (ImportacaoProjeto.Status.CONCLUIDA, 5))
+
+    def test_modo_atualizar_com_lotes_gravados_volta_para_a_fila(self):
+        importacao = self.vencida(modo=ImportacaoProjeto.Modo.ATUALIZAR, status=ImportacaoProjeto.Status.GRAVANDO, linhas_lidas=2, projetos_criados=2)
+
+        retomada = reservar_importacao()
+
+        self.assertEqual(retomada.pk, importacao.pk)
+        self.assertEqual((retomada.linhas_lidas, retomada.projetos_criados), (0, 0))
+
+    def test_modo_criar_com_lotes_gravados_falha(self):
+        importacao = self.vencida(status=ImportacaoProjeto.Status.GRAVANDO, linhas_lidas=2, projetos_criados=2)
+
+        self.assertIsNone(reservar_importacao())
+
+        importacao.refresh_from_db()
+        self.assertEqual(importacao.status, ImportacaoProjeto.Status.FALHOU)
+        self.assertIn('2 projetos gravados', importacao.erro)
+        self.assertIsNotNone(importacao.concluida_em)
+
+    @mock.patch('projects.services.TAMANHO_LOTE_IMPORTACAO', 2)
+    def test_reserva_renovada_a_cada_lote(self):
+        self.importacao()
+        salvar = ImportacaoProjeto.save
+        renovacoes = []
+
+        def registrar(importacao, *args, **kwargs):
+            if 'reservada_ate' in kwargs.get('update_fields', ()):
+                renovacoes.append(importacao.reservada_ate)
+            return salvar(importacao, *args, **kwargs)
+
+        with mock.patch.object(ImportacaoProjeto, 'save', autospec=True, side_effect=registrar):
+            self.assertTrue(processar_importacao(reservar_importacao()))
+
+        # Reserva, início da leitura e um por lote de 2 linhas
+        self.assertEqual(len(renovacoes), 5)
+        self.assertEqual(renovacoes, sorted(renovacoes))
+
+
+class LeitoresPlanilhaTests(TestCase):
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.pasta = pasta.name
+
+    def arquivo(self, nome, conteudo):
+        caminho = os.path.join(self.pasta, nome)
+        with open(caminho, 'wb') as arquivo:
+            arquivo.write(conteudo)
+        return caminho
+
+    def xlsx(self, linhas):
+        caminho = os.path.join(self.pasta, 'projetos.xlsx')
+        planilha = Workbook()
+        for linha in linhas:
+            planilha.active.append(linha)
+        planilha.save(caminho)
+        return caminho
+
+    def test_xlsx_em_lotes_com_indice_continuo(self):
+        caminho = self.xlsx(
+            [[' nome ', 'vagas', 'ignorada']]
+            + [[f'Projeto {n}', n, 'x'] for n in range(5)]
+            + [[None, None, None]] * 3
+        )
+
+        lotes = list(ler_em_lotes(caminho, colunas={'nome', 'vagas'}, tamanho_lote=2))
+
+        self.assertEqual([len(df) for df in lotes], [2, 2, 1])
+        self.assertEqual(list(lotes[0].columns), ['nome', 'vagas'])
+        self.assertEqual([list(df.index) for df in lotes], [[0, 1], [2, 3], [4]])
+        self.assertEqual(lotes[2].loc[4, 'nome'], 'Projeto 4')
+        self.assertEqual(contar_linhas(caminho), 8)
+
+    def test_linha_vazia_no_meio_do_xlsx_e_mantida(self):
+        caminho = self.xlsx([['nome'], ['A'], [None], ['B']])
+
+        self.assertEqual(list(pd.concat(ler_em_lotes(caminho))['nome']), ['A', None, 'B'])
+
+    def test_csv_com_ponto_e_virgula_e_colunas_de_texto(self):
+        caminho = self.arquivo('projetos.csv', 'nome ;cep;vagas;extra\nA;01234;3;x\nB;04567;4;y\nC;00001;5;z\n'.encode())
+
+        lotes = list(ler_em_lotes(caminho, colunas={'nome', 'cep', 'vagas'}, tamanho_lote=2, colunas_texto={'cep'}))
+
+        self.assertEqual([len(df) for df in lotes], [2, 1])
+        self.assertEqual(list(lotes[0].columns), ['nome', 'cep', 'vagas'])
+        self.assertEqual(list(lotes[0]['cep']), ['01234', '04567'])
+        self.assertEqual(list(lotes[1].index), [2])
+        self.assertIsNone(contar_linhas(caminho))
+
+    def test_formato_pelo_conteudo_e_nao_pela_extensao(self):
+        xls = self.arquivo('projetos.csv', b'\xd0\xcf\x11\xe0' + b'0' * 20)
+        parquet = self.arquivo('projetos.xlsx', b'PAR1' + b'0' * 20)
+
+        with self.assertRaisesMessage(ValueError, '.xls não suportado'):
+            list(ler_em_lotes(xls))
+        with mock.patch.dict(sys.modules, {'pyarrow': None, 'pyarrow.parquet': None}), \
+                self.assertRaisesMessage(ValueError, 'requer o pacote pyarrow'):
+            list(ler_em_lotes(parquet))
+
+    def test_parquet_em_lotes(self):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            self.skipTest('pyarrow não instalado')
+        caminho = os.path.join(self.pasta, 'projetos.parquet')
+        pd.DataFrame({' nome': [f'P{n}' for n in range(5)], 'vagas': range(5)}).to_parquet(caminho)
+
+        lotes = list(ler_em_lotes(caminho, colunas={'nome'}, tamanho_lote=2))
+
+        self.assertEqual([list(df.index) for df in lotes], [[0, 1], [2, 3], [4]])
+        self.assertEqual(list(lotes[0].columns), ['nome'])
+        self.assertEqual(contar_linhas(caminho), 5)
+
+
+class CacheLeituraTests(TestCase):
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.caminho = os.path.join(pasta.name, 'projetos.csv')
+        with open(self.caminho, 'w', encoding='utf-8') as arquivo:
+            arquivo.write('nome,vagas\n' + ''.join(f'Projeto {n},{n}\n' for n in range(5)))
+
+    def ler(self, tamanho_lote=2, colunas=('nome', 'vagas')):
+        return list(ler_em_lotes_com_cache(self.caminho, 'abc', colunas, tamanho_lote))
+
+    def test_segunda_leitura_vem_do_cache(self):
+        primeira = self.ler()
+
+        with mock.patch('projects.leitura.ler_em_lotes') as ler_em_lotes:
+            segunda = self.ler()
+
+        ler_em_lotes.assert_not_called()
+        self.assertEqual([len(df) for df in segunda], [2, 2, 1])
+        for original, do_cache in zip(primeira, segunda):
+            pd.testing.assert_frame_equal(original, do_cache)
+
+    def test_outro_tamanho_de_lote_ou_colunas_nao_usa_o_cache(self):
+        self.ler(tamanho_lote=2)
+
+        self.assertEqual([len(df) for df in self.ler(tamanho_lote=3)], [3, 2])
+        self.assertEqual(list(self.ler(colunas=('nome',))[0].columns), ['nome'])
+
+    def test_leitura_interrompida_nao_vira_cache(self):
+        lotes = ler_em_lotes_com_cache(self.caminho, 'abc', None, 2)
+        next(lotes)
+        lotes.close()
+
+        self.assertEqual(os.listdir(os.path.join(os.path.dirname(self.caminho), 'cache')), [])
+
+    def test_remover_cache(self):
+        self.ler(tamanho_lote=2)
+        self.ler(tamanho_lote=3)
+
+        remover_cache(self.caminho, 'abc')
+
+        self.assertEqual(os.listdir(os.path.join(os.path.dirname(self.caminho), 'cache')), [])
+
+
+class ElegibilidadeTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        caches['usuarios'].clear()
+        nordeste = Regiao.objects.create(nome='Nordeste', abreviacao='NE', descricao='Nordeste')
+        sudeste = Regiao.objects.create(nome='Sudeste', abreviacao='SE', descricao='Sudeste')
+        pe = Estado.objects.create(uf='PE', nome='Pernambuco', regiao=nordeste)
+        ba = Estado.objects.create(uf='BA', nome='Bahia', regiao=nordeste)
+        sp = Estado.objects.create(uf='SP', nome='São Paulo', regiao=sudeste)
+        self.recife = Cidade.objects.create(nome='Recife', estado=pe)
+        self.olinda = Cidade.objects.create(nome='Olinda', estado=pe)
+        self.salvador = Cidade.objects.create(nome='Salvador', estado=ba)
+        self.campinas = Cidade.objects.create(nome='Campinas', estado=sp)
+        self.nordeste, self.pe = nordeste, pe
+        agora = timezone.now()
+        self.projeto = criar_projeto(agora - timedelta(days=1), agora + timedelta(days=1))
+
+    def cidades(self, projeto):
+        return dict(ElegibilidadeProjeto.objects.filter(projeto=projeto).values_list('cidade_id', 'estado_id'))
+
+    def test_regiao_e_expandida_ate_as_cidades(self):
+        self.projeto.regioes_aceitas.set([self.nordeste])
+        self.projeto.cidades_aceitas.set([self.campinas])
+        atualizar_elegibilidade([self.projeto.pk])
+
+        self.assertEqual(self.cidades(self.projeto), {
+            self.recife.pk: self.pe.pk, self.olinda.pk: self.pe.pk,
+            self.salvador.pk: self.salvador.estado_id, self.campinas.pk: self.campinas.estado_id,
+        })
+
+    def test_so_a_diferenca_e_regravada(self):
+        self.projeto.estados_aceitos.set([self.pe])
+        atualizar_elegibilidade([self.projeto.pk])
+        recife = ElegibilidadeProjeto.objects.get(projeto=self.projeto, cidade=self.recife).pk
+
+        self.projeto.estados_aceitos.clear()
+        self.projeto.cidades_aceitas.set([self.recife, self.salvador])
+        atualizar_elegibilidade([self.projeto.pk])
+
+        self.assertEqual(set(self.cidades(self.projeto)), {self.recife.pk, self.salvador.pk})
+        # A linha que continua valendo não é apagada e recriada
+        self.assertEqual(ElegibilidadeProjeto.objects.get(projeto=self.projeto, cidade=self.recife).pk, recife)
+
+    def test_sem_restricao_ou_remoto_tem_uma_linha_sem_cidade(self):
+        self.projeto.cidades_aceitas.set([self.recife])
+        atualizar_elegibilidade([self.projeto.pk])
+        Project.objects.filter(pk=self.projeto.pk).update(eh_remoto=True)
+
+        atualizar_elegibilidade([self.projeto.pk])
+        atualizar_elegibilidade([self.projeto.pk])
+
+        self.assertEqual(self.cidades(self.projeto), {None: None})
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ElegibilidadeProjeto.objects.create(projeto=self.projeto)
+
+    def test_elegiveis_pela_cidade_ou_pelo_estado_do_cadastro(self):
+        agora = timezone.now()
+        self.projeto.cidades_aceitas.set([self.recife])
+        so_campinas = criar_projeto(agora - timedelta(days=1), agora + timedelta(days=1), nome='Campinas')
+        so_campinas.cidades_aceitas.set([self.campinas])
+        todas = criar_projeto(agora - timedelta(days=1), agora + timedelta(days=1), nome='Todas')
+        atualizar_elegibilidade([self.projeto.pk, so_campinas.pk, todas.pk])
+        cliente = APIClient()
+
+        def elegiveis(**endereco):
+            usuaria = User.objects.create_user(
+                email=f'{uuid.uuid4().hex}@example.com', cpf=endereco.pop('cpf'), password='Senha@123', **endereco,
+            )
+            cliente.force_authenticate(usuaria)
+            resposta = cliente.get('/projetos/elegiveis/')
+            self.assertEqual(resposta.status_code, 200, resposta.data)
+            return {projeto['nome'] for projeto in resposta.data['results']}
+
+        self.assertEqual(elegiveis(cpf='52998224725', cidade='Recife', estado='PE'), {'Projeto', 'Todas'})
+        self.assertEqual(elegiveis(cpf='11144477735', estado='PE'), {'Projeto', 'Todas'})
+        self.assertEqual(elegiveis(cpf='39053344705', cidade='Olinda', estado='PE'), {'Todas'})
+        self.assertEqual(elegiveis(cpf='86288366757'), {'Todas'})
+
+
+class IndiceJanelasTests(TestCase):
+    def test_abertos_em_confere_com_a_definicao(self):
+        base = datetime(2024, 1, 1)
+        itens = [(n, base + timedelta(days=n % 7), base + timedelta(days=n % 7 + n % 5)) for n in range(60)]
+        # Histórico de ciclos já encerrados
+        itens += [(100 + n, base - timedelta(days=30 + n), base - timedelta(days=20 + n)) for n in range(200)]
+        indice = IndiceJanelas(itens)
+
+        for dias in range(-60, 14):
+            instante = base + timedelta(days=dias)
+            esperado = [id_ for id_, inicio, fim in sorted(itens, key=lambda item: item[1]) if inicio <= instante <= fim]
+            self.assertEqual(indice.abertos_em(instante), esperado, instante)
+
+    def test_limites_da_janela_contam_como_abertos(self):
+        inicio, fim = datetime(2024, 1, 1), datetime(2024, 1, 2)
+        indice = IndiceJanelas([('a', inicio, fim)])
+
+        self.assertEqual(indice.abertos_em(inicio), ['a'])
+        self.assertEqual(indice.abertos_em(fim), ['a'])
+        self.assertEqual(indice.abertos_em(fim + timedelta(microseconds=1)), [])
+        self.assertEqual(IndiceJanelas([]).abertos_em(inicio), [])
+
+
+class ConverterDatasTests(TestCase):
+    def test_so_formatos_explicitos(self):
+        serie = pd.Series([
+            datetime(2024, 1, 2, 10), '2024-01-03', '03/04/2024 10:00', '03/04/2024 10:00', 'April 3 2024', '3 abr 2024', None,
+        ], dtype=object)
+
+        convertida = _converter_datas(serie)
+
+        self.assertEqual(list(convertida[:4]), [
+            pd.Timestamp(2024, 1, 2, 10), pd.Timestamp(2024, 1, 3), pd.Timestamp(2024, 4, 3, 10), pd.Timestamp(2024, 4, 3, 10),
+        ])
+        # Sem formato conhecido, a célula não é adivinhada
+        self.assertTrue(convertida[4:].isna().all())
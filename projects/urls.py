@@ -1,14 +1,17 @@
 from django.urls import path
-from .views import ProjectCreateAPIView, ProjectListAPIView, ProjectUpdateAPIView, ProjectDeleteAPIView, ProjectBulkDeleteAPIView,ImportarProjetosView, VerificarInscricaoView,ProjectRetrieveAPIView
+from .views import ProjectCreateAPIView, ProjectListAPIView, ProjetosElegiveisAPIView, ProjectUpdateAPIView, ProjectDeleteAPIView, ProjectBulkDeleteAPIView,ImportarProjetosView, ImportacaoProjetoDetailView, VerificarInscricaoView, VerificarInscricoesView,ProjectRetrieveAPIView
 
 urlpatterns = [
     path('todos/', ProjectListAPIView.as_view(), name='projeto-list'),
+    path('elegiveis/', ProjetosElegiveisAPIView.as_view(), name='projetos-elegiveis'),
     path('criar/', ProjectCreateAPIView.as_view(), name='projeto-criar'),
     path('atualizar/<uuid:pk>/', ProjectUpdateAPIView.as_view(), name='projeto-atualizar'),
     path('apagar/<uuid:pk>/', ProjectDeleteAPIView.as_view(), name='projeto-apagar'),
     path('apagar-multiplos/', ProjectBulkDeleteAPIView.as_view(), name='projeto-remover-multiplos'),
     path('importar-projetos/', ImportarProjetosView.as_view(), name='importar_projetos'),
+    path('importar-projetos/<int:pk>/', ImportacaoProjetoDetailView.as_view(), name='importacao-projetos-detalhe'),
     path('verificar-inscricao/<uuid:project_id>/', VerificarInscricaoView.as_view(), name='verificar-inscricao'),
+    path('verificar-inscricoes/', VerificarInscricoesView.as_view(), name='verificar-inscricoes'),
     path('projeto/<uuid:id>/', ProjectRetrieveAPIView.as_view(), name='project-detail'),
 
 ]
@@ -3,12 +3,20 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.parsers import MultiPartParser
 from .models import Project, ImportacaoProjeto
 from rest_framework.response import Response
-from .serializers import ProjectSerializer
+from .serializers import ProjectSerializer, ImportacaoProjetoSerializer
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
+from django.http import Http404
+from .elegibilidade import localizar_usuario, projetos_elegiveis
+from .janelas import janela_inscricao, janelas_inscricao, obter_indice, situacao_inscricao
 from .filters import ProjectFilter
-from .services import importar_planilha_projetos, registrar_log_status
+from .services import armazenar_planilha, processar_importacao, registrar_log_status
 from django.utils import timezone
+from django.conf import settings
+from django.urls import reverse
+from core.pagination import PaginacaoKeyset
+from applications.models import Application
+import uuid
 
 class ProjectCreateAPIView(generics.CreateAPIView):
     queryset = Project.objects.all()
@@ -40,11 +48,30 @@ class ProjectRetrieveAPIView(generics.RetrieveAPIView):
 
         return queryset
 
+class PaginacaoProjetos(PaginacaoKeyset):
+    ordenacao = ('inicio_inscricoes', 'id')
+    contar = True
+    tempo_cache_contagem = getattr(settings, 'PROJETOS_CONTAGEM_CACHE_SEGUNDOS', 60)
+    limite_contagem_exata = getattr(settings, 'PROJETOS_LIMITE_CONTAGEM_EXATA', 50000)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # Com a busca (?q=), a ordem é a relevância
+        if 'relevancia' in queryset.query.annotations:
+            self.ordenacao = ('-relevancia', 'id')
+        return super().paginate_queryset(queryset, request, view)
+
+
 class ProjectListAPIView(generics.ListAPIView):
+    """
+    Lista paginada por cursor em (inicio_inscricoes, id), ou por relevância
+    quando há busca em `?q=`. A primeira página traz `count`, guardado em
+    cache por alguns segundos para cada combinação de filtros.
+    """
     serializer_class = ProjectSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_class = ProjectFilter
+    pagination_class = PaginacaoProjetos
 
     def get_queryset(self):
         user = self.request.user
@@ -61,6 +88,21 @@ class ProjectListAPIView(generics.ListAPIView):
 
         return queryset
 
+class ProjetosElegiveisAPIView(ProjectListAPIView):
+    """
+    Projetos ativos abertos à cidade do cadastro do usuário, pelo índice
+    ElegibilidadeProjeto. Sem cidade reconhecida, vale qualquer cidade do
+    estado; sem nenhum dos dois, só os projetos abertos a todas as cidades.
+    Aceita os mesmos filtros e a mesma paginação de `todos/`.
+    """
+
+    def get_queryset(self):
+        cidade_id, estado_id = localizar_usuario(self.request.user)
+        return Project.objects.filter(
+            ativo=True,
+            pk__in=projetos_elegiveis(cidade_id, estado_id),
+        ).prefetch_related('regioes_aceitas', 'estados_aceitos', 'cidades_aceitas')
+
 class ProjectUpdateAPIView(generics.UpdateAPIView):
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
@@ -103,26 +145,88 @@ class ImportarProjetosView(APIView):
         if not arquivo:
             return Response({"erro": "Arquivo não enviado."}, status=status.HTTP_400_BAD_REQUEST)
 
-        importacao = ImportacaoProjeto.objects.create(arquivo=arquivo)
-        try:
-            importar_planilha_projetos(importacao, self.request)
-        except Exception as e:
-            return Response({"erro": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        return Response({
-            "mensagem": "Importação realizada com sucesso.",
-            "linhas_lidas": importacao.linhas_lidas,
-            "projetos_criados": importacao.projetos_criados,
-            "projetos_ignorados": importacao.projetos_ignorados,
-            "linhas_ignoradas": importacao.linhas_ignoradas_texto,
-            "id": importacao.id
-        })
-    
+        modo = request.data.get('modo') or ImportacaoProjeto.Modo.CRIAR
+        if modo not in ImportacaoProjeto.Modo.values:
+            return Response({"erro": f"Modo inválido. Use: {', '.join(ImportacaoProjeto.Modo.values)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        chave = [campo.strip() for campo in request.data.get('chave', '').split(',') if campo.strip()]
+        campos_chave = {f.name for f in Project._meta.concrete_fields if f.editable and not f.primary_key}
+        invalidos = [campo for campo in chave if campo not in campos_chave]
+        if invalidos:
+            return Response({"erro": f"Campos de chave inválidos: {', '.join(invalidos)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # A simulação (?dry_run=1) também vai para a fila: o worker valida com
+        # vários processos e o resultado sai no detalhe da importação
+        somente_validar = request.query_params.get('dry_run') in ('1', 'true')
+        nome, sha256 = armazenar_planilha(arquivo)
+        importacao = ImportacaoProjeto.objects.create(
+            arquivo=nome, sha256=sha256, usuario=request.user, modo=modo, chave=','.join(chave),
+            somente_validar=somente_validar,
+        )
+        if getattr(settings, 'IMPORTACAO_PROJETOS_EAGER', False):
+            processar_importacao(importacao)
+
+        mensagem = "Validação recebida. Nenhum projeto será gravado." if somente_validar else "Importação recebida."
+        return Response(
+            {"mensagem": mensagem, **ImportacaoProjetoSerializer(importacao).data},
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': reverse('importacao-projetos-detalhe', args=[importacao.pk])},
+        )
+
+
+class ImportacaoProjetoDetailView(generics.RetrieveAPIView):
+    """Situação e progresso de uma importação; consultado periodicamente pelo front."""
+    queryset = ImportacaoProjeto.objects.all()
+    serializer_class = ImportacaoProjetoSerializer
+    permission_classes = [permissions.IsAdminUser]
+
 class VerificarInscricaoView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     def get(self, request, project_id):
-        projeto = get_object_or_404(Project, id=project_id)
+        janela = janela_inscricao(project_id)
+        if janela is None:
+            raise Http404
+        inicio, fim = janela
+
+        pode_inscrever = inicio <= timezone.now() <= fim
+        return Response({"pode_inscrever": pode_inscrever})
+
+
+class VerificarInscricoesView(APIView):
+    """
+    Situação das inscrições de vários projetos numa só requisição, pelo
+    índice de janelas (projects.janelas): `?ids=<uuid>,<uuid>,...` (até
+    LIMITE_IDS), com o mesmo critério de VerificarInscricaoView (projetos
+    inativos pelas suas datas). Sem `ids`, traz os projetos ativos com
+    inscrições abertas agora.
+    `ja_inscrita` vem de uma única consulta às inscrições do usuário.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    LIMITE_IDS = 100
+
+    def get(self, request):
         agora = timezone.now()
 
-        pode_inscrever = projeto.inicio_inscricoes <= agora <= projeto.fim_inscricoes
-        return Response({"pode_inscrever": pode_inscrever})
\ No newline at end of file
+        ids = [valor.strip() for valor in request.query_params.get('ids', '').split(',') if valor.strip()]
+        if len(ids) > self.LIMITE_IDS:
+            return Response({"erro": f"Informe no máximo {self.LIMITE_IDS} projetos."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = list(dict.fromkeys(uuid.UUID(valor) for valor in ids)) if ids else obter_indice().abertos_em(agora)
+        except ValueError:
+            return Response({"erro": "ids precisa ser uma lista de UUIDs separados por vírgula"}, status=status.HTTP_400_BAD_REQUEST)
+
+        inscritos = set(
+            Application.objects.filter(usuario=request.user, projeto_id__in=ids).values_list('projeto_id', flat=True)
+        )
+        janelas = janelas_inscricao(ids)
+        projetos = []
+        for projeto_id in ids:
+            janela = janelas.get(projeto_id)
+            if janela is None:
+                situacao = {'situacao': 'nao_encontrado', 'pode_inscrever': False,
+                            'segundos_para_abrir': None, 'segundos_para_fechar': None}
+            else:
+                situacao = situacao_inscricao(janela, agora)
+            projetos.append({'id': projeto_id, **situacao, 'ja_inscrita': projeto_id in inscritos})
+
+        return Response({"agora": agora, "projetos": projetos})
\ No newline at end of file
@@ -1,4 +1,10 @@
+from rest_framework import exceptions
+from rest_framework.authentication import CSRFCheck
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .cache import guardar_usuario, obter_usuario
 
 class CookieJWTAuthentication(JWTAuthentication):
     def authenticate(self, request):
@@ -10,4 +16,49 @@ class CookieJWTAuthentication(JWTAuthentication):
         if raw_token is None:
             return None
         validated_token = self.get_validated_token(raw_token)
-        return self.get_user(validated_token), validated_token
+        if header is None:
+            # O navegador envia o cookie sozinho: métodos não seguros exigem o token CSRF
+            self.enforce_csrf(request)
+        user = self.get_user(validated_token)
+        self.aplicar_roles_do_token(user, validated_token)
+        return user, validated_token
+
+    def enforce_csrf(self, request):
+        """Mesma checagem de rest_framework.authentication.SessionAuthentication."""
+        def dummy_get_response(request):
+            return None
+
+        check = CSRFCheck(dummy_get_response)
+        check.process_request(request)
+        reason = check.process_view(request, None, (), {})
+        if reason:
+            raise exceptions.PermissionDenied(f"CSRF Failed: {reason}")
+
+    def get_user(self, validated_token):
+        """
+        Usa o snapshot em cache da usuária (ver users.cache); só consulta
+        o banco quando ele não existe ou expirou.
+        """
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        user = obter_usuario(user_id)
+        if user is None:
+            user = super().get_user(validated_token)
+            self.aplicar_roles_do_token(user, validated_token)
+            guardar_usuario(user)
+        elif api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+
+        return user
+
+    def aplicar_roles_do_token(self, user, validated_token):
+        """
+        Usa os papéis embutidos no token, evitando a consulta aos grupos,
+        se o token foi emitido na versão atual dos grupos da usuária.
+        """
+        roles = validated_token.get("roles")
+        if roles is not None and validated_token.get("roles_versao") == user.roles_versao:
+            user.__dict__["_roles"] = list(roles)
@@ -0,0 +1,51 @@
+from django.core.cache import caches
+from django.db import router
+
+from .models import User
+
+# A senha nunca vai para o cache; é carregada sob demanda (campo adiado)
+CAMPOS_FORA_DO_SNAPSHOT = {'password'}
+
+
+def _cache():
+    return caches['usuarios']
+
+
+def _chave(user_id):
+    return f"usuario:{user_id}"
+
+
+def guardar_usuario(user):
+    """
+    Guarda um snapshot leve da usuária: colunas da tabela (exceto senha) e papéis.
+    """
+    snapshot = {
+        campo.attname: getattr(user, campo.attname)
+        for campo in User._meta.concrete_fields
+        if campo.attname not in CAMPOS_FORA_DO_SNAPSHOT
+    }
+    snapshot['roles'] = user.roles
+    _cache().set(_chave(user.pk), snapshot)
+
+
+def obter_usuario(user_id):
+    """
+    Reconstrói a usuária a partir do snapshot, sem consultar o banco.
+    Campos fora do snapshot ficam adiados e são lidos se alguma view precisar.
+    Retorna None se não houver snapshot.
+    """
+    snapshot = _cache().get(_chave(user_id))
+    if snapshot is None:
+        return None
+
+    roles = snapshot.pop('roles')
+    campos = [campo.attname for campo in User._meta.concrete_fields if campo.attname in snapshot]
+    user = User.from_db(router.db_for_read(User), campos, [snapshot[campo] for campo in campos])
+    user.__dict__['_roles'] = roles
+    # O snapshot pode estar até um TTL atrasado: User.save() grava só o que mudou desde ele
+    user.__dict__['_valores_snapshot'] = snapshot
+    return user
+
+
+def invalidar_usuarios(*user_ids):
+    _cache().delete_many([_chave(user_id) for user_id in user_ids])
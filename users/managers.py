@@ -1,6 +1,37 @@
 from django.contrib.auth.models import BaseUserManager
+from django.db import models
+from django.db.models import OuterRef, Subquery
 
-class UserManager(BaseUserManager):
+
+class AgruparTexto(models.Aggregate):
+    """Concatena os valores do grupo separados por vírgula (GROUP_CONCAT / STRING_AGG)."""
+    function = 'GROUP_CONCAT'
+    output_field = models.TextField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, function='STRING_AGG',
+            template="%(function)s(%(distinct)s%(expressions)s, ',')", **extra_context
+        )
+
+
+class UserQuerySet(models.QuerySet):
+    def com_roles(self):
+        """
+        Anota os nomes dos grupos de cada usuária (roles_agregados) na própria
+        consulta, evitando uma consulta de grupos por linha em User.roles.
+        """
+        grupos = (
+            self.model.groups.through.objects
+            .filter(user_id=OuterRef('pk'))
+            .values('user_id')
+            .annotate(nomes=AgruparTexto('group__name'))
+            .values('nomes')
+        )
+        return self.annotate(roles_agregados=Subquery(grupos))
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
     def create_user(self, email, password=None, **extra_fields):
         if not email:
             raise ValueError('The Email field must be set')
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+CAMPOS_ANEXO = [
+    'documento_cpf',
+    'documento_rg',
+    'foto',
+    'comprovante_residencia',
+    'autodeclaracao_racial',
+    'comprovante_deficiencia',
+]
+
+
+def copiar_anexos(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    UserAnexo = apps.get_model('users', 'UserAnexo')
+
+    linhas = User.objects.values_list('id', *CAMPOS_ANEXO).iterator(chunk_size=100)
+    lote = []
+    for usuario_id, *conteudos in linhas:
+        for campo, conteudo in zip(CAMPOS_ANEXO, conteudos):
+            if conteudo:
+                lote.append(UserAnexo(usuario_id=usuario_id, campo=campo, conteudo=conteudo))
+        if len(lote) >= 100:
+            UserAnexo.objects.bulk_create(lote)
+            lote = []
+    if lote:
+        UserAnexo.objects.bulk_create(lote)
+
+
+def restaurar_anexos(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    UserAnexo = apps.get_model('users', 'UserAnexo')
+
+    for anexo in UserAnexo.objects.iterator(chunk_size=100):
+        User.objects.filter(pk=anexo.usuario_id).update(**{anexo.campo: anexo.conteudo})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_alter_user_autodeclaracao_racial_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserAnexo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('campo', models.CharField(choices=[('documento_cpf', 'documento_cpf'), ('documento_rg', 'documento_rg'), ('foto', 'foto'), ('comprovante_residencia', 'comprovante_residencia'), ('autodeclaracao_racial', 'autodeclaracao_racial'), ('comprovante_deficiencia', 'comprovante_deficiencia')], max_length=50)),
+                ('conteudo', models.BinaryField()),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='anexos', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('usuario', 'campo')},
+            },
+        ),
+        migrations.RunPython(copiar_anexos, restaurar_anexos),
+        migrations.RemoveField(
+            model_name='user',
+            name='autodeclaracao_racial',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='comprovante_deficiencia',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='comprovante_residencia',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='documento_cpf',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='documento_rg',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='foto',
+        ),
+    ]
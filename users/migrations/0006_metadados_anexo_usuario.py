@@ -0,0 +1,53 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:41
+
+import hashlib
+
+import magic
+from django.db import migrations, models
+
+
+def preencher_metadados(apps, schema_editor):
+    UserAnexo = apps.get_model('users', 'UserAnexo')
+
+    for anexo in UserAnexo.objects.iterator(chunk_size=50):
+        conteudo = bytes(anexo.conteudo)
+        try:
+            mime_type = magic.from_buffer(conteudo[:2048], mime=True)
+        except Exception:
+            mime_type = 'application/octet-stream'
+        UserAnexo.objects.filter(pk=anexo.pk).update(
+            mime_type=mime_type,
+            tamanho=len(conteudo),
+            sha256=hashlib.sha256(conteudo).hexdigest(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_anexos_usuario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='useranexo',
+            name='mime_type',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='useranexo',
+            name='nome_original',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='useranexo',
+            name='sha256',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='useranexo',
+            name='tamanho',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(preencher_metadados, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_metadados_anexo_usuario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='roles_versao',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+
+
+def armazenar_sem_compressao(apps, schema_editor):
+    # Só no PostgreSQL: com STORAGE EXTERNAL o bytea fica no TOAST sem compressão, e o
+    # SUBSTR de core.downloads.ler_em_blocos lê só os blocos pedidos em vez de
+    # descomprimir o documento inteiro a cada bloco. Os valores existentes são
+    # regravados para passar a seguir a nova estratégia.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('ALTER TABLE users_useranexo ALTER COLUMN conteudo SET STORAGE EXTERNAL')
+    schema_editor.execute("UPDATE users_useranexo SET conteudo = conteudo || ''::bytea")
+
+
+def restaurar_compressao(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('ALTER TABLE users_useranexo ALTER COLUMN conteudo SET STORAGE EXTENDED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_user_roles_versao'),
+    ]
+
+    operations = [
+        migrations.RunPython(armazenar_sem_compressao, restaurar_compressao),
+    ]
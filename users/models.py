@@ -1,7 +1,8 @@
-from django.contrib.auth.models import AbstractUser, BaseUserManager, Group
+from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
 from django.core.validators import RegexValidator, FileExtensionValidator
 import uuid
+from core.downloads import ler_upload, metadados_do_conteudo
 from .managers import UserManager
 
 # Validadores
@@ -9,6 +10,16 @@ cpf_validator = RegexValidator(regex=r'^\d{11}$', message='CPF deve conter 11 d
 phone_validator = RegexValidator(regex=r'^\+?1?\d{9,15}$', message='Telefone inválido.')
 extensoes_aceitas = FileExtensionValidator(allowed_extensions=['pdf', 'jpg', 'jpeg', 'png'])
 
+# Documentos enviados pela usuária, guardados fora da linha de users_user
+CAMPOS_ANEXO = [
+    'documento_cpf',
+    'documento_rg',
+    'foto',
+    'comprovante_residencia',
+    'autodeclaracao_racial',
+    'comprovante_deficiencia',
+]
+
 # Modelos auxiliares
 class Genero(models.Model):
     nome = models.CharField(max_length=100)
@@ -22,6 +33,24 @@ class Deficiencia(models.Model):
     nome = models.CharField(max_length=100)
     def __str__(self): return self.nome
 
+def _anexo(campo):
+    """
+    Propriedade que lê/escreve o documento `campo` no UserAnexo correspondente.
+    A leitura só acontece quando o documento é acessado.
+    """
+    def getter(self):
+        return self._anexos_carregados().get(campo)
+
+    def setter(self, valor):
+        nome_original = ''
+        if hasattr(valor, 'read'):
+            valor, nome_original = ler_upload(valor)
+        self._anexos_carregados()[campo] = valor
+        self.__dict__.setdefault('_anexos_nomes', {})[campo] = nome_original
+        self.__dict__.setdefault('_anexos_pendentes', set()).add(campo)
+
+    return property(getter, setter)
+
 # Modelo User
 class User(AbstractUser):
     username = None  
@@ -35,9 +64,9 @@ class User(AbstractUser):
 
     # Documentos
     curriculo_lattes = models.URLField('Currículo Lattes', blank=True)
-    documento_cpf = models.BinaryField(null=True, blank=True)
-    documento_rg = models.BinaryField(null=True, blank=True)
-    foto = models.BinaryField(null=True, blank=True)
+    documento_cpf = _anexo('documento_cpf')
+    documento_rg = _anexo('documento_rg')
+    foto = _anexo('foto')
 
     # Endereço
     cep = models.CharField(max_length=10, blank=True)
@@ -47,14 +76,14 @@ class User(AbstractUser):
     complemento = models.CharField(max_length=100, blank=True)
     cidade = models.CharField(max_length=100, blank=True)
     estado = models.CharField(max_length=2, blank=True)
-    comprovante_residencia = models.BinaryField(null=True, blank=True)
+    comprovante_residencia = _anexo('comprovante_residencia')
 
     # Diversidade
     raca = models.ForeignKey(Raca, on_delete=models.SET_NULL, null=True, blank=True)
     genero = models.ForeignKey(Genero, on_delete=models.SET_NULL, null=True, blank=True)
     deficiencias = models.ManyToManyField(Deficiencia, blank=True)
-    autodeclaracao_racial = models.BinaryField(null=True, blank=True)
-    comprovante_deficiencia = models.BinaryField(null=True, blank=True)
+    autodeclaracao_racial = _anexo('autodeclaracao_racial')
+    comprovante_deficiencia = _anexo('comprovante_deficiencia')
 
     # Escola
     nome_escola = models.CharField(max_length=150, blank=True)
@@ -71,6 +100,7 @@ class User(AbstractUser):
 
     # Sistema
     password_needs_reset = models.BooleanField(default=False)
+    roles_versao = models.PositiveIntegerField(default=0, editable=False)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     is_superuser = models.BooleanField(default=False)
@@ -79,15 +109,114 @@ class User(AbstractUser):
     REQUIRED_FIELDS = ['email']
     objects = UserManager()
 
+    def _anexos_carregados(self):
+        anexos = self.__dict__.get('_anexos')
+        if anexos is None:
+            if self._state.adding:
+                anexos = {}
+            else:
+                prefetch = getattr(self, '_prefetched_objects_cache', {}).get('anexos')
+                if prefetch is None:
+                    prefetch = self.anexos.all()
+                anexos = {anexo.campo: anexo.conteudo for anexo in prefetch}
+            self.__dict__['_anexos'] = anexos
+        return anexos
+
+    def _salvar_anexos(self):
+        pendentes = self.__dict__.pop('_anexos_pendentes', set())
+        if not pendentes:
+            return
+        anexos = self._anexos_carregados()
+        nomes = self.__dict__.pop('_anexos_nomes', {})
+        removidos = [campo for campo in pendentes if not anexos.get(campo)]
+        enviados = [
+            UserAnexo(
+                usuario=self,
+                campo=campo,
+                conteudo=anexos[campo],
+                **metadados_do_conteudo(anexos[campo], nomes.get(campo, '')),
+            )
+            for campo in pendentes if anexos.get(campo)
+        ]
+        if removidos:
+            self.anexos.filter(campo__in=removidos).delete()
+        if enviados:
+            UserAnexo.objects.bulk_create(
+                enviados,
+                update_conflicts=True,
+                unique_fields=['usuario', 'campo'],
+                update_fields=['conteudo', 'mime_type', 'tamanho', 'sha256', 'nome_original', 'atualizado_em'],
+            )
+
     def save(self, *args, **kwargs):
+        criando = self._state.adding
+        if not criando and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = self._campos_salvos_por_padrao()
         super().save(*args, **kwargs)
-        if not self.groups.exists():
-            estudante_group, _ = Group.objects.get_or_create(name='estudante')
-            self.groups.add(estudante_group)
+        self._salvar_anexos()
+        if criando:
+            # Usuária recém-criada: o que não foi enviado não existe no banco
+            anexos = self._anexos_carregados()
+            for campo in CAMPOS_ANEXO:
+                anexos.setdefault(campo, None)
+
+    def _campos_salvos_por_padrao(self):
+        """
+        Colunas gravadas por um save() sem update_fields. roles_versao fica de
+        fora: só muda pelo F() de users.signals, e uma instância carregada antes
+        do incremento o desfaria, revalidando tokens com papéis revogados.
+        """
+        adiados = self.get_deferred_fields()
+        campos = [
+            campo for campo in self._meta.concrete_fields
+            if not campo.primary_key and campo.name != 'roles_versao' and campo.attname not in adiados
+        ]
+        # Instância vinda do snapshot de users.cache: só as colunas alteradas desde
+        # então, para não gravar por cima valores mais novos do banco
+        snapshot = self.__dict__.get('_valores_snapshot')
+        if snapshot is not None:
+            campos = [campo for campo in campos if getattr(self, campo.attname) != snapshot.get(campo.attname)]
+        return [campo.name for campo in campos]
 
     def __str__(self):
         return self.email
 
     @property
     def roles(self):
-        return list(self.groups.values_list('name', flat=True))
\ No newline at end of file
+        """
+        Nomes dos grupos da usuária, resolvidos uma vez e memorizados na instância.
+        Podem vir de User.objects.com_roles(), de um prefetch de 'groups'
+        ou do token (ver CookieJWTAuthentication).
+        """
+        roles = self.__dict__.get('_roles')
+        if roles is None:
+            prefetch = getattr(self, '_prefetched_objects_cache', {}).get('groups')
+            if 'roles_agregados' in self.__dict__:
+                roles = self.roles_agregados.split(',') if self.roles_agregados else []
+            elif prefetch is not None:
+                roles = [grupo.name for grupo in prefetch]
+            else:
+                roles = list(self.groups.values_list('name', flat=True))
+            self.__dict__['_roles'] = roles
+        return roles
+
+    @property
+    def is_admin(self):
+        return self.is_superuser or 'admin' in self.roles
+
+
+class UserAnexo(models.Model):
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='anexos')
+    campo = models.CharField(max_length=50, choices=[(campo, campo) for campo in CAMPOS_ANEXO])
+    conteudo = models.BinaryField()
+    mime_type = models.CharField(max_length=100, blank=True)
+    tamanho = models.PositiveIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)
+    nome_original = models.CharField(max_length=255, blank=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('usuario', 'campo')
+
+    def __str__(self):
+        return f"{self.usuario} | {self.campo}"
@@ -1,14 +1,22 @@
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 from rest_framework import permissions
 
+
+def papeis(user):
+    """Papéis (grupos) da usuária autenticada, memorizados em User.roles."""
+    if not user or not user.is_authenticated:
+        return []
+    return user.roles
+
+
 class IsAdminOrAvaliadora(BasePermission):
     def has_permission(self, request, view):
-        return request.user.groups.filter(name__in=['admin', 'avaliadora']).exists()
+        return any(papel in papeis(request.user) for papel in ['admin', 'avaliadora'])
 
 class IsSelfOrAdminOrAvaliadora(BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in SAFE_METHODS:
-            return obj == request.user or request.user.groups.filter(name__in=['admin', 'avaliadora']).exists()
+            return obj == request.user or any(papel in papeis(request.user) for papel in ['admin', 'avaliadora'])
         return obj == request.user
 
 class IsSelf(BasePermission):
@@ -21,8 +29,7 @@ class IsAdminRole(BasePermission):
         if not user.is_authenticated:
             return False
         
-        roles = {group.name for group in user.groups.all()}
-        return 'admin' in roles
+        return 'admin' in papeis(user)
     
 class IsOwnerOrAdminOrAvaliadora(BasePermission):
     """
@@ -33,10 +40,11 @@ class IsOwnerOrAdminOrAvaliadora(BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
-        if request.user.is_superuser or request.user.groups.filter(name='admin').exists():
+        roles = papeis(request.user)
+        if request.user.is_superuser or 'admin' in roles:
             return True
 
-        if request.user.groups.filter(name='avaliadora').exists():
-            return obj.projeto.tutora == request.user
+        if 'avaliadora' in roles:
+            return obj.projeto.tutora_id == request.user.pk
 
-        return obj.usuario == request.user
\ No newline at end of file
+        return obj.usuario_id == request.user.pk
\ No newline at end of file
@@ -1,11 +1,27 @@
 # serializers.py
+import base64
+
 from rest_framework import serializers
 from django.contrib.auth.models import Group
-from .models import User, Genero, Raca, Deficiencia
+from .models import User, Genero, Raca, Deficiencia, CAMPOS_ANEXO, cpf_validator
 from django.contrib.auth.models import Permission
 from .services import get_valid_group
 
+class AnexoField(serializers.ReadOnlyField):
+    """Documento da usuária em base64, lido do UserAnexo sob demanda."""
+
+    def to_representation(self, value):
+        return base64.b64encode(bytes(value)).decode('ascii')
+
+
 class UserSerializer(serializers.ModelSerializer):
+    documento_cpf = AnexoField()
+    documento_rg = AnexoField()
+    foto = AnexoField()
+    comprovante_residencia = AnexoField()
+    autodeclaracao_racial = AnexoField()
+    comprovante_deficiencia = AnexoField()
+
     groups = serializers.SlugRelatedField(
         many=True,
         slug_field='name',
@@ -27,14 +43,7 @@ class UserSerializer(serializers.ModelSerializer):
         }
 
     def _handle_file_uploads(self, validated_data):
-        file_fields = [
-            'documento_cpf',
-            'documento_rg',
-            'foto',
-            'comprovante_residencia',
-            'autodeclaracao_racial',
-            'comprovante_deficiencia'
-        ]
+        file_fields = CAMPOS_ANEXO
         request = self.context['request']
 
         tipos_permitidos = [
@@ -51,7 +60,7 @@ class UserSerializer(serializers.ModelSerializer):
                     raise serializers.ValidationError({
                         field: f"Tipo de arquivo '{file.content_type}' não permitido. Envie apenas PDF ou imagem (jpg, png)."
                     })
-                validated_data[field] = file.read()
+                validated_data[field] = file
 
         return validated_data
 
@@ -68,15 +77,14 @@ class UserSerializer(serializers.ModelSerializer):
         user.is_active = True  # Define is_active como True por padrão
         if password:
             user.set_password(password)
+        # Atribuído pelo sinal post_save junto com a criação
+        user._grupo_inicial = get_valid_group(groups)
         user.save()
 
-        grupo_final = get_valid_group(groups)
-        user.groups.set([grupo_final])
-
-        if user_permissions is not None:
+        if user_permissions:
             user.user_permissions.set(user_permissions)
 
-        if deficiencias is not None:
+        if deficiencias:
             user.deficiencias.set(deficiencias)
 
         return user
@@ -104,7 +112,36 @@ class UserSerializer(serializers.ModelSerializer):
 
         return instance
 
-    
+
+
+class UserListaSerializer(UserSerializer):
+    """
+    Listagem de usuárias com projeção de campos (`campos`). Os grupos vêm de
+    User.roles, anotado na mesma consulta por User.objects.com_roles().
+    """
+    groups = serializers.ListField(source='roles', child=serializers.CharField(), read_only=True)
+
+    def __init__(self, *args, campos=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if campos is not None:
+            for nome in set(self.fields) - set(campos):
+                self.fields.pop(nome)
+
+
+class CadastroSerializer(UserSerializer):
+    """
+    Serializer do cadastro público. A unicidade de email e CPF fica a cargo
+    das constraints do banco (ver CadastroAPIView), sem consultas prévias.
+    """
+
+    class Meta(UserSerializer.Meta):
+        extra_kwargs = {
+            **UserSerializer.Meta.extra_kwargs,
+            'email': {'validators': []},
+            'cpf': {'validators': [cpf_validator]},
+        }
+
+
 class RacaSerializer(serializers.ModelSerializer):
     class Meta:
         model = Raca
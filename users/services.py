@@ -2,18 +2,30 @@ from django.contrib.auth.models import Group
 from django.core.exceptions import PermissionDenied
 from .models import User
 
+import os
 import random
+import zipfile
 import string
 import re
 
+import numpy as np
+import pandas as pd
+
 from django.contrib.auth.models import Group
 from django.core.exceptions import ValidationError as DjangoValidationError
 from django.core.validators import EmailValidator
-from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.contrib.auth.password_validation import validate_password
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from rest_framework_simplejwt.tokens import RefreshToken
 
-from .models import User
+from core.emails import enfileirar_email
+from core.models import EmailPendente
+
+from .models import User, phone_validator
 from .permissions import (
     IsAdminOrAvaliadora as IsAdminOrEvaluator,
     IsSelfOrAdminOrAvaliadora as IsOwnerOrAdminOrEvaluator,
@@ -118,9 +130,22 @@ def enviar_email_recuperacao(user, nova_senha):
     })
     text_content = f"Sua nova senha é: {nova_senha}"
 
-    msg = EmailMultiAlternatives(subject, text_content, from_email, to)
-    msg.attach_alternative(html_content, "text/html")
-    msg.send()
+    # Enviado pelo worker (manage.py processar_fila_emails)
+    enfileirar_email(subject, text_content, to, html=html_content, remetente=from_email,
+                     referencia=referencia_recuperacao(user))
+
+
+def referencia_recuperacao(user):
+    return f'recuperacao_senha:{user.pk}'
+
+
+def recuperacao_pendente(user):
+    """Email da última recuperação de senha da usuária, ou None."""
+    return (
+        EmailPendente.objects.filter(referencia=referencia_recuperacao(user))
+        .order_by('-criado_em', '-id')
+        .first()
+    )
 
 def encontrar_usuario_por_email_ou_cpf(email=None, cpf=None):
     if email:
@@ -132,33 +157,246 @@ def encontrar_usuario_por_email_ou_cpf(email=None, cpf=None):
 
 def resetar_senha_usuario(user):
     nova_senha = gerar_senha_recuperacao()
-    enviar_email_recuperacao(user, nova_senha)
-    user.set_password(nova_senha)
-    user.password_needs_reset = True
-    user.save()
+    with transaction.atomic():
+        enviar_email_recuperacao(user, nova_senha)
+        user.set_password(nova_senha)
+        user.password_needs_reset = True
+        user.save(update_fields=['password', 'password_needs_reset'])
     return nova_senha
 
+def gerar_tokens(user):
+    """
+    RefreshToken da usuária com os papéis embutidos (claim 'roles').
+    O claim só é aceito enquanto 'roles_versao' for igual ao do banco.
+    """
+    refresh = RefreshToken.for_user(user)
+    refresh['roles'] = user.roles
+    refresh['roles_versao'] = user.roles_versao
+    return refresh
+
+_ids_grupos = {}
+
+
+def obter_grupo_id(nome):
+    """
+    Id do grupo pelo nome, resolvido uma vez por processo.
+    Os grupos padrão são criados no post_migrate e não mudam de id.
+    """
+    grupo_id = _ids_grupos.get(nome)
+    if grupo_id is None:
+        grupo_id = Group.objects.get_or_create(name=nome)[0].pk
+        _ids_grupos[nome] = grupo_id
+    return grupo_id
+
+
+def grupo_padrao():
+    return Group(pk=obter_grupo_id('estudante'), name='estudante')
+
+
 def get_valid_group(group_names):
     """
     Retorna o primeiro grupo válido da lista (que não seja 'admin' nem 'avaliadora').
     Se não houver válido, retorna o grupo 'estudante'.
     """
     if not group_names:
-        return Group.objects.get_or_create(name='estudante')[0]
+        return grupo_padrao()
 
     if isinstance(group_names, (str, Group)):
         group_names = [group_names]
 
     for group in group_names:
-        name = None
         if isinstance(group, Group):
-            name = group.name.lower()
-        elif isinstance(group, str):
-            name = group.lower()
+            # Já validado pelo serializer, não precisa consultar de novo
+            if group.name.lower() not in ['admin', 'avaliadora']:
+                return group
+            continue
 
+        name = group.lower() if isinstance(group, str) else None
         if name and name not in ['admin', 'avaliadora']:
             grupo = Group.objects.filter(name__iexact=name).first()
             if grupo:
                 return grupo
 
-    return Group.objects.get_or_create(name='estudante')[0]
\ No newline at end of file
+    return grupo_padrao()
+
+
+# Importação de usuárias por planilha
+
+COLUNAS_OBRIGATORIAS_IMPORTACAO = ['nome', 'email', 'cpf']
+COLUNAS_OPCIONAIS_IMPORTACAO = [
+    'telefone', 'data_nascimento', 'pronomes',
+    'cep', 'rua', 'bairro', 'numero', 'complemento', 'cidade', 'estado',
+    'nome_escola', 'tipo_ensino', 'cidade_escola', 'estado_escola',
+]
+
+# Formatos aceitos para data_nascimento, na ordem em que são tentados; o xlsx
+# lido como texto traz as datas de célula no formato ISO ('2000-01-31 00:00:00')
+FORMATOS_DATA_NASCIMENTO = ['%d/%m/%Y', 'ISO8601']
+
+# Mesmo formato aceito pelo EmailValidator do Django (sem domínios literais)
+EMAIL_REGEX = (
+    r"[-!#$%&'*+/=?^_`{}|~0-9A-Za-z]+(?:\.[-!#$%&'*+/=?^_`{}|~0-9A-Za-z]+)*"
+    r"@(?:[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?\.)+[A-Za-z]{2,63}"
+)
+
+
+def validar_cpfs(cpfs):
+    """
+    Versão vetorizada de validar_cpf: recebe uma coluna de CPFs (só dígitos)
+    e retorna um array booleano, calculando os dígitos verificadores de
+    todas as linhas de uma vez.
+    """
+    cpfs = pd.Series(cpfs, dtype='object').fillna('').astype(str)
+    com_11_digitos = cpfs.str.fullmatch(r'\d{11}').to_numpy()
+    if not com_11_digitos.any():
+        return com_11_digitos
+
+    texto = ''.join(cpfs.where(com_11_digitos, '0' * 11))
+    digitos = (np.frombuffer(texto.encode('ascii'), dtype=np.uint8) - ord('0')).reshape(-1, 11).astype(np.int64)
+
+    resto = (digitos[:, :9] @ np.arange(10, 1, -1)) % 11
+    primeiro = np.where(resto < 2, 0, 11 - resto)
+    resto = (digitos[:, :10] @ np.arange(11, 1, -1)) % 11
+    segundo = np.where(resto < 2, 0, 11 - resto)
+
+    repetidos = (digitos == digitos[:, :1]).all(axis=1)
+    return com_11_digitos & ~repetidos & (digitos[:, 9] == primeiro) & (digitos[:, 10] == segundo)
+
+
+def validar_emails(emails):
+    return pd.Series(emails, dtype='object').fillna('').astype(str).str.fullmatch(EMAIL_REGEX).to_numpy()
+
+
+def validar_telefones(telefones):
+    """Telefones vazios são aceitos; os demais seguem o phone_validator do modelo."""
+    telefones = pd.Series(telefones, dtype='object').fillna('').astype(str)
+    return ((telefones == '') | telefones.str.fullmatch(phone_validator.regex.pattern)).to_numpy()
+
+
+def converter_datas_nascimento(datas):
+    """
+    Converte a coluna de datas só pelos FORMATOS_DATA_NASCIMENTO, um por vez
+    sobre as células ainda não convertidas (como projects.services._converter_datas).
+    O que não casa com nenhum formato vira NaT, sem adivinhar a ordem de dia e mês.
+    """
+    convertidas = pd.Series(pd.NaT, index=datas.index, dtype='datetime64[ns]')
+    for formato in FORMATOS_DATA_NASCIMENTO:
+        faltando = convertidas.isna() & (datas != '')
+        if not faltando.any():
+            break
+        convertidas[faltando] = pd.to_datetime(datas[faltando], errors='coerce', format=formato)
+    return convertidas
+
+
+def ler_planilha_usuarios(arquivo):
+    """Lê xlsx ou CSV como texto (preserva zeros à esquerda de CPF e telefone)."""
+    nome = getattr(arquivo, 'name', '') or ''
+    try:
+        if os.path.splitext(nome)[1].lower() == '.csv':
+            df = pd.read_csv(arquivo, dtype=str, keep_default_na=False)
+        else:
+            df = pd.read_excel(arquivo, dtype=str)
+    except (zipfile.BadZipFile, UnicodeDecodeError, pd.errors.ParserError, pd.errors.EmptyDataError, ValueError):
+        raise ValueError("Arquivo inválido: envie uma planilha .xlsx ou .csv.")
+    df.columns = df.columns.str.strip().str.lower()
+
+    faltando = [col for col in COLUNAS_OBRIGATORIAS_IMPORTACAO if col not in df.columns]
+    if faltando:
+        raise ValueError(f"Colunas obrigatórias ausentes: {', '.join(faltando)}")
+
+    colunas = [col for col in COLUNAS_OBRIGATORIAS_IMPORTACAO + COLUNAS_OPCIONAIS_IMPORTACAO if col in df.columns]
+    return df[colunas].fillna('').apply(lambda coluna: coluna.str.strip())
+
+
+def importar_planilha_usuarios(arquivo, grupo):
+    """
+    Cria em lote as usuárias de uma planilha (xlsx ou CSV) no grupo informado.
+    As validações rodam por coluna; linhas rejeitadas voltam no mesmo formato
+    de ImportacaoProjeto.linhas_ignoradas_texto.
+    As contas são criadas sem senha utilizável e sem password_needs_reset: a
+    usuária define a sua pela recuperação de senha.
+    """
+    df = ler_planilha_usuarios(arquivo)
+    original = df.copy()
+    total_linhas = len(df)
+
+    df['cpf'] = df['cpf'].str.replace(r'\D', '', regex=True)
+    if 'telefone' in df.columns:
+        df['telefone'] = df['telefone'].str.replace(r'[\s().-]', '', regex=True)
+
+    df['email'] = df['email'].str.lower()
+    checagens = [
+        ((df['nome'] == '') | (df['email'] == '') | (df['cpf'] == ''), 'Campos obrigatórios: nome, email e cpf.'),
+        (~validar_cpfs(df['cpf']), 'CPF inválido.'),
+        (~validar_emails(df['email']), 'Email inválido.'),
+    ]
+    if 'telefone' in df.columns:
+        checagens.append((~validar_telefones(df['telefone']), 'Telefone inválido.'))
+    if 'data_nascimento' in df.columns:
+        datas = converter_datas_nascimento(df['data_nascimento'])
+        checagens.append(((df['data_nascimento'] != '') & datas.isna(), 'Data de nascimento inválida.'))
+        df['data_nascimento'] = datas.dt.date.astype('object').where(datas.notna(), None)
+    # Demais colunas: validadores, choices e max_length do próprio campo,
+    # rodando uma vez por valor distinto
+    for col in df.columns.difference(['nome', 'email', 'cpf', 'telefone', 'data_nascimento']):
+        campo = User._meta.get_field(col)
+        erros = {}
+        for valor in df.loc[df[col] != '', col].unique():
+            try:
+                campo.clean(valor, None)
+            except DjangoValidationError as e:
+                erros[valor] = f"Campo {col} inválido: {' '.join(e.messages)}"
+        if erros:
+            checagens.append((df[col].isin(erros.keys()), df[col].map(erros).fillna('').to_numpy(dtype=object)))
+    for col in ('nome', 'email'):
+        max_length = User._meta.get_field(col).max_length
+        checagens.append((df[col].str.len() > max_length, f'Campo {col} excede {max_length} caracteres.'))
+    checagens += [
+        (df['cpf'].duplicated(), 'CPF repetido na planilha.'),
+        (df['email'].duplicated(), 'Email repetido na planilha.'),
+    ]
+
+    motivos = np.select([np.asarray(mascara, dtype=bool) for mascara, _ in checagens],
+                        [mensagem for _, mensagem in checagens], default='')
+
+    # Duplicadas no banco: uma única consulta para a planilha inteira
+    candidatas = motivos == ''
+    cpfs_existentes, emails_existentes = set(), set()
+    for cpf, email in User.objects.annotate(email_minusculo=Lower('email')).filter(
+        Q(cpf__in=df.loc[candidatas, 'cpf'].tolist()) | Q(email_minusculo__in=df.loc[candidatas, 'email'].tolist())
+    ).values_list('cpf', 'email'):
+        cpfs_existentes.add(cpf)
+        emails_existentes.add(email.lower())
+    motivos = np.select(
+        [~candidatas, df['cpf'].isin(cpfs_existentes), df['email'].isin(emails_existentes)],
+        [motivos, 'CPF já cadastrado.', 'Email já cadastrado.'],
+        default='',
+    )
+
+    aceitas = motivos == ''
+    senha = make_password(None)
+    usuarias = [
+        User(password=senha, is_active=True, password_needs_reset=False, **{k: v for k, v in dados.items() if v != ''})
+        for dados in df[aceitas].to_dict('records')
+    ]
+
+    with transaction.atomic():
+        User.objects.bulk_create(usuarias, batch_size=1000)
+        User.groups.through.objects.bulk_create(
+            [User.groups.through(user_id=usuaria.pk, group_id=grupo.pk) for usuaria in usuarias],
+            batch_size=1000,
+        )
+
+    ignoradas = [
+        f"Linha {index + 2} - não processada\n"
+        f"    Conteúdo: {dados}\n"
+        f"    Motivo: {motivo}\n"
+        for index, dados, motivo in zip(df.index[~aceitas], original[~aceitas].to_dict('records'), motivos[~aceitas])
+    ]
+
+    return {
+        'linhas_lidas': total_linhas,
+        'usuarios_criados': len(usuarias),
+        'usuarios_ignorados': len(ignoradas),
+        'linhas_ignoradas': "\n".join(ignoradas),
+    }
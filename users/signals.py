@@ -1,19 +1,32 @@
-from django.db.models.signals import post_save, post_migrate
+from django.db.models.signals import post_save, post_delete, post_migrate, m2m_changed
 from django.db import IntegrityError
+from django.db.models import F
 
 
 from django.dispatch import receiver
 from django.contrib.auth.models import Group
 from .models import User
+from .cache import invalidar_usuarios
+from .services import grupo_padrao
 
 GRUPOS_PADROES = ['admin', 'estudante', 'avaliadora', 'professora', 'tutor']
 
 @receiver(post_save, sender=User)
 def user_created(sender, instance, created, **kwargs):
-    if created:
-        estudante_group, _ = Group.objects.get_or_create(name='estudante')
-        instance.groups.add(estudante_group)
-        instance.save()  
+    """
+    Grupo inicial da usuária recém-criada: o escolhido no cadastro
+    (`_grupo_inicial`) ou 'estudante', com um único insert na tabela intermediária.
+    """
+    if not created:
+        return
+    grupo = getattr(instance, '_grupo_inicial', None) or grupo_padrao()
+    User.groups.through.objects.create(user_id=instance.pk, group_id=grupo.pk)
+    instance.__dict__['_roles'] = [grupo.name]
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidar_cache_usuario(sender, instance, **kwargs):
+    invalidar_usuarios(instance.pk)
 
 @receiver(post_migrate)
 def criar_grupos_padrao(sender, **kwargs):
@@ -21,4 +34,30 @@ def criar_grupos_padrao(sender, **kwargs):
         try:
             Group.objects.get_or_create(name=nome)
         except IntegrityError as e:
-            print(f"Erro ao criar grupo '{nome}': {e}")
\ No newline at end of file
+            print(f"Erro ao criar grupo '{nome}': {e}")
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def grupos_alterados(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Invalida os papéis memorizados e incrementa roles_versao, o que
+    torna obsoleto o claim 'roles' dos tokens já emitidos.
+    """
+    if reverse:
+        # group.user_set.add/remove/clear
+        if action == 'pre_clear':
+            usuarios = list(instance.user_set.values_list('pk', flat=True))
+        elif action in ('post_add', 'post_remove'):
+            usuarios = pk_set
+        else:
+            return
+    else:
+        if action not in ('post_add', 'post_remove', 'post_clear'):
+            return
+        instance.__dict__.pop('_roles', None)
+        instance.roles_versao += 1
+        usuarios = [instance.pk]
+
+    if usuarios:
+        User.objects.filter(pk__in=usuarios).update(roles_versao=F('roles_versao') + 1)
+        invalidar_usuarios(*usuarios)
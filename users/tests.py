@@ -1,3 +1,406 @@
+import base64
+import json
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth.models import Group
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.auth import base_user
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from core.emails import processar_lote
+from core.models import EmailPendente
+from core.tests import ServidorSMTPLocal
+
+from .authentication import CookieJWTAuthentication
+from .cache import guardar_usuario, obter_usuario
+from .models import User, UserAnexo
+from .services import gerar_tokens, importar_planilha_usuarios
+from .views import PasswordResetView
+
+
+def criar_usuaria(cpf='52998224725', email='ana@example.com', **extras):
+    return User.objects.create_user(email=email, cpf=cpf, password='Senha@123', nome='Ana', **extras)
+
+
+class RolesVersaoTests(TestCase):
+    def setUp(self):
+        caches['usuarios'].clear()
+        self.usuaria = criar_usuaria()
+        self.admin = Group.objects.get_or_create(name='admin')[0]
+        self.usuaria.groups.add(self.admin)
+
+    def test_save_completo_de_instancia_antiga_nao_desfaz_o_incremento(self):
+        antiga = User.objects.get(pk=self.usuaria.pk)
+        self.usuaria.groups.remove(self.admin)
+        versao = User.objects.get(pk=self.usuaria.pk).roles_versao
+
+        antiga.nome = 'Ana Maria'
+        antiga.save()
+
+        atual = User.objects.get(pk=self.usuaria.pk)
+        self.assertEqual(atual.roles_versao, versao)
+        self.assertEqual(atual.nome, 'Ana Maria')
+
+    def test_token_anterior_a_revogacao_nao_traz_o_papel_revogado(self):
+        usuaria = User.objects.get(pk=self.usuaria.pk)
+        token = str(gerar_tokens(usuaria).access_token)
+        self.assertIn('admin', usuaria.roles)
+
+        antiga = User.objects.get(pk=self.usuaria.pk)
+        self.usuaria.groups.remove(self.admin)
+        antiga.save()
+
+        requisicao = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        autenticada, _ = CookieJWTAuthentication().authenticate(requisicao)
+        self.assertNotIn('admin', autenticada.roles)
+
+
+class CsrfCookieTests(TestCase):
+    def setUp(self):
+        caches['usuarios'].clear()
+        self.usuaria = criar_usuaria()
+        self.token = str(gerar_tokens(self.usuaria).access_token)
+
+    def test_post_com_cookie_exige_csrf(self):
+        cliente = APIClient(enforce_csrf_checks=True)
+        cliente.cookies['access_token'] = self.token
+        resposta = cliente.post('/usuarios/auth/logout/')
+        self.assertEqual(resposta.status_code, 403)
+        self.assertIn('CSRF', str(resposta.data['detail']))
+
+    def test_get_com_cookie_nao_exige_csrf(self):
+        cliente = APIClient(enforce_csrf_checks=True)
+        cliente.cookies['access_token'] = self.token
+        self.assertEqual(cliente.get('/usuarios/eu/').status_code, 200)
+
+    def test_cabecalho_authorization_dispensa_csrf(self):
+        cliente = APIClient(enforce_csrf_checks=True)
+        resposta = cliente.post('/usuarios/auth/logout/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertNotEqual(resposta.status_code, 403)
+
+
+class SnapshotUsuariaTests(TestCase):
+    def setUp(self):
+        caches['usuarios'].clear()
+        self.usuaria = criar_usuaria()
+        guardar_usuario(User.objects.get(pk=self.usuaria.pk))
+
+    def test_save_do_snapshot_grava_so_o_que_mudou(self):
+        snapshot = obter_usuario(self.usuaria.pk)
+        # Escrita de outro worker, que não invalida o cache deste processo
+        User.objects.filter(pk=self.usuaria.pk).update(cidade='Recife', password_needs_reset=True)
+
+        snapshot.nome = 'Ana Maria'
+        snapshot.save()
+
+        atual = User.objects.get(pk=self.usuaria.pk)
+        self.assertEqual((atual.nome, atual.cidade, atual.password_needs_reset), ('Ana Maria', 'Recife', True))
+
+    def test_edicao_invalida_o_snapshot(self):
+        cliente = APIClient()
+        cliente.credentials(HTTP_AUTHORIZATION=f'Bearer {gerar_tokens(self.usuaria).access_token}')
+        self.assertEqual(cliente.get('/usuarios/eu/').data['nome'], 'Ana')
+
+        resposta = cliente.patch('/usuarios/eu/editar/', {'nome': 'Ana Maria'}, format='json')
+        self.assertEqual(resposta.status_code, 200, resposta.data)
+        self.assertEqual(cliente.get('/usuarios/eu/').data['nome'], 'Ana Maria')
+
+        usuaria = User.objects.get(pk=self.usuaria.pk)
+        usuaria.is_active = False
+        usuaria.save()
+        self.assertEqual(cliente.get('/usuarios/eu/').status_code, 401)
+
+    def test_redefinir_senha_le_a_linha_atual(self):
+        snapshot = obter_usuario(self.usuaria.pk)
+        User.objects.filter(pk=self.usuaria.pk).update(password_needs_reset=True, cidade='Recife')
+
+        requisicao = APIRequestFactory().post('/', {'new_password': 'NovaSenha@123'}, format='json')
+        force_authenticate(requisicao, user=snapshot)
+        resposta = PasswordResetView.as_view()(requisicao)
+
+        self.assertEqual(resposta.status_code, 200, resposta.data)
+        atual = User.objects.get(pk=self.usuaria.pk)
+        self.assertTrue(atual.check_password('NovaSenha@123'))
+        self.assertFalse(atual.password_needs_reset)
+        self.assertEqual(atual.cidade, 'Recife')
+
+
+def planilha_csv(conteudo, nome='usuarias.csv'):
+    return SimpleUploadedFile(nome, conteudo.encode(), content_type='text/csv')
+
+
+class ImportacaoUsuariasTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        caches['usuarios'].clear()
+        self.grupo = Group.objects.get_or_create(name='estudante')[0]
+
+    def test_importadas_podem_recuperar_a_senha(self):
+        resultado = importar_planilha_usuarios(
+            planilha_csv('nome,email,cpf\nBia,bia@example.com,111.444.777-35\n'), self.grupo,
+        )
+        self.assertEqual(resultado['usuarios_criados'], 1)
+        self.assertFalse(User.objects.get(cpf='11144477735').password_needs_reset)
+
+        resposta = APIClient().post('/usuarios/auth/recuperacao_senha/', {'cpf': '11144477735'}, format='json')
+
+        self.assertEqual(resposta.status_code, 200, resposta.data)
+
+    def test_email_duplicado_ignora_maiusculas(self):
+        criar_usuaria(email='ana@example.com')
+        resultado = importar_planilha_usuarios(
+            planilha_csv('nome,email,cpf\nAna,ANA@Example.com,11144477735\nBia,Bia@example.com,39053344705\n'
+                         'Bia 2,bia@EXAMPLE.com,86288366757\n'),
+            self.grupo,
+        )
+
+        self.assertEqual(resultado['usuarios_criados'], 1)
+        self.assertIn('Email já cadastrado.', resultado['linhas_ignoradas'])
+        self.assertIn('Email repetido na planilha.', resultado['linhas_ignoradas'])
+        self.assertTrue(User.objects.filter(email='bia@example.com').exists())
+
+    def test_colunas_validadas_pelo_campo(self):
+        resultado = importar_planilha_usuarios(
+            planilha_csv('nome,email,cpf,estado\nBia,bia@example.com,11144477735,Pernambuco\n'), self.grupo,
+        )
+
+        self.assertEqual(resultado['usuarios_criados'], 0)
+        self.assertIn('Campo estado inválido', resultado['linhas_ignoradas'])
+
+    def test_data_de_nascimento_so_em_formatos_explicitos(self):
+        resultado = importar_planilha_usuarios(planilha_csv(
+            'nome,email,cpf,data_nascimento\n'
+            'Ana,ana@example.com,11144477735,03/04/2005\n'
+            'Bia,bia@example.com,39053344705,2005-04-03 00:00:00\n'
+            'Cris,cris@example.com,86288366757,April 3 2005\n'
+        ), self.grupo)
+
+        self.assertEqual(resultado['usuarios_criados'], 2)
+        self.assertIn('Data de nascimento inválida.', resultado['linhas_ignoradas'])
+        datas = set(User.objects.filter(cpf__in=['11144477735', '39053344705']).values_list('data_nascimento', flat=True))
+        self.assertEqual(datas, {date(2005, 4, 3)})
+
+    def test_arquivo_que_nao_e_planilha_devolve_400(self):
+        admin = criar_usuaria(cpf='39053344705', email='admin@example.com')
+        admin.groups.add(Group.objects.get_or_create(name='admin')[0])
+        cliente = APIClient()
+        cliente.force_authenticate(user=User.objects.get(pk=admin.pk))
+
+        resposta = cliente.post('/usuarios/importar/', {
+            'arquivo': SimpleUploadedFile('usuarias.xlsx', b'PK\x03\x04' + b'corrompido' * 10),
+        }, format='multipart')
+
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn('erro', resposta.data)
+
+
+class RecuperacaoSenhaTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        caches['usuarios'].clear()
+        self.usuaria = criar_usuaria()
+
+    def recuperar(self):
+        return APIClient().post('/usuarios/auth/recuperacao_senha/', {'cpf': self.usuaria.cpf}, format='json')
+
+    def senha_entregue(self, servidor):
+        _, mensagem = servidor.mensagens[-1]
+        texto = next(parte for parte in mensagem.walk() if parte.get_content_type() == 'text/plain')
+        return texto.get_payload(decode=True).decode().rsplit(': ', 1)[1].strip()
+
+    def test_dois_pedidos_seguidos_nao_trocam_a_senha_de_novo(self):
+        self.assertEqual(self.recuperar().status_code, 200)
+        senha_pendente = User.objects.get(pk=self.usuaria.pk).password
+
+        self.assertEqual(self.recuperar().status_code, 200)
+
+        self.assertEqual(User.objects.get(pk=self.usuaria.pk).password, senha_pendente)
+        self.assertEqual(EmailPendente.objects.count(), 1)
+        with ServidorSMTPLocal() as servidor, servidor.configuracao():
+            self.assertEqual(processar_lote(emails_por_segundo=0), (1, 0))
+        self.assertTrue(User.objects.get(pk=self.usuaria.pk).check_password(self.senha_entregue(servidor)))
+
+    def test_pedido_depois_da_entrega_e_recusado(self):
+        self.recuperar()
+        with ServidorSMTPLocal() as servidor, servidor.configuracao():
+            processar_lote(emails_por_segundo=0)
+        senha = self.senha_entregue(servidor)
+
+        self.assertEqual(self.recuperar().status_code, 400)
+        self.assertTrue(User.objects.get(pk=self.usuaria.pk).check_password(senha))
+
+    def test_email_em_espera_e_antecipado(self):
+        with ServidorSMTPLocal(recusados=[self.usuaria.email]) as servidor, servidor.configuracao():
+            self.assertEqual(self.recuperar().status_code, 200)
+            self.assertEqual(processar_lote(emails_por_segundo=0), (0, 1))
+        self.assertEqual(servidor.mensagens, [])
+
+        with ServidorSMTPLocal() as servidor, servidor.configuracao():
+            self.assertEqual(self.recuperar().status_code, 200)
+            self.assertEqual(processar_lote(emails_por_segundo=0), (1, 0))
+
+        self.assertEqual(EmailPendente.objects.count(), 1)
+        self.assertTrue(User.objects.get(pk=self.usuaria.pk).check_password(self.senha_entregue(servidor)))
+
+    def test_falha_definitiva_permite_nova_senha(self):
+        self.recuperar()
+        EmailPendente.objects.update(status=EmailPendente.Status.FALHOU, texto='', html='')
+
+        self.assertEqual(self.recuperar().status_code, 200)
+        with ServidorSMTPLocal() as servidor, servidor.configuracao():
+            self.assertEqual(processar_lote(emails_por_segundo=0), (1, 0))
+        self.assertTrue(User.objects.get(pk=self.usuaria.pk).check_password(self.senha_entregue(servidor)))
+
+
+class ListagemUsuariasTests(TestCase):
+    def setUp(self):
+        caches['usuarios'].clear()
+        admin = User.objects.create_user(email='admin@example.com', cpf='52998224725', password='Senha@123', nome='Zélia')
+        admin.groups.add(Group.objects.get_or_create(name='admin')[0])
+        for nome, cpf in [('Bia', '11144477735'), ('Ana', '39053344705'), ('Cris', '86288366757')]:
+            User.objects.create_user(email=f'{nome.lower()}@example.com', cpf=cpf, password='Senha@123', nome=nome)
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(user=User.objects.get(pk=admin.pk))
+
+    def cursor(self, *valores):
+        return base64.urlsafe_b64encode(json.dumps(valores).encode()).decode('ascii')
+
+    def test_paginas_seguem_o_cursor_em_nome_e_id(self):
+        nomes = []
+        url = '/usuarios/todos/?limite=2&fields=id,nome'
+        while url:
+            resposta = self.cliente.get(url)
+            self.assertEqual(resposta.status_code, 200, resposta.data)
+            nomes += [usuaria['nome'] for usuaria in resposta.data['results']]
+            url = resposta.data['next']
+
+        self.assertEqual(nomes, ['Ana', 'Bia', 'Cris', 'Zélia'])
+
+    def test_fields_limita_as_colunas_lidas(self):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.cliente.get('/usuarios/todos/?fields=id,nome,email')
+
+        self.assertEqual(set(resposta.data['results'][0]), {'id', 'nome', 'email'})
+        listagem = [c['sql'] for c in consultas.captured_queries if 'ORDER BY' in c['sql']]
+        self.assertEqual(len(listagem), 1)
+        self.assertIn('"email"', listagem[0])
+        self.assertNotIn('"cpf"', listagem[0])
+
+    def test_grupos_nao_geram_uma_consulta_por_usuaria(self):
+        self.cliente.get('/usuarios/todos/?fields=id,nome,groups')
+        with CaptureQueriesContext(connection) as poucas:
+            self.cliente.get('/usuarios/todos/?fields=id,nome,groups')
+        for n, cpf in enumerate(['12345678909', '98765432100', '11122233396', '24681357928']):
+            User.objects.create_user(email=f'extra{n}@example.com', cpf=cpf, password='Senha@123', nome=f'Extra {n}')
+        with CaptureQueriesContext(connection) as muitas:
+            resposta = self.cliente.get('/usuarios/todos/?fields=id,nome,groups')
+
+        self.assertEqual(len(resposta.data['results']), 8)
+        self.assertEqual(len(muitas), len(poucas))
+
+    def test_cursor_adulterado_devolve_404(self):
+        for cursor in [self.cursor('Ana', 'não é uuid'), self.cursor('Ana'), 'não é base64']:
+            resposta = self.cliente.get('/usuarios/todos/', {'cursor': cursor})
+            self.assertEqual(resposta.status_code, 404, cursor)
+            self.assertEqual(resposta.data['detail'], 'Cursor inválido.')
+
+
+PDF = b'%PDF-1.4\n' + b'0' * 100
+
+
+class AnexosUsuariaTests(TestCase):
+    def setUp(self):
+        caches['usuarios'].clear()
+        self.usuaria = criar_usuaria()
+        self.usuaria.foto = SimpleUploadedFile('foto.pdf', PDF)
+        self.usuaria.documento_cpf = SimpleUploadedFile('cpf.pdf', PDF + b'cpf')
+        self.usuaria.save()
+
+    def test_documentos_ficam_fora_da_linha_da_usuaria(self):
+        colunas = {campo.column for campo in User._meta.concrete_fields}
+        self.assertFalse(colunas & {'foto', 'documento_cpf'})
+        self.assertEqual(
+            dict(UserAnexo.objects.filter(usuario=self.usuaria).values_list('campo', 'nome_original')),
+            {'foto': 'foto.pdf', 'documento_cpf': 'cpf.pdf'},
+        )
+
+    def test_documento_so_e_lido_quando_acessado(self):
+        with CaptureQueriesContext(connection) as consultas:
+            usuaria = User.objects.get(pk=self.usuaria.pk)
+        self.assertNotIn('users_useranexo', ' '.join(c['sql'] for c in consultas.captured_queries))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(bytes(usuaria.foto), PDF)
+            self.assertIsNone(usuaria.comprovante_residencia)
+
+    def test_remover_documento(self):
+        usuaria = User.objects.get(pk=self.usuaria.pk)
+        usuaria.foto = None
+        usuaria.save()
+
+        self.assertEqual(list(UserAnexo.objects.filter(usuario=usuaria).values_list('campo', flat=True)), ['documento_cpf'])
+        self.assertIsNone(User.objects.get(pk=usuaria.pk).foto)
+
+    def test_download_e_metadados(self):
+        cliente = APIClient()
+        cliente.force_authenticate(self.usuaria)
+
+        resposta = cliente.get(f'/usuarios/{self.usuaria.pk}/anexo/foto/')
+        info = cliente.get(f'/usuarios/{self.usuaria.pk}/anexo/foto/info/')
+        vazio = cliente.get(f'/usuarios/{self.usuaria.pk}/anexo/foto_inexistente/')
+
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(b''.join(resposta.streaming_content) if resposta.streaming else resposta.content, PDF)
+        self.assertEqual((info.json()['mime_type'], info.json()['tamanho_bytes']), ('application/pdf', len(PDF)))
+        self.assertEqual(vazio.status_code, 400)
+
+
+class CadastroTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        caches['usuarios'].clear()
+        self.cliente = APIClient()
+
+    def cadastrar(self, **dados):
+        return self.cliente.post('/usuarios/auth/cadastro/', {
+            'nome': 'Ana', 'email': 'ana@example.com', 'cpf': '529.982.247-25', 'password': 'Senha@12345', **dados,
+        }, format='multipart')
+
+    def test_uma_insercao_e_um_hash_por_cadastro(self):
+        with mock.patch.object(base_user, 'make_password', wraps=base_user.make_password) as make_password, \
+                CaptureQueriesContext(connection) as consultas:
+            resposta = self.cadastrar()
+
+        self.assertEqual(resposta.status_code, 201, resposta.data)
+        self.assertEqual(make_password.call_count, 1)
+        escritas = [c['sql'].split()[0:3] for c in consultas.captured_queries if 'users_user' in c['sql']
+                    and c['sql'].startswith(('INSERT', 'UPDATE'))]
+        self.assertEqual(escritas, [['INSERT', 'INTO', '"users_user"'], ['INSERT', 'INTO', '"users_user_groups"']])
+        usuaria = User.objects.get(cpf='52998224725')
+        self.assertTrue(usuaria.check_password('Senha@12345'))
+        self.assertEqual(usuaria.roles, ['estudante'])
+        self.assertTrue(resposta.data['access_token'])
+
+    def test_grupo_privilegiado_pedido_no_cadastro_vira_estudante(self):
+        Group.objects.get_or_create(name='admin')
+
+        resposta = self.cadastrar(groups=['admin'])
+
+        self.assertEqual(resposta.status_code, 201, resposta.data)
+        self.assertEqual(User.objects.get(cpf='52998224725').roles, ['estudante'])
+
+    def test_duplicados_barrados_pelo_banco_sem_deixar_resto(self):
+        self.assertEqual(self.cadastrar().status_code, 201)
+
+        mesmo_cpf = self.cadastrar(email='outra@example.com')
+        mesmo_email = self.cadastrar(cpf='11144477735')
 
-# Create your tests here.
+        self.assertEqual(mesmo_cpf.data['mensagem'], 'CPF já cadastrado.')
+        self.assertEqual(mesmo_email.data['mensagem'], 'Email já cadastrado.')
+        self.assertEqual(User.objects.count(), 1)
+        self.assertEqual(User.groups.through.objects.count(), 1)
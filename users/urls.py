@@ -8,6 +8,7 @@ urlpatterns = [
 
     # Autenticação
     path('auth/cadastro/', CadastroAPIView.as_view(), name='cadastro'),
+    path('importar/', ImportarUsuariosView.as_view(), name='importar-usuarios'),
     path('auth/login/', LoginAPIView.as_view(), name='login'),
     path('auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('auth/recuperacao_senha/', RecuperacaoSenhaAPIView.as_view(), name='recuperacao_senha'),
@@ -32,7 +33,9 @@ urlpatterns = [
     path('grupos/default/', DefaultGroupsAPIView.as_view(), name='default-groups'),
 
     # Anexos de user
+    path('<uuid:user_id>/anexos/', AnexosUsuarioView.as_view(), name='anexos-usuario'),
     path('<uuid:user_id>/anexo/<str:field_name>/', AnexoDownloadView.as_view()),
+    path('<uuid:user_id>/anexo/<str:field_name>/info/', AnexoInfoView.as_view()),
 
 
 
@@ -1,16 +1,16 @@
 import re
-import mimetypes
-import magic
 
 from django.shortcuts import get_object_or_404
+from django.db import IntegrityError, transaction
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import Group
+from django.middleware.csrf import get_token
 from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework import viewsets, status, permissions, generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.throttling import UserRateThrottle
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.http import HttpResponse
@@ -19,9 +19,13 @@ from django.http import JsonResponse
 
 
 from .services import *
+from core.emails import antecipar_email
+from core.models import EmailPendente
+from core.downloads import responder_anexo
+from core.pagination import PaginacaoKeyset
 
-from .serializers import UserSerializer
-from .models import User
+from .serializers import UserSerializer, UserListaSerializer, CadastroSerializer
+from .models import User, UserAnexo, CAMPOS_ANEXO
 from .permissions import (
     IsAdminOrAvaliadora as IsAdminOrEvaluator,
     IsSelfOrAdminOrAvaliadora as IsOwnerOrAdminOrEvaluator,
@@ -29,14 +33,21 @@ from .permissions import (
 )
 
 class UserViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.all()
+    queryset = User.objects.prefetch_related('anexos')
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated, IsAdminOrEvaluator]
 
 
 
+class RecuperacaoSenhaThrottle(AnonRateThrottle):
+    scope = 'recuperacao_senha'
+    rate = '5/min'
+
+
 class RecuperacaoSenhaAPIView(APIView):
+    throttle_classes = [RecuperacaoSenhaThrottle]
     permission_classes = [permissions.AllowAny]
+    authentication_classes = []
 
     def post(self, request):
         email = request.data.get('email')
@@ -56,7 +67,16 @@ class RecuperacaoSenhaAPIView(APIView):
             return Response({'mensagem': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         if user.password_needs_reset:
-            return Response({'mensagem': 'A senha já foi resetada recentemente. Verifique seu email.'}, status=status.HTTP_400_BAD_REQUEST)
+            # Uma recuperação pendente nunca é sobrescrita: quem souber o email
+            # ou o CPF não pode trocar de novo a senha a cada pedido
+            pendente = recuperacao_pendente(user)
+            if pendente is None or pendente.status == EmailPendente.Status.ENVIADO:
+                return Response({'mensagem': 'A senha já foi resetada recentemente. Verifique seu email.'}, status=status.HTTP_400_BAD_REQUEST)
+            if pendente.status != EmailPendente.Status.FALHOU:
+                # O email com a senha temporária ainda está na fila: só é antecipado
+                antecipar_email(pendente)
+                return Response({'mensagem': 'Senha recuperada com sucesso. Verifique seu email.'}, status=status.HTTP_200_OK)
+            # O email anterior falhou de vez: aquela senha nunca chegou, então outra é gerada
 
         try:
             resetar_senha_usuario(user)
@@ -91,22 +111,25 @@ class CadastroAPIView(APIView):
         if senha_valida is not True:
             return Response({'mensagem': senha_valida}, status=status.HTTP_400_BAD_REQUEST)
 
-        if User.objects.filter(email=email).exists():
-            return Response({'mensagem': 'Email já cadastrado.'}, status=status.HTTP_400_BAD_REQUEST)
-
-        if User.objects.filter(cpf=cpf).exists():
-            return Response({'mensagem': 'CPF já cadastrado.'}, status=status.HTTP_400_BAD_REQUEST)
-
         data['cpf'] = cpf
 
-        serializer = UserSerializer(data=data, context={"request": request})
+        serializer = CadastroSerializer(data=data, context={"request": request})
 
         if serializer.is_valid():
-            user = serializer.save()
-            user.set_password(senha)
-            user.save()
+            # Usuária, anexos, grupo e refresh token na mesma transação;
+            # email/CPF duplicados são barrados pelas constraints do banco.
+            try:
+                with transaction.atomic():
+                    user = serializer.save()
+                    refresh = gerar_tokens(user)
+            except IntegrityError as e:
+                erro = str(e).lower()
+                if 'cpf' in erro:
+                    return Response({'mensagem': 'CPF já cadastrado.'}, status=status.HTTP_400_BAD_REQUEST)
+                if 'email' in erro:
+                    return Response({'mensagem': 'Email já cadastrado.'}, status=status.HTTP_400_BAD_REQUEST)
+                raise
 
-            refresh = RefreshToken.for_user(user)
             return Response({
                 'mensagem': 'Usuário cadastrado com sucesso.',
                 'usuario': UserSerializer(user).data,
@@ -115,6 +138,30 @@ class CadastroAPIView(APIView):
             }, status=status.HTTP_201_CREATED)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ImportarUsuariosView(APIView):
+    parser_classes = [MultiPartParser]
+    permission_classes = [permissions.IsAuthenticated, IsAdminRole]
+
+    def post(self, request):
+        arquivo = request.FILES.get('arquivo')
+        if not arquivo:
+            return Response({"erro": "Arquivo não enviado."}, status=status.HTTP_400_BAD_REQUEST)
+
+        grupo = get_valid_group(request.data.get('grupo'))
+        try:
+            resultado = importar_planilha_usuarios(arquivo, grupo)
+        except ValueError as e:
+            return Response({"erro": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "mensagem": "Importação realizada com sucesso.",
+            "grupo": grupo.name,
+            **resultado,
+        })
+
+
 class LoginThrottle(UserRateThrottle):
     rate = '4/min'
 
@@ -122,6 +169,8 @@ class LoginThrottle(UserRateThrottle):
 class LoginAPIView(APIView):
     throttle_classes = [LoginThrottle]
     permission_classes = [permissions.AllowAny]
+    # Um cookie antigo não deve impedir o login (nem exigir CSRF nele)
+    authentication_classes = []
 
     def post(self, request):
         cpf = re.sub(r'\D', '', request.data.get('cpf', ''))
@@ -135,12 +184,14 @@ class LoginAPIView(APIView):
         if user is None:
             return Response({'mensagem': 'Credenciais inválidas.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        refresh = RefreshToken.for_user(user)
+        refresh = gerar_tokens(user)
 
         response = JsonResponse({
             'refresh_token': str(refresh),
             'access_token': str(refresh.access_token),
         }, status=200)
+        # Cookie csrftoken para o frontend repetir no cabeçalho X-CSRFToken
+        get_token(request)
 
         response.set_cookie(
             'access_token',
@@ -159,12 +210,44 @@ class LoginAPIView(APIView):
         return response
 
 
+class PaginacaoUsuarios(PaginacaoKeyset):
+    ordenacao = ('nome', 'id')
+
+
 class UserListView(generics.ListAPIView):
-    serializer_class = UserSerializer
+    """
+    Lista paginada por cursor em (nome, id). `?fields=id,nome,email` limita
+    as colunas lidas do banco; sem o parâmetro, retorna tudo menos os anexos.
+    """
+    serializer_class = UserListaSerializer
+    pagination_class = PaginacaoUsuarios
     permission_classes = [permissions.IsAuthenticated, IsAdminOrEvaluator]
 
+    def campos_solicitados(self):
+        disponiveis = list(UserListaSerializer().fields)
+        fields = self.request.query_params.get('fields')
+        if not fields:
+            return [campo for campo in disponiveis if campo not in CAMPOS_ANEXO]
+        solicitados = {campo.strip() for campo in fields.split(',')}
+        return [campo for campo in disponiveis if campo in solicitados]
+
     def get_queryset(self):
-        return User.objects.all()
+        campos = self.campos_solicitados()
+        colunas = {field.name for field in User._meta.concrete_fields}
+
+        queryset = User.objects.only('id', 'nome', *[campo for campo in campos if campo in colunas])
+        if 'groups' in campos:
+            queryset = queryset.com_roles()
+        for relacao in ['user_permissions', 'deficiencias']:
+            if relacao in campos:
+                queryset = queryset.prefetch_related(relacao)
+        if any(campo in CAMPOS_ANEXO for campo in campos):
+            queryset = queryset.prefetch_related('anexos')
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('campos', self.campos_solicitados())
+        return super().get_serializer(*args, **kwargs)
 
 
 class UserDetailView(generics.RetrieveAPIView):
@@ -191,7 +274,7 @@ class UserUpdateView(generics.UpdateAPIView):
         # Não permite alterar CPF via update
         serializer.validated_data.pop('cpf', None)
         # Apenas admins podem alterar grupos
-        if not self.request.user.groups.filter(name='admin').exists():
+        if 'admin' not in self.request.user.roles:
             serializer.validated_data.pop('groups', None)
         serializer.save()
 
@@ -219,7 +302,8 @@ class UpdateMyUserView(generics.UpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        # request.user pode ser um snapshot em cache (users.cache); a edição parte da linha atual
+        return User.objects.get(pk=self.request.user.pk)
 
     def perform_update(self, serializer):
         serializer.validated_data.pop('cpf', None)
@@ -243,18 +327,24 @@ class GroupMembersAPIView(APIView):
         except Group.DoesNotExist:
             return Response({"detail": "Grupo não encontrado."}, status=status.HTTP_404_NOT_FOUND)
 
-        users = User.objects.filter(groups=group)
+        paginacao = PaginacaoUsuarios()
+        users = paginacao.paginate_queryset(
+            User.objects.filter(groups=group).only('id', 'nome', 'email', 'cpf'), request, view=self
+        )
         users_data = [{"id": u.id, "name": u.nome, "email": u.email, "cpf": u.cpf} for u in users]
-        return Response(users_data)
+        return paginacao.get_paginated_response(users_data)
 
 
 class UserListAPIView(APIView):
     permission_classes = [IsAdminUser]  
 
     def get(self, request):
-        users = User.objects.all()
+        paginacao = PaginacaoUsuarios()
+        users = paginacao.paginate_queryset(
+            User.objects.com_roles().only('id', 'nome', 'email', 'cpf'), request, view=self
+        )
         data = [{"id": u.id, "email": u.email, "cpf": u.cpf, "roles": u.roles} for u in users]
-        return Response(data)
+        return paginacao.get_paginated_response(data)
 
 
 class UserDetailAPIView(APIView):
@@ -321,30 +411,18 @@ class AnexoDownloadView(APIView):
         if not request.user.is_superuser and request.user != user:
             return HttpResponse("Acesso negado", status=403)
 
-        if not hasattr(user, field_name):
+        if field_name not in CAMPOS_ANEXO:
             return HttpResponse("Campo não encontrado", status=400)
 
-        arquivo = getattr(user, field_name)
-        if not arquivo:
+        anexo = UserAnexo.objects.filter(usuario=user, campo=field_name)
+        metadados = anexo.values('mime_type', 'tamanho', 'sha256', 'nome_original').first()
+        if not metadados:
             return HttpResponse("Arquivo não encontrado", status=404)
 
-        if isinstance(arquivo, memoryview):
-            arquivo = bytes(arquivo)
+        return responder_anexo(request, anexo, 'conteudo', field_name, metadados)
 
-        try:
-            mime = magic.Magic(mime=True)
-            mime_type = mime.from_buffer(arquivo)
-        except Exception:
-            mime_type = "application/octet-stream"
 
-        ext = mimetypes.guess_extension(mime_type) or ".bin"
-
-        filename = f"{field_name}{ext}"
-
-        response = HttpResponse(arquivo, content_type=mime_type)
-        response["Content-Disposition"] = f'attachment; filename="{filename}"'
-        return response
-    
+class AnexoInfoView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, user_id, field_name):
@@ -353,28 +431,55 @@ class AnexoDownloadView(APIView):
         if not request.user.is_superuser and request.user != user:
             return JsonResponse({'erro': 'Acesso negado.'}, status=403)
 
-        if not hasattr(user, field_name):
+        if field_name not in CAMPOS_ANEXO:
             return JsonResponse({'erro': f"Campo '{field_name}' não encontrado."}, status=400)
 
-        arquivo = getattr(user, field_name)
-        if not arquivo:
+        metadados = (
+            UserAnexo.objects
+            .filter(usuario=user, campo=field_name)
+            .values('mime_type', 'tamanho', 'sha256', 'nome_original')
+            .first()
+        )
+        if not metadados:
             return JsonResponse({'status': 'Vazio'}, status=204)
 
-        if isinstance(arquivo, memoryview):
-            arquivo = bytes(arquivo)
-
-        try:
-            mime = magic.Magic(mime=True)
-            mime_type = mime.from_buffer(arquivo)
-        except Exception as e:
-            return JsonResponse({'erro': f'Erro ao detectar MIME: {str(e)}'}, status=500)
-
+        mime_type = metadados['mime_type']
         return JsonResponse({
             'campo': field_name,
-            'tamanho_bytes': len(arquivo),
+            'nome_original': metadados['nome_original'],
+            'tamanho_bytes': metadados['tamanho'],
             'mime_type': mime_type,
+            'sha256': metadados['sha256'],
             'tipo_arquivo': 'Possível PDF' if mime_type == 'application/pdf' else 'Outro',
         })
+
+
+class AnexosUsuarioView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, user_id):
+        user = get_object_or_404(User, pk=user_id)
+
+        if not request.user.is_superuser and request.user != user:
+            return JsonResponse({'erro': 'Acesso negado.'}, status=403)
+
+        anexos = (
+            UserAnexo.objects
+            .filter(usuario=user)
+            .order_by('campo')
+            .values('campo', 'nome_original', 'mime_type', 'tamanho', 'sha256', 'atualizado_em')
+        )
+        return Response([
+            {
+                'campo': anexo['campo'],
+                'nome_original': anexo['nome_original'],
+                'mime_type': anexo['mime_type'],
+                'tamanho_bytes': anexo['tamanho'],
+                'sha256': anexo['sha256'],
+                'atualizado_em': anexo['atualizado_em'],
+            }
+            for anexo in anexos
+        ])
     
 
 class ProfileView(APIView):
@@ -401,7 +506,8 @@ class ProfileView(APIView):
 class PasswordResetView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     def post(self, request):
-        user = request.user
+        # request.user pode ser um snapshot em cache (users.cache): lê a linha atual
+        user = User.objects.get(pk=request.user.pk)
         if not user.password_needs_reset:
             return Response({'mensagem': 'Senha já foi redefinida!'}, status=400)
         nova_senha = request.data.get("new_password")
@@ -412,7 +518,7 @@ class PasswordResetView(APIView):
 
         user.set_password(nova_senha)
         user.password_needs_reset = False
-        user.save()
+        user.save(update_fields=['password', 'password_needs_reset'])
         return Response({'mensagem': 'Senha redefinida com sucesso!'})
     
 